@@ -0,0 +1,132 @@
+import pandas as pd
+
+from reminder_index import reminder_date
+
+# ---------------- Productivity Analytics ----------------
+# Reminders are turned into one columnar frame and grouped by day and subject
+# once per session. The resulting per-day rollup is then kept current by the
+# add/delete/status-change functions, so the productivity view only ever works
+# on (days x subjects) rows, never on individual reminders.
+
+
+def reminders_frame(data):
+    subjects, times, revised = [], [], []
+    for subject, chapters in data.items():
+        for chapter in chapters:
+            for reminder in chapter.reminders:
+                subjects.append(subject)
+                times.append(reminder.time)
+                revised.append(reminder.status == "Revised")
+    return pd.DataFrame({
+        "subject": pd.Categorical(subjects),
+        "time": pd.to_datetime(pd.Series(times, dtype="object"), errors="coerce"),
+        "revised": pd.Series(revised, dtype="bool"),
+    })
+
+
+class DailyRollup:
+    # (date, subject) -> [total, revised]
+    def __init__(self, counts=None):
+        self._counts = counts or {}
+
+    @classmethod
+    def build(cls, data):
+        frame = reminders_frame(data).dropna(subset=["time"])
+        if frame.empty:
+            return cls()
+        grouped = frame.groupby([frame["time"].dt.date, "subject"], observed=True)["revised"].agg(["size", "sum"])
+        return cls({key: [int(total), int(revised)] for key, total, revised in zip(grouped.index, grouped["size"], grouped["sum"])})
+
+    def merged(self, other):
+        # A new rollup counting both, e.g. the working set and the chapter archive.
+        combined = DailyRollup({key: list(counts) for key, counts in self._counts.items()})
+        for (day, subject), (total, revised) in other._counts.items():
+            combined._bump(day, subject, total, revised)
+        return combined
+
+    def _bump(self, day, subject, total, revised):
+        counts = self._counts.setdefault((day, subject), [0, 0])
+        counts[0] += total
+        counts[1] += revised
+        if counts[0] <= 0:
+            del self._counts[(day, subject)]
+
+    def add_chapter(self, subject, chapter):
+        for reminder in chapter.reminders:
+            day = reminder_date(reminder)
+            if day is not None:
+                self._bump(day, subject, 1, int(reminder.status == "Revised"))
+
+    def remove_chapter(self, subject, chapter):
+        for reminder in chapter.reminders:
+            day = reminder_date(reminder)
+            if day is not None:
+                self._bump(day, subject, -1, -int(reminder.status == "Revised"))
+
+    def status_changed(self, subject, reminder, previous_status):
+        day = reminder_date(reminder)
+        if day is None or previous_status == reminder.status:
+            return
+        self._bump(day, subject, 0, 1 if reminder.status == "Revised" else -1)
+
+    def frame(self, start_date=None, subject=None):
+        keys = list(self._counts)
+        values = list(self._counts.values())
+        frame = pd.DataFrame({
+            "date": pd.to_datetime([key[0] for key in keys]),
+            "subject": [key[1] for key in keys],
+            "total": [value[0] for value in values],
+            "revised": [value[1] for value in values],
+        })
+        if start_date:
+            frame = frame[frame["date"] >= pd.Timestamp(start_date)]
+        if subject:
+            frame = frame[frame["subject"] == subject]
+        return frame
+
+
+def _with_productivity(frame):
+    frame["Productivity (%)"] = (frame["revised"] / frame["total"] * 100).where(frame["total"] > 0, 0.0)
+    return frame.rename(columns={"total": "Total Reminders", "revised": "Revised"})
+
+
+def daily_productivity(rollup_frame):
+    daily = rollup_frame.groupby("date", sort=True)[["total", "revised"]].sum().reset_index()
+    daily["date"] = daily["date"].dt.strftime("%d/%m/%y")
+    return _with_productivity(daily.rename(columns={"date": "Date"}))
+
+
+def subject_breakdown(rollup_frame):
+    per_subject = rollup_frame.groupby("subject", sort=True)[["total", "revised"]].sum().reset_index()
+    return _with_productivity(per_subject.rename(columns={"subject": "Subject"}))
+
+
+# ---------------- Chart Series ----------------
+# Charts plot one point per bucket. Long ranges switch from days to weeks
+# (starting Monday) to months, so a chart never carries more than a few
+# hundred points however long the history is. Productivity is recomputed from
+# each bucket's summed counts rather than averaged.
+
+MAX_DAILY_POINTS = 120
+MAX_WEEKLY_POINTS = 160
+BUCKET_LABELS = {"D": "Daily", "W": "Weekly", "M": "Monthly"}
+
+
+def chart_frequency(rollup_frame):
+    if rollup_frame.empty:
+        return "D"
+    span_days = (rollup_frame["date"].max() - rollup_frame["date"].min()).days + 1
+    if span_days <= MAX_DAILY_POINTS:
+        return "D"
+    if span_days <= MAX_WEEKLY_POINTS * 7:
+        return "W"
+    return "M"
+
+
+def bucketed_productivity(rollup_frame, freq="D"):
+    if freq == "D":
+        return daily_productivity(rollup_frame)
+    buckets = rollup_frame["date"].dt.to_period(freq).dt.start_time.rename("date")
+    bucketed = rollup_frame.groupby(buckets, sort=True)[["total", "revised"]].sum().reset_index()
+    bucketed["date"] = bucketed["date"].dt.strftime("%d/%m/%y")
+    return _with_productivity(bucketed.rename(columns={"date": "Date"}))
@@ -0,0 +1,2 @@
+# Headless benchmarks for the data layer: run with `python -m benchmarks.run`.
+# Multi-session load test against an in-process Firebase stand-in: `python -m benchmarks.loadtest`.
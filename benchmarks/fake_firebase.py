@@ -0,0 +1,274 @@
+import collections
+import json
+import threading
+import time
+
+from metrics import Metrics
+from schema import apply_increment, is_increment
+from storage import _etag, _firebase_shape, _order_key
+
+# ---------------- Firebase Stand-in ----------------
+# An in-process replacement for the parts of firebase_admin.db that
+# FirebaseBackend uses, for load tests: FirebaseBackend(db=FakeDatabase()).
+# The tree is plain JSON values behind one lock, so writes apply one at a
+# time as on the server, and values are copied in and out through JSON so
+# no caller shares objects with the tree. As from Firebase, objects whose keys
+# are all small integers come back as arrays. Each request sleeps for a
+# simulated round trip plus transfer time; its latency (including time spent
+# waiting for the lock) and payload bytes go into a metrics.Metrics registry.
+
+Event = collections.namedtuple("Event", "event_type path data")
+
+
+def _split(path):
+    return [part for part in (path or "").strip("/").split("/") if part]
+
+
+def _prune(value):
+    # Firebase stores no nulls and no empty objects.
+    if isinstance(value, dict):
+        pruned = {key: _prune(child) for key, child in value.items()}
+        pruned = {key: child for key, child in pruned.items() if child is not None}
+        return pruned or None
+    if isinstance(value, list):
+        pruned = [_prune(child) for child in value]
+        return pruned if any(child is not None for child in pruned) else None
+    return value
+
+
+def _lookup(tree, parts):
+    for key in parts:
+        if isinstance(tree, dict):
+            tree = tree.get(key)
+        elif isinstance(tree, list) and key.isdigit() and int(key) < len(tree):
+            tree = tree[int(key)]
+        else:
+            return None
+    return tree
+
+
+def _store(tree, parts, value):
+    # -> the tree with value at parts; None deletes and prunes emptied parents.
+    if not parts:
+        return value
+    if isinstance(tree, list):
+        tree = {str(idx): child for idx, child in enumerate(tree) if child is not None}
+    elif not isinstance(tree, dict):
+        tree = {}
+    child = _store(tree.get(parts[0]), parts[1:], value)
+    if child is None:
+        tree.pop(parts[0], None)
+    else:
+        tree[parts[0]] = child
+    return tree or None
+
+
+def _firebase_value(value):
+    if isinstance(value, list):
+        value = {str(idx): child for idx, child in enumerate(value) if child is not None}
+    if isinstance(value, dict):
+        return _firebase_shape({key: _firebase_value(child) for key, child in value.items()})
+    return value
+
+
+def _children(value):
+    if isinstance(value, list):
+        return {str(idx): child for idx, child in enumerate(value) if child is not None}
+    return value if isinstance(value, dict) else {}
+
+
+class _Registration:
+    def __init__(self, database, entry):
+        self._database = database
+        self._entry = entry
+
+    def close(self):
+        with self._database._lock:
+            if self._entry in self._database._listeners:
+                self._database._listeners.remove(self._entry)
+
+
+class FakeDatabase:
+    def __init__(self, root=None, latency_ms=20.0, bandwidth_mbps=50.0, metrics=None):
+        self._lock = threading.Lock()
+        self._root = _prune(json.loads(json.dumps(root))) if root is not None else None
+        self._listeners = []  # (parts, callback)
+        self.latency_ms = latency_ms
+        self.bandwidth_mbps = bandwidth_mbps
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def reference(self, path="/"):
+        return Reference(self, _split(path))
+
+    # Inspection for the harness; no simulated network, not recorded.
+    def peek(self, path="/"):
+        with self._lock:
+            return json.loads(json.dumps(_lookup(self._root, _split(path))))
+
+    def stored_bytes(self):
+        with self._lock:
+            return len(json.dumps(self._root, separators=(",", ":")))
+
+    def _transfer(self, nbytes):
+        # Half a round trip plus the time the payload takes on the wire.
+        seconds = self.latency_ms / 2000
+        if self.bandwidth_mbps:
+            seconds += nbytes * 8 / (self.bandwidth_mbps * 1e6)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _request(self, op, apply, sent=None):
+        # apply() runs under the lock and returns (result, response payload, [(parts, new value)] written).
+        start = time.perf_counter()
+        encoded = json.dumps(sent, separators=(",", ":")) if sent is not None else ""
+        self._transfer(len(encoded))
+        with self._lock:
+            result, response, written = apply(json.loads(encoded) if encoded else None)
+            events = self._events(written)
+            response_bytes = len(json.dumps(response, separators=(",", ":"))) if response is not None else 0
+            result = json.loads(json.dumps(result)) if result is not None else None
+        for callback, event in events:
+            callback(event)
+        self._transfer(response_bytes)
+        self.metrics.observe_storage(op, (time.perf_counter() - start) * 1000, len(encoded) + response_bytes)
+        return result
+
+    def _write(self, parts, value):
+        self._root = _store(self._root, parts, _prune(value))
+        return parts, _lookup(self._root, parts)
+
+    def _events(self, written):
+        events = []
+        for listen_parts, callback in self._listeners:
+            depth = len(listen_parts)
+            for parts, value in written:
+                if parts[:depth] == listen_parts:
+                    events.append((callback, Event("put", "/" + "/".join(parts[depth:]), _firebase_value(value))))
+                elif listen_parts[:len(parts)] == parts:
+                    # A write above the listened node replaces it.
+                    events.append((callback, Event("put", "/", _firebase_value(_lookup(self._root, listen_parts)))))
+        return events
+
+
+class Reference:
+    def __init__(self, database, parts):
+        self._db = database
+        self._parts = parts
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    def child(self, path):
+        return Reference(self._db, self._parts + _split(path))
+
+    def _current(self):
+        return _firebase_value(_lookup(self._db._root, self._parts))
+
+    def get(self, etag=False, shallow=False):
+        def apply(_):
+            value = self._current()
+            if shallow and isinstance(value, (dict, list)):
+                value = {key: True for key in _children(value)}
+            return ((value, _etag(value)) if etag else value), value, []
+        return self._db._request("get", apply)
+
+    def get_if_changed(self, etag):
+        def apply(_):
+            value = self._current()
+            current = _etag(value)
+            if current == etag:
+                return (False, None, etag), None, []
+            return (True, value, current), value, []
+        return self._db._request("get_if_changed", apply)
+
+    def set(self, value):
+        return self._db._request("set", lambda sent: (None, None, [self._db._write(self._parts, sent)]), sent=value)
+
+    def delete(self):
+        return self._db._request("delete", lambda _: (None, None, [self._db._write(self._parts, None)]))
+
+    def set_if_unchanged(self, expected_etag, value):
+        def apply(sent):
+            current = self._current()
+            if _etag(current) != expected_etag:
+                return (False, current, _etag(current)), current, []
+            written = self._db._write(self._parts, sent)
+            value = _firebase_value(written[1])
+            return (True, value, _etag(value)), None, [written]
+        return self._db._request("set_if_unchanged", apply, sent=value)
+
+    def update(self, value):
+        # Multi-path update; {".sv": {"increment": n}} leaves are resolved against the stored value.
+        def apply(sent):
+            written = []
+            for path, child in sent.items():
+                parts = self._parts + _split(path)
+                if is_increment(child):
+                    child = apply_increment(_lookup(self._db._root, parts), child)
+                written.append(self._db._write(parts, child))
+            return None, None, written
+        return self._db._request("update", apply, sent=value)
+
+    def transaction(self, transaction_update):
+        # Holding the lock for the whole call stands in for the client's compare-and-retry loop.
+        def apply(_):
+            new_value = json.loads(json.dumps(transaction_update(json.loads(json.dumps(self._current())))))
+            written = self._db._write(self._parts, new_value)
+            value = _firebase_value(written[1])
+            return value, value, [written]
+        return self._db._request("transaction", apply)
+
+    def listen(self, callback):
+        with self._db._lock:
+            entry = (self._parts, callback)
+            self._db._listeners.append(entry)
+            initial = self._current()
+        callback(Event("put", "/", initial))
+        return _Registration(self._db, entry)
+
+    def order_by_key(self):
+        return Query(self, None)
+
+    def order_by_child(self, child):
+        return Query(self, child)
+
+
+class Query:
+    def __init__(self, ref, child):
+        self._ref = ref
+        self._child = child
+        self._start = None
+        self._end = None
+        self._limit = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def limit_to_first(self, limit):
+        self._limit = limit
+        return self
+
+    def _order(self, key, value):
+        if self._child is None:
+            return (0, key)
+        return _order_key(value.get(self._child) if isinstance(value, dict) else None)
+
+    def get(self):
+        def apply(_):
+            low = self._order(self._start, {self._child: self._start}) if self._start is not None else None
+            high = self._order(self._end, {self._child: self._end}) if self._end is not None else None
+            items = []
+            for key, value in _children(self._ref._current()).items():
+                order = self._order(key, value)
+                if (low is None or order >= low) and (high is None or order <= high):
+                    items.append((order, key, value))
+            items.sort(key=lambda item: item[:2])
+            result = collections.OrderedDict((key, value) for _, key, value in items[:self._limit])
+            return result, result, []
+        return self._ref._db._request("query", apply)
@@ -0,0 +1,336 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+from benchmarks.fake_firebase import FakeDatabase
+from benchmarks.synthetic import generate_legacy_subject_chapters_data, generate_subject_chapters_data
+from metrics import Metrics
+from models import (Chapter, SubjectChapters, build_reminders, chapter_counts, chapter_path, count_progress, new_chapter_id,
+                    new_todo_id, prepare_data_for_firebase, process_subject_data, progress_deltas, reminder_status_path,
+                    todo_path)
+from persistence import ChangeSet, WriteBehindQueue, submit_changes
+from reminder_index import ReminderIndex
+from schema import decode_chapter, status_code
+from shared_cache import SharedProgress, SharedTodos, SubjectLoads
+from storage import DATA_NODE, PROGRESS_NODE, TODO_NODE, FirebaseBackend, node_path
+
+# ---------------- Multi-Session Load Test ----------------
+# Runs many simulated sessions at once against the in-process Firebase
+# stand-in (fake_firebase.py), for a growing number of sessions. Sessions are
+# threads, as Streamlit runs each session's script on its own thread, and go
+# through the app's data layer the way main.py does: per-process mirrors, a
+# change set per session, the write-behind queue and the progress counters.
+# Each session opens the app, then adds chapters, ticks reminders, adds and
+# completes todos and opens the productivity view, with think time between.
+#
+# --write-mode full-tree replays the original app instead: every save sets
+# the session's whole subject (or todo) node. With several sessions on one
+# node that loses other sessions' writes, which the lost-update count shows.
+# --layout legacy seeds every subject as an array of verbose chapters, as the
+# original app stored them, so the first load of each node also migrates it.
+#
+# Per step the harness reports throughput, p50/p95/p99 interaction latency,
+# storage calls and bytes, lost updates (chapters, reminder statuses and
+# todos a session wrote that are not in the final tree), drift of the
+# progress counters from a recount, and memory: the stand-in's stored tree
+# and the harness process's resident set.
+
+DEFAULT_SESSIONS = [1, 10, 25, 50]
+SUBJECTS = ["Botany", "Zoology", "Physics", "Chemistry"]
+FLOWS = (("add_chapter", 0.25), ("toggle_reminder", 0.35), ("add_todo", 0.15), ("complete_todo", 0.1),
+         ("productivity", 0.15))
+FLUSH_TIMEOUT_SECONDS = 60
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _quantile(ordered, q):
+    # Same rule as metrics.Series.quantile.
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current outside Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+class AppProcess:
+    # One Streamlit server process: a backend, a write-behind queue and, per user,
+    # the mirrors main.py keeps as singletons.
+    def __init__(self, database, debounce_seconds):
+        self.store = FirebaseBackend(db=database)
+        self.queue = WriteBehindQueue(self.store, debounce_seconds=debounce_seconds, max_delay_seconds=debounce_seconds * 4)
+        self._lock = threading.Lock()
+        self._mirrors = {}
+
+    def mirrors(self, user_id):
+        with self._lock:
+            if user_id not in self._mirrors:
+                self._mirrors[user_id] = (
+                    SubjectLoads("subjects load", self.store, node_path(DATA_NODE, user_id)),
+                    SharedTodos(self.store, node_path(TODO_NODE, user_id)),
+                    SharedProgress(self.store, node_path(PROGRESS_NODE, user_id)),
+                )
+            return self._mirrors[user_id]
+
+    def close(self):
+        self.queue.close()
+
+
+class Session:
+    def __init__(self, process, user_id, write_mode, rng):
+        self.process = process
+        self.user_id = user_id
+        self.write_mode = write_mode
+        self.rng = rng
+        self.data = None
+        self.todos = None
+        self.progress = None
+        self.index = None
+        self.changes = ChangeSet()
+        self.progress_changes = ChangeSet()
+        # What this session wrote and expects to find at the end.
+        self.chapters = {}  # (subject, chapter_id) -> {reminder_id: status}
+        self.todo_status = {}  # todo_id -> status
+
+    # -- loading, as ensure_session_data() --
+    def open(self):
+        if self.write_mode == "full-tree":
+            store = self.process.store
+            self.data = process_subject_data(store.get(node_path(DATA_NODE, self.user_id)) or {})
+            self.todos = store.get(node_path(TODO_NODE, self.user_id)) or {}
+        else:
+            loads, todos, progress = self.process.mirrors(self.user_id)
+            self.data = loads.result().snapshot()
+            self.todos = todos.snapshot() or {}
+            self.progress = progress.snapshot()
+            if self.progress is None:
+                self.progress = progress.seed(count_progress(self.data))
+        for subject in SUBJECTS:
+            self.data.setdefault(subject, SubjectChapters())
+        self.index = ReminderIndex.build(self.data)
+
+    # -- saving, as save_data_to_firebase() and save_todo_changes() --
+    def save(self):
+        if self.write_mode == "full-tree":
+            self.changes.pop_all()
+            self.process.store.update({node_path(DATA_NODE, self.user_id): prepare_data_for_firebase(self.data)})
+            return
+        loads, _, progress = self.process.mirrors(self.user_id)
+        submit_changes(self.process.queue, [(node_path(DATA_NODE, self.user_id), loads.result(), self.changes.pop_all()),
+                                            (node_path(PROGRESS_NODE, self.user_id), progress, self.progress_changes.pop_all())])
+
+    def save_todos(self, updates):
+        root = node_path(TODO_NODE, self.user_id)
+        if self.write_mode == "full-tree":
+            self.process.store.update({root: self.todos})
+            return
+        submit_changes(self.process.queue, [(root, self.process.mirrors(self.user_id)[1], updates)])
+
+    def record_progress(self, subject, total, revised):
+        if self.write_mode == "full-tree":
+            return
+        for path, value in progress_deltas(subject, total, revised).items():
+            self.progress_changes.record(path, value)
+
+    # -- flows --
+    def add_chapter(self):
+        subject = self.rng.choice(SUBJECTS)
+        entry = datetime.datetime.now() - datetime.timedelta(days=self.rng.randrange(0, 14))
+        chapter = Chapter(new_chapter_id(), f"Load test chapter {len(self.chapters)}", entry, build_reminders(entry))
+        self.data[subject].add(chapter)
+        self.index.add_chapter(subject, chapter)
+        self.changes.record(chapter_path(subject, chapter.chapter_id), chapter.to_firebase())
+        self.record_progress(subject, *chapter_counts(chapter))
+        self.chapters[(subject, chapter.chapter_id)] = {r.reminder_id: r.status for r in chapter.reminders}
+        self.save()
+
+    def toggle_reminder(self):
+        if not self.chapters:
+            return self.add_chapter()
+        subject, chapter_id = self.rng.choice(list(self.chapters))
+        chapter = self.data[subject].get(chapter_id)
+        reminder = self.rng.choice(chapter.reminders)
+        previous = reminder.status
+        reminder.status = "Pending" if previous == "Revised" else "Revised"
+        self.index.status_changed(reminder, previous)
+        self.changes.record(reminder_status_path(subject, chapter, reminder.reminder_id), status_code(reminder.status))
+        self.record_progress(subject, 0, 1 if reminder.status == "Revised" else -1)
+        self.chapters[(subject, chapter_id)][reminder.reminder_id] = reminder.status
+        self.save()
+
+    def add_todo(self):
+        todo_id = new_todo_id()
+        task = {"task": f"Load test task {len(self.todo_status)}", "status": "Pending",
+                "timestamp": datetime.datetime.now().isoformat()}
+        self.todos[todo_id] = task
+        self.todo_status[todo_id] = "Pending"
+        self.save_todos({todo_path(todo_id): task})
+
+    def complete_todo(self):
+        pending = [todo_id for todo_id, status in self.todo_status.items() if status == "Pending"]
+        if not pending:
+            return self.add_todo()
+        todo_id = self.rng.choice(pending)
+        self.todos[todo_id]["status"] = self.todo_status[todo_id] = "Completed"
+        self.save_todos({todo_path(todo_id, "status"): "Completed"})
+
+    def productivity(self):
+        import analytics
+
+        analytics.daily_productivity(analytics.DailyRollup.build(self.data).frame())
+
+
+def _lost_updates(database, sessions, write_mode):
+    # -> (lost writes, progress counter drift)
+    lost, drift = 0, 0
+    by_user = {}
+    for session in sessions:
+        by_user.setdefault(session.user_id, []).append(session)
+    for user_id, user_sessions in by_user.items():
+        stored = database.peek(node_path(DATA_NODE, user_id)) or {}
+        todos = database.peek(node_path(TODO_NODE, user_id)) or {}
+        for session in user_sessions:
+            for (subject, chapter_id), statuses in session.chapters.items():
+                raw = (stored.get(subject) or {}).get(chapter_id)
+                if not raw:
+                    lost += 1 + len(statuses)
+                    continue
+                found = {r_id: status for r_id, _, _, status in decode_chapter(raw)[2]}
+                lost += sum(found.get(r_id) != status for r_id, status in statuses.items())
+            for todo_id, status in session.todo_status.items():
+                lost += (todos.get(todo_id) or {}).get("status") != status
+        if write_mode != "full-tree":
+            recount = count_progress(process_subject_data(stored))
+            counters = database.peek(node_path(PROGRESS_NODE, user_id)) or {}
+            drift += abs(counters.get("total", 0) - recount["total"]) + abs(counters.get("revised", 0) - recount["revised"])
+    return lost, drift
+
+
+def run_step(n_sessions, args, flows):
+    metrics = Metrics()
+    users = [f"student{i}" for i in range(args.users)] or [""]
+    root = {}
+    generate = generate_legacy_subject_chapters_data if args.layout == "legacy" else generate_subject_chapters_data
+    for i, user_id in enumerate(users):
+        node = generate(args.chapters, seed=i)
+        path = node_path(DATA_NODE, user_id).split("/")
+        target = root
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = node
+    database = FakeDatabase(root, latency_ms=args.latency_ms, bandwidth_mbps=args.bandwidth_mbps, metrics=metrics)
+    processes = [AppProcess(database, args.debounce) for _ in range(args.processes)]
+    sessions = [Session(processes[i % len(processes)], users[i % len(users)], args.write_mode, random.Random(args.seed + i))
+                for i in range(n_sessions)]
+    names, weights = zip(*flows)
+    timings = {}
+    errors = []
+    timings_lock = threading.Lock()
+
+    def drive(session):
+        steps = [("open", session.open)] + [(name, getattr(session, name))
+                                            for name in session.rng.choices(names, weights, k=args.interactions)]
+        for name, flow in steps:
+            start = time.perf_counter()
+            try:
+                flow()
+            except Exception as exc:
+                errors.append(f"{name}: {exc!r}")
+                return
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with timings_lock:
+                timings.setdefault(name, []).append(elapsed_ms)
+            if args.think_ms:
+                time.sleep(session.rng.uniform(0, 2 * args.think_ms) / 1000)
+
+    threads = [threading.Thread(target=drive, args=(session,), name=f"session-{i}") for i, session in enumerate(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    unflushed = sum(not process.queue.flush(timeout=FLUSH_TIMEOUT_SECONDS) for process in processes)
+    rss = _rss_mib()
+    for process in processes:
+        process.close()
+
+    lost, drift = _lost_updates(database, sessions, args.write_mode)
+    every = sorted(ms for samples in timings.values() for ms in samples)
+    storage = metrics.snapshot()["storage"]
+    result = {
+        "sessions": n_sessions,
+        "interactions": len(every),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(every) / elapsed, 1) if elapsed else 0.0,
+        **{f"p{int(q * 100)}_ms": round(_quantile(every, q), 2) for q in QUANTILES},
+        "flows": {name: {"count": len(samples), **{f"p{int(q * 100)}_ms": round(_quantile(sorted(samples), q), 2)
+                                                   for q in QUANTILES}}
+                  for name, samples in sorted(timings.items())},
+        "storage_calls": sum(row["count"] for row in storage),
+        "storage_kib": round(sum(row["bytes"] for row in storage) / 1024, 1),
+        "storage": storage,
+        "lost_updates": lost,
+        "counter_drift": drift,
+        "unflushed_processes": unflushed,
+        "errors": errors,
+        "db_kib": round(database.stored_bytes() / 1024, 1),
+        "rss_mib": round(rss, 1),
+    }
+    print(f"{n_sessions:>8} {len(every):>7} {result['throughput']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+          f"{result['p99_ms']:>8.1f} {result['storage_calls']:>7} {result['storage_kib']:>10.1f} {lost:>5} {drift:>5} "
+          f"{result['db_kib']:>9.1f} {result['rss_mib']:>8.1f}")
+    for message in errors[:5]:
+        print(f"  error: {message}", file=sys.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the NEET tracker with many concurrent sessions against an "
+                                                 "in-process Firebase stand-in.")
+    parser.add_argument("--sessions", default=",".join(map(str, DEFAULT_SESSIONS)), help="comma-separated session counts")
+    parser.add_argument("--interactions", type=int, default=20, help="interactions per session after opening the app")
+    parser.add_argument("--users", type=int, default=0,
+                        help="spread sessions over this many students' subtrees; 0 puts every session on the global nodes")
+    parser.add_argument("--processes", type=int, default=1, help="server processes, each with its own mirrors and write queue")
+    parser.add_argument("--chapters", type=int, default=200, help="chapters each node starts with")
+    parser.add_argument("--write-mode", choices=["batched", "full-tree"], default="batched")
+    parser.add_argument("--layout", choices=["current", "legacy"], default="current",
+                        help="how the seeded subjects are stored; legacy is the original array of verbose chapters")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip to the database")
+    parser.add_argument("--bandwidth-mbps", type=float, default=50.0)
+    parser.add_argument("--think-ms", type=float, default=50.0, help="mean pause between a session's interactions")
+    parser.add_argument("--debounce", type=float, default=0.5, help="write-behind debounce window in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    flows = list(FLOWS)
+    if importlib.util.find_spec("pandas") is None:
+        print("  skipping the productivity flow: pandas is not installed", file=sys.stderr)
+        flows = [(name, weight) for name, weight in flows if name != "productivity"]
+
+    print(f"{'sessions':>8} {'actions':>7} {'actions/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls':>7} "
+          f"{'store KiB':>10} {'lost':>5} {'drift':>5} {'db KiB':>9} {'RSS MiB':>8}")
+    results = [run_step(int(n), args, flows) for n in args.sessions.split(",") if n]
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+            f.write("\n")
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import ANCHOR, generate_subject_chapters_data
+from export import csv_bytes
+from models import count_progress, prepare_data_for_firebase, process_subject_data, progress_percent
+from reminder_index import ReminderIndex
+from schema import decode_chapter
+
+# ---------------- Benchmark Runner ----------------
+# Times the hot data-layer functions on synthetic datasets, without a browser
+# or Firebase. Each case reports wall time over several repeats plus retained
+# and peak memory from a separate tracemalloc pass. Results can be saved as a
+# baseline JSON and compared against one to flag regressions.
+
+DEFAULT_SIZES = [100, 1000, 10000]
+NOISE_FLOOR_MS = 1.0
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+SCAN_DAYS = [ANCHOR.date() - datetime.timedelta(days=d) for d in range(30)]
+
+
+def _full_scan_on(data, day):
+    # The per-date scan Today's Revisions used before the reminder index.
+    return [(subject, chapter, reminder)
+            for subject, chapters in data.items()
+            for chapter in chapters
+            for reminder in chapter.reminders
+            if reminder.time.date() == day]
+
+
+def _productivity_chart_series(data):
+    from analytics import DailyRollup, bucketed_productivity, chart_frequency
+
+    frame = DailyRollup.build(data).frame()
+    return bucketed_productivity(frame, chart_frequency(frame))
+
+
+def _verbose(raw):
+    # The pre-v2 verbose chapter dicts with ISO strings, as unmigrated trees still hold them.
+    def chapter(raw_chapter):
+        name, entry, reminders, exams, exam_status, time_spent = decode_chapter(raw_chapter)
+        return {"chapter_name": name, "entry_datetime": entry.isoformat(), "exams_appeared": exams,
+                "exam_status": exam_status, "time_spent": time_spent,
+                "reminders": [{"reminder_id": r_id, "type": r_type, "time": r_time.isoformat(), "status": status}
+                              for r_id, r_type, r_time, status in reminders]}
+
+    return {subject: {chapter_id: chapter(raw_chapter) for chapter_id, raw_chapter in chapters.items()}
+            for subject, chapters in raw.items()}
+
+
+def _productivity_all_time(data):
+    from analytics import DailyRollup, daily_productivity
+
+    return daily_productivity(DailyRollup.build(data).frame())
+
+
+# name -> (setup(raw) -> args, fn(*args))
+CASES = {
+    "process_subject_data": (lambda raw: (raw,), process_subject_data),
+    "process_subject_data_verbose": (lambda raw: (_verbose(raw),), process_subject_data),
+    "prepare_data_for_firebase": (lambda raw: (process_subject_data(raw),), prepare_data_for_firebase),
+    "_prepare_csv_data": (lambda raw: (process_subject_data(raw),), csv_bytes),
+    "_aggregate_productivity_data": (lambda raw: (process_subject_data(raw),), _productivity_all_time),
+    "productivity_chart_series": (lambda raw: (process_subject_data(raw),), _productivity_chart_series),
+    "progress_counter_seed": (lambda raw: (process_subject_data(raw),), count_progress),
+    "calculate_subject_progress": (lambda raw: (count_progress(process_subject_data(raw)),),
+                                   lambda counts: [progress_percent(counts, subject) for subject in counts["subjects"]]),
+    "reminder_scan_30_days_full": (lambda raw: (process_subject_data(raw),),
+                                   lambda data: [_full_scan_on(data, day) for day in SCAN_DAYS]),
+    "reminder_index_build": (lambda raw: (process_subject_data(raw),), ReminderIndex.build),
+    "reminder_scan_30_days_indexed": (lambda raw: (ReminderIndex.build(process_subject_data(raw)),),
+                                      lambda index: [index.on(day) for day in SCAN_DAYS]),
+}
+
+
+def measure(fn, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    result = fn(*args)
+    retained, peak = tracemalloc.get_traced_memory()
+    retained_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del result
+    return {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "retained_kib": round(retained / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_blocks": retained_blocks,
+    }
+
+
+def run(sizes, repeat, cases):
+    results = {}
+    for size in sizes:
+        raw = generate_subject_chapters_data(size)
+        for name in cases:
+            setup, fn = CASES[name]
+            try:
+                args = setup(raw)
+                stats = measure(fn, args, repeat)
+            except ImportError as exc:
+                print(f"  skipped {name} @ {size}: {exc}", file=sys.stderr)
+                continue
+            results.setdefault(name, {})[str(size)] = stats
+            print(f"{name:<32} {size:>7} chapters  {stats['median_ms']:>10.2f} ms  peak {stats['peak_kib']:>10.1f} KiB")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':<32} {'size':>7}  {'baseline ms':>12}  {'current ms':>11}  {'ratio':>6}  {'peak ratio':>10}")
+    for name, by_size in results.items():
+        for size, stats in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if not base:
+                continue
+            ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            peak_ratio = stats["peak_kib"] / base["peak_kib"] if base["peak_kib"] else float("inf")
+            # Sub-millisecond timings are mostly noise, so only memory can regress there.
+            slower = ratio > threshold and base["median_ms"] >= NOISE_FLOOR_MS
+            flag = "  REGRESSION" if slower or peak_ratio > threshold else ""
+            print(f"{name:<32} {size:>7}  {base['median_ms']:>12.2f}  {stats['median_ms']:>11.2f}  {ratio:>6.2f}  {peak_ratio:>10.2f}{flag}")
+            if flag:
+                regressions.append((name, size))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the NEET tracker data layer on synthetic data.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated chapter counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated case names")
+    parser.add_argument("--save", metavar="NAME", help=f"write results to {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio above which a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    cases = [name for name in args.cases.split(",") if name]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    results = run([int(size) for size in args.sizes.split(",")], args.repeat, cases)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        payload = {"python": platform.python_version(), "machine": platform.machine(), "repeat": args.repeat, "results": results}
+        with open(os.path.join(BASELINE_DIR, f"{args.save}.json"), "w") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import datetime
+import random
+
+from models import Chapter, Reminder, prepare_data_for_firebase
+
+# ---------------- Synthetic Dataset Generator ----------------
+# Deterministic, Firebase-shaped subject_chapters_data and todo_data at any
+# size. Chapters are spread over the prep period before ANCHOR, reminders that
+# are already due are mostly revised, and a share of chapters use a custom
+# schedule, like the sidebar checkboxes allow.
+
+ANCHOR = datetime.datetime(2026, 1, 1, 9, 0)
+SUBJECTS = ["Botany", "Zoology", "Physics", "Chemistry"]
+TOPICS = ["Cell Structure", "Plant Kingdom", "Genetics", "Human Physiology", "Kinematics", "Thermodynamics",
+          "Electrostatics", "Optics", "Chemical Bonding", "Equilibrium", "Organic Chemistry", "Coordination Compounds"]
+SCHEDULE = [(1, "12 hour Reminder", datetime.timedelta(hours=12)),
+            (2, "3 days Reminder", datetime.timedelta(days=3)),
+            (3, "5 days Reminder", datetime.timedelta(days=5))]
+EXAM_STATUSES = ["Not Appeared", "Good", "Average", "Needs Revision"]
+
+
+def generate_chapters(n_chapters, days=730, seed=0, revised_ratio=0.8):
+    rng = random.Random(seed)
+    data = {subject: [] for subject in SUBJECTS}
+    for i in range(n_chapters):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        entry = ANCHOR - datetime.timedelta(days=rng.uniform(0, days), minutes=rng.randrange(0, 24 * 60, 5))
+        schedule = SCHEDULE if rng.random() < 0.8 else [item for item in SCHEDULE if rng.random() < 0.7] or SCHEDULE[:1]
+        reminders = []
+        for reminder_id, reminder_type, offset in schedule:
+            due = entry + offset
+            revised = due < ANCHOR and rng.random() < revised_ratio
+            reminders.append(Reminder(reminder_id, reminder_type, due, "Revised" if revised else "Pending"))
+        chapter_id = f"{int(entry.timestamp() * 1000):012x}{i:04x}{seed:06x}"
+        data[subject].append(Chapter(
+            chapter_id, f"{TOPICS[rng.randrange(len(TOPICS))]} {i}", entry, reminders,
+            exams_appeared=rng.randrange(0, 6), exam_status=rng.choice(EXAM_STATUSES), time_spent=rng.randrange(0, 300, 5)))
+    return data
+
+
+def generate_subject_chapters_data(n_chapters, days=730, seed=0, revised_ratio=0.8):
+    return prepare_data_for_firebase(generate_chapters(n_chapters, days, seed, revised_ratio))
+
+
+def _verbose_chapter(chapter):
+    return {"chapter_name": chapter.chapter_name, "entry_datetime": chapter.entry_datetime.isoformat(),
+            "exams_appeared": chapter.exams_appeared, "exam_status": chapter.exam_status, "time_spent": chapter.time_spent,
+            "reminders": [{"reminder_id": r.reminder_id, "type": r.type, "time": r.time.isoformat(), "status": r.status}
+                          for r in chapter.reminders]}
+
+
+def generate_legacy_subject_chapters_data(n_chapters, days=730, seed=0, revised_ratio=0.8):
+    # The original layout: each subject an array of verbose chapters with ISO strings.
+    return {subject: [_verbose_chapter(chapter) for chapter in chapters]
+            for subject, chapters in generate_chapters(n_chapters, days, seed, revised_ratio).items()}
+
+
+def generate_todo_data(n_tasks, seed=0):
+    rng = random.Random(seed)
+    return {
+        f"todo{seed:04x}{i:08x}": {
+            "task": f"Task {i}: {rng.choice(TOPICS)}",
+            "status": "Completed" if rng.random() < 0.5 else "Pending",
+            "timestamp": (ANCHOR - datetime.timedelta(minutes=rng.randrange(0, 3 * 24 * 60))).isoformat(),
+        }
+        for i in range(n_tasks)
+    }
@@ -0,0 +1,74 @@
+import collections
+import hashlib
+import json
+import threading
+
+import pandas as pd
+
+from profiling import LazyModule
+
+# Streamlit has already imported pandas and plotly.io; plotly.express and the
+# figure modules it pulls in are still worth deferring to the first chart.
+px = LazyModule("plotly.express")
+
+# ---------------- Chart Cache ----------------
+# Building a Plotly Express figure (frame, traces, layout) costs far more than
+# drawing it. Figures are kept per process in a small LRU keyed by a hash of
+# the aggregated values they plot, so a rerun, or another session showing the
+# same numbers, reuses the built figure instead of making a new one. Cached
+# figures are shared and must not be modified by callers.
+
+FIGURE_CACHE_SIZE = 64
+
+
+def _digest(key_parts):
+    payload = json.dumps(key_parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FigureCache:
+    def __init__(self, max_entries=FIGURE_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._figures = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key_parts, build):
+        key = _digest(key_parts)
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+            self.misses += 1
+        figure = build()
+        with self._lock:
+            self._figures[key] = figure
+            while len(self._figures) > self._max_entries:
+                self._figures.popitem(last=False)
+        return figure
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._figures), "hits": self.hits, "misses": self.misses}
+
+
+FIGURES = FigureCache()
+
+
+def pie_chart(counts, title, names="Status", values="Count", color_discrete_map=None):
+    # counts: {label: value}; the frame is only built when the figure is.
+    labels, amounts = list(counts), list(counts.values())
+    return FIGURES.get_or_build(
+        ["pie", title, names, values, labels, amounts, color_discrete_map],
+        lambda: px.pie(pd.DataFrame({names: labels, values: amounts}), names=names, values=values, title=title,
+                       color_discrete_map=color_discrete_map))
+
+
+def line_chart(frame, x, y, title):
+    xs, ys = frame[x].tolist(), frame[y].tolist()
+    return FIGURES.get_or_build(
+        ["line", title, x, y, xs, ys],
+        lambda: px.line(frame, x=x, y=y, markers=True, title=title))
@@ -0,0 +1,78 @@
+import concurrent.futures
+import datetime
+import logging
+import threading
+import time
+
+from models import TODO_TIMESTAMP, is_recent_todo, new_todo_id, todo_cutoff
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Todo Compaction ----------------
+# Todos older than the retention window are never shown again. A background
+# job moves them out of the todo node, into an archive node or nowhere, in
+# batches of multi-path updates. Loads only query the retention window either
+# way, but compaction keeps the node itself (and with it listen() snapshots
+# and the index the range query scans) from growing for as long as the app
+# runs.
+
+COMPACT_INTERVAL_SECONDS = 3600
+COMPACT_BATCH = 500
+_WORKER = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="todo-compaction")
+
+
+class TodoCompactor:
+    def __init__(self, store, path, archive_path=None, interval_seconds=COMPACT_INTERVAL_SECONDS, batch=COMPACT_BATCH):
+        self._store = store
+        self._path = path
+        self._archive_path = archive_path
+        self._interval = interval_seconds
+        self._batch = batch
+        self._lock = threading.Lock()
+        self._future = None
+        self._last_run = float("-inf")
+        self.removed = 0
+
+    def maybe_run(self):
+        # Cheap enough to call on every rerun: starts a pass when one is due and none is running.
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return self._future
+            if time.monotonic() - self._last_run < self._interval:
+                return None
+            self._last_run = time.monotonic()
+            self._future = _WORKER.submit(self._run_logged)
+            return self._future
+
+    def _run_logged(self):
+        try:
+            return self.run()
+        except Exception:
+            logger.exception("Compacting %s failed; retrying next interval", self._path)
+            return 0
+
+    def run(self, now=None):
+        now = now or datetime.datetime.now()
+        cutoff = todo_cutoff(now)
+        removed = 0
+        while True:
+            # end_at is inclusive and also returns records without a timestamp, which are never shown.
+            batch = self._store.query_by_child(self._path, TODO_TIMESTAMP, end_at=cutoff, limit=self._batch)
+            expired = {key: todo for key, todo in batch.items() if not is_recent_todo(todo, now)}
+            if not expired:
+                break
+            updates = {f"{self._path}/{key}": None for key in expired}
+            if self._archive_path:
+                for key, todo in expired.items():
+                    if isinstance(todo, dict) and todo.get("task"):
+                        # Legacy list indexes would collide in the archive, so those get IDs.
+                        archive_key = new_todo_id() if key.isdigit() else key
+                        updates[f"{self._archive_path}/{archive_key}"] = todo
+            self._store.update(updates)
+            removed += len(expired)
+            if len(batch) < self._batch:
+                break
+        if removed:
+            logger.info("Compacted %d expired todos from %s", removed, self._path)
+        self.removed += removed
+        return removed
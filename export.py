@@ -0,0 +1,77 @@
+import csv
+import datetime
+import io
+import zipfile
+
+# ---------------- Data Export ----------------
+# Exports are built only when requested. CSV rows are written straight from
+# the chapter records in fixed-size chunks, with no intermediate row dicts or
+# DataFrame; Parquet output holds separate chapters and reminders tables.
+
+CSV_COLUMNS = ["Subject", "Chapter Name", "Entry Date", "Reminder Time", "Status", "Exams Appeared", "Exam Status", "Time Spent (minutes)"]
+CSV_CHUNK_ROWS = 2000
+
+
+def _display_datetime(value):
+    return value.strftime("%d/%m/%y %I:%M %p") if isinstance(value, datetime.datetime) else value
+
+
+def iter_csv_chunks(data, chunk_rows=CSV_CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS)
+    pending = 0
+    for subject, chapters in data.items():
+        for chapter in chapters:
+            entry_date = _display_datetime(chapter.entry_datetime)
+            for reminder in chapter.reminders:
+                writer.writerow([subject, chapter.chapter_name, entry_date, _display_datetime(reminder.time), reminder.status,
+                                 chapter.exams_appeared, chapter.exam_status, chapter.time_spent])
+                pending += 1
+                if pending >= chunk_rows:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def csv_bytes(data):
+    out = io.BytesIO()
+    for chunk in iter_csv_chunks(data):
+        out.write(chunk)
+    return out.getvalue()
+
+
+def parquet_bytes(data, compression="zstd"):
+    # Needs pyarrow (or fastparquet) next to pandas; callers handle the ImportError.
+    import pandas as pd
+
+    chapter_cols = {name: [] for name in ("subject", "chapter_id", "chapter_name", "entry_datetime", "exams_appeared", "exam_status", "time_spent")}
+    reminder_cols = {name: [] for name in ("chapter_id", "reminder_id", "type", "time", "status")}
+    for subject, chapters in data.items():
+        for chapter in chapters:
+            chapter_cols["subject"].append(subject)
+            chapter_cols["chapter_id"].append(chapter.chapter_id)
+            chapter_cols["chapter_name"].append(chapter.chapter_name)
+            chapter_cols["entry_datetime"].append(chapter.entry_datetime)
+            chapter_cols["exams_appeared"].append(chapter.exams_appeared)
+            chapter_cols["exam_status"].append(chapter.exam_status)
+            chapter_cols["time_spent"].append(chapter.time_spent)
+            for reminder in chapter.reminders:
+                reminder_cols["chapter_id"].append(chapter.chapter_id)
+                reminder_cols["reminder_id"].append(reminder.reminder_id)
+                reminder_cols["type"].append(reminder.type)
+                reminder_cols["time"].append(reminder.time)
+                reminder_cols["status"].append(reminder.status)
+
+    chapters_df = pd.DataFrame(chapter_cols).astype({"subject": "category", "exam_status": "string"})
+    chapters_df["entry_datetime"] = pd.to_datetime(chapters_df["entry_datetime"], errors="coerce")
+    reminders_df = pd.DataFrame(reminder_cols).astype({"type": "category", "status": "category"})
+    reminders_df["time"] = pd.to_datetime(reminders_df["time"], errors="coerce")
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, frame in (("chapters.parquet", chapters_df), ("reminders.parquet", reminders_df)):
+            archive.writestr(name, frame.to_parquet(index=False, compression=compression))
+    return out.getvalue()
@@ -0,0 +1,143 @@
+import csv
+import datetime
+import io
+import json
+
+from models import REMINDER_SCHEDULE, Chapter, build_reminders, new_chapter_id
+
+# ---------------- Bulk Chapter Import ----------------
+# Reads a syllabus file (CSV with a header row, or JSON) into chapters, with
+# reminders built from the same schedule the sidebar form uses. Every row is
+# validated first; bad rows are reported by line and left out, and the caller
+# writes the good ones in one batch.
+#
+# CSV columns (header names are case-insensitive; only the first two are required):
+#   subject, chapter_name, entry_datetime, reminders, exams_appeared, exam_status, time_spent
+# JSON is either a list of objects with those keys or {subject: [chapter name or object, ...]}.
+# reminders lists schedule entries to use, e.g. "12h;3d" or "1,3"; empty means all of them.
+
+MAX_IMPORT_ROWS = 5000
+COLUMN_ALIASES = {
+    "subject": "subject",
+    "chapter": "chapter_name", "chapter name": "chapter_name", "chapter_name": "chapter_name", "name": "chapter_name",
+    "entry": "entry_datetime", "entry date": "entry_datetime", "entry_datetime": "entry_datetime", "date": "entry_datetime",
+    "reminders": "reminders", "schedule": "reminders",
+    "exams appeared": "exams_appeared", "exams_appeared": "exams_appeared",
+    "exam status": "exam_status", "exam_status": "exam_status",
+    "time spent": "time_spent", "time_spent": "time_spent", "time spent (minutes)": "time_spent",
+}
+DATETIME_FORMATS = ("%d/%m/%y %I:%M %p", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d/%m/%y")
+REMINDER_ALIASES = {"12h": 1, "3d": 2, "5d": 3}
+REMINDER_ALIASES.update({str(reminder_id): reminder_id for reminder_id, _, _ in REMINDER_SCHEDULE})
+REMINDER_ALIASES.update({reminder_type.lower(): reminder_id for reminder_id, reminder_type, _ in REMINDER_SCHEDULE})
+
+
+def _read_records(content, file_name):
+    # -> [(line, {column: value})]
+    text = content.decode("utf-8-sig") if isinstance(content, bytes) else content
+    if file_name.lower().endswith(".json"):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            records = []
+            for subject, chapters in data.items():
+                if not isinstance(chapters, list):
+                    raise ValueError(f"chapters for {subject!r} must be a list")
+                for chapter in chapters:
+                    record = dict(chapter) if isinstance(chapter, dict) else {"chapter_name": chapter}
+                    records.append({"subject": subject, **record})
+        elif isinstance(data, list):
+            records = data
+        else:
+            raise ValueError("JSON must be a list of chapters or an object keyed by subject")
+        return [(number, record if isinstance(record, dict) else {}) for number, record in enumerate(records, 1)]
+    reader = csv.DictReader(io.StringIO(text))
+    # Line 1 is the header.
+    return [(number, row) for number, row in enumerate(reader, 2)]
+
+
+def _normalise(record):
+    row = {}
+    for key, value in record.items():
+        column = COLUMN_ALIASES.get(str(key or "").strip().lower())
+        if column and value not in (None, ""):
+            row[column] = value.strip() if isinstance(value, str) else value
+    return row
+
+
+def _local(value):
+    # Stored times are naive local time, so an ISO offset such as +05:30 is converted away.
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return _local(value)
+    try:
+        return _local(datetime.datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        pass
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"unrecognised date {value!r}")
+
+
+def _parse_reminders(value):
+    items = value if isinstance(value, list) else str(value).replace(";", ",").split(",")
+    ids = set()
+    for item in items:
+        key = str(item).strip().lower()
+        if not key:
+            continue
+        if key not in REMINDER_ALIASES:
+            raise ValueError(f"unknown reminder {item!r}")
+        ids.add(REMINDER_ALIASES[key])
+    return ids or None
+
+
+def _parse_count(row, column):
+    value = row.get(column, 0)
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} must be a whole number, got {value!r}")
+    if count < 0:
+        raise ValueError(f"{column} cannot be negative")
+    return count
+
+
+def parse_syllabus(content, file_name, subjects, default_entry, existing=None):
+    # -> ([(subject, Chapter)], [error message]). existing: {subject: set of chapter names}
+    # already stored, which are skipped like duplicates within the file.
+    try:
+        records = _read_records(content, file_name)
+    except (UnicodeDecodeError, ValueError, csv.Error) as exc:
+        return [], [f"Could not read {file_name}: {exc}"]
+    if len(records) > MAX_IMPORT_ROWS:
+        return [], [f"{file_name} has {len(records)} rows; the limit is {MAX_IMPORT_ROWS}."]
+    seen = {subject: set(names) for subject, names in (existing or {}).items()}
+    chapters, errors = [], []
+    for line, record in records:
+        row = _normalise(record)
+        try:
+            subject = row.get("subject")
+            if subject not in subjects:
+                raise ValueError(f"unknown subject {subject!r} (expected one of {', '.join(subjects)})")
+            name = str(row.get("chapter_name") or "").strip()
+            if not name:
+                raise ValueError("missing chapter name")
+            if name in seen.setdefault(subject, set()):
+                raise ValueError(f"'{name}' is already in {subject}")
+            entry = _parse_datetime(row["entry_datetime"]) if "entry_datetime" in row else default_entry
+            reminder_ids = _parse_reminders(row["reminders"]) if "reminders" in row else None
+            chapter = Chapter(new_chapter_id(), name, entry, build_reminders(entry, reminder_ids),
+                              _parse_count(row, "exams_appeared"), str(row.get("exam_status", "Not Appeared")),
+                              _parse_count(row, "time_spent"))
+        except ValueError as exc:
+            errors.append(f"Line {line}: {exc}")
+            continue
+        seen[subject].add(name)
+        chapters.append((subject, chapter))
+    return chapters, errors
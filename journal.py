@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Write-Ahead Journal ----------------
+# Every write is appended to a local JSON-lines file, and fsync'd, before the
+# UI moves on. Entries are {"seq": n, "updates": {...}}; {"ack": n} marks
+# everything up to n as applied remotely. Unacknowledged entries survive a
+# crash or restart and are handed back by pending(). Replaying them is safe:
+# updates are plain sets, and increments are kept apart in
+# {"increments": {...}, "id": ...} and only re-sent when the marker written
+# with them is missing (see persistence.WriteBehindQueue). One journal file
+# belongs to one server process.
+
+COMPACT_AFTER_LINES = 500
+
+
+class Journal:
+    def __init__(self, path, fsync=True, compact_after=COMPACT_AFTER_LINES):
+        self._path = path
+        self._fsync = fsync
+        self._compact_after = compact_after
+        self._lock = threading.Lock()
+        self._unacked = []
+        self._seq = 0
+        self._lines = 0
+        self._load()
+        self._recovered = [json.loads(line) for _, line in self._unacked]
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        entries, acked = [], 0
+        with open(self._path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append; nothing after it was acknowledged.
+                    logger.warning("Skipping unreadable journal line %d in %s", number, self._path)
+                    continue
+                if "ack" in entry:
+                    acked = max(acked, entry["ack"])
+                else:
+                    entries.append((entry["seq"], line.rstrip("\n")))
+                    self._seq = max(self._seq, entry["seq"])
+        self._unacked = [(seq, line) for seq, line in entries if seq > acked]
+
+    def pending(self):
+        # Entries that were not acknowledged before the last shutdown, oldest first.
+        return list(self._recovered)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._unacked)
+
+    def _write(self, line):
+        self._file.write(line + "\n")
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+        self._lines += 1
+
+    def append(self, entry):
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({"seq": self._seq, **entry}, separators=(",", ":"))
+            self._write(line)
+            self._unacked.append((self._seq, line))
+            return self._seq
+
+    def ack(self, seq):
+        with self._lock:
+            self._unacked = [(s, line) for s, line in self._unacked if s > seq]
+            if not self._unacked:
+                # Everything is applied: start the file over.
+                self._file.truncate(0)
+                if self._fsync:
+                    os.fsync(self._file.fileno())
+                self._lines = 0
+            elif self._lines >= self._compact_after:
+                self._compact()
+            else:
+                self._write(json.dumps({"ack": seq}))
+
+    def _compact(self):
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as tmp:
+            for _, line in self._unacked:
+                tmp.write(line + "\n")
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        self._file.close()
+        os.replace(tmp_path, self._path)
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._lines = len(self._unacked)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -1,26 +1,88 @@
-import streamlit as st
-import datetime
-import pandas as pd
-import plotly.express as px
-import random
-import os
-import json
+import time
+from profiling import STARTUP, PhaseTimer
+
+RUN_STARTED = time.perf_counter()
+# "imports" is mostly Streamlit itself, which already pulls in pandas, pyarrow and
+# plotly.io. Deferring pandas or the pandas-based analytics would save nothing, so
+# they are imported here; only plotly.express still loads on first use (charts.py).
+with STARTUP.phase("imports"):
+    import streamlit as st
+    import pandas as pd
+    import analytics
+    import datetime
+    import random
+    import os
+    import json
+    import functools
+    from metrics import METRICS, RerunProfiler
+    from persistence import ChangeSet, WriteBehindQueue, submit_changes
+    from journal import Journal
+    from schema import status_code
+    from reminder_index import ReminderIndex
+    from export import csv_bytes, parquet_bytes
+    from importer import parse_syllabus
+    from charts import FIGURES, line_chart, pie_chart
+    from models import (REMINDER_SCHEDULE, Chapter, SubjectChapters, build_reminders, new_chapter_id, chapter_counts, chapter_path, chapter_field_path,
+                        count_progress, merge_subject_data, progress_deltas, progress_percent, reminder_status_path, new_todo_id,
+                        todo_path)
+    from shared_cache import MirrorRegistry, SharedProgress, SharedSubjects, SharedTodos, SubjectLoads, load_in_background
+    from compaction import TodoCompactor
+    from storage import (CHAPTER_ARCHIVE_NODE, DATA_NODE, PROGRESS_NODE, TODO_ARCHIVE_NODE, TODO_NODE, USER_ID_PATTERN,
+                         InstrumentedBackend, create_backend, node_path)
+
+# ---------------- Storage Configuration ----------------
+# STORAGE_BACKEND picks "firebase" (default) or "sqlite"; the SQLite backend keeps
+# everything in SQLITE_PATH and needs no Firebase project or credentials.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firebase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "neet_prep.db")
+# With SHARED_CACHE_LISTEN=1 each mirrored node also keeps a listen() stream open,
+# so writes from other server processes show up without a reload.
+SHARED_CACHE_LISTEN = os.getenv("SHARED_CACHE_LISTEN", "0") == "1"
+# Local write-ahead journal for unsent writes; set JOURNAL_PATH="" to turn it off.
+# A journal belongs to one app instance, so the default is named after the server
+# port: instances sharing a host never replay each other's writes, and a
+# restarted instance finds its own.
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", f"neet_prep.{st.get_option('server.port')}.journal")
+# Expired todos are moved to todo_archive by default; ARCHIVE_EXPIRED_TODOS=0 deletes them instead.
+ARCHIVE_EXPIRED_TODOS = os.getenv("ARCHIVE_EXPIRED_TODOS", "1") == "1"
+# Chapters with every reminder revised move to chapter_archive once they were entered
+# more than ARCHIVE_CHAPTERS_AFTER_DAYS ago (checked when a user's data is first
+# loaded in a process); 0 keeps them all in the working set.
+ARCHIVE_CHAPTERS_AFTER_DAYS = int(os.getenv("ARCHIVE_CHAPTERS_AFTER_DAYS", "60"))
+# Mirrors are kept for this many users per process; the least recently used user's are dropped beyond it.
+MIRRORED_USERS = int(os.getenv("MIRRORED_USERS", "50"))
+# METRICS=1 times each rerun's sections and every storage call; the numbers are
+# shown in a debug panel that only appears with ?debug=1 in the URL.
+METRICS_ENABLED = os.getenv("METRICS", "0") == "1"
+PROFILE = RerunProfiler(enabled=METRICS_ENABLED)
+
+def profiled(section):
+    # Times every call of the decorated function as a section of the current rerun.
+    def decorate(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with PROFILE.section(section):
+                return fn(*args, **kwargs)
+        return run
+    return decorate
 
 # ---------------- Firebase Initialization ----------------
-import firebase_admin
-from firebase_admin import credentials, db
-
-firebase_key_json = os.getenv("FIREBASE_KEY")
-if firebase_key_json:
-    firebase_key = json.loads(firebase_key_json)
-    cred = credentials.Certificate(firebase_key)
-    # Initialize Firebase only if not already initialized
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred, {
-            "databaseURL": "https://kavya-6ed82-default-rtdb.firebaseio.com/"
-        })
-else:
-    st.error("Firebase key is missing. Please set the FIREBASE_KEY environment variable.")
+if STORAGE_BACKEND == "firebase":
+    with STARTUP.phase("firebase init"):
+        import firebase_admin
+        from firebase_admin import credentials
+
+        firebase_key_json = os.getenv("FIREBASE_KEY")
+        if firebase_key_json:
+            firebase_key = json.loads(firebase_key_json)
+            cred = credentials.Certificate(firebase_key)
+            # Initialize Firebase only if not already initialized
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(cred, {
+                    "databaseURL": "https://kavya-6ed82-default-rtdb.firebaseio.com/"
+                })
+        else:
+            st.error("Firebase key is missing. Please set the FIREBASE_KEY environment variable.")
 
 # ---------------- Set Page Config ----------------
 st.set_page_config(
@@ -132,82 +194,275 @@ st.markdown(f"""
     """, unsafe_allow_html=True)
 
 # ---------------- Firebase Persistence Functions ----------------
-# These functions replace local file persistence.
+# These functions replace local file persistence. They go through the configured
+# storage backend, which is Firebase unless STORAGE_BACKEND says otherwise.
 
-def process_subject_data(data):
-    for subject, chapters in data.items():
-        for chapter in chapters:
-            if isinstance(chapter.get("entry_datetime"), str):
-                try:
-                    chapter["entry_datetime"] = datetime.datetime.fromisoformat(chapter["entry_datetime"])
-                except Exception:
-                    pass
-            for reminder in chapter.get("reminders", []):
-                if isinstance(reminder.get("time"), str):
-                    try:
-                        reminder["time"] = datetime.datetime.fromisoformat(reminder["time"])
-                    except Exception:
-                        pass
-    return data
+@st.experimental_singleton
+def get_storage():
+    with STARTUP.phase("storage backend"):
+        store = create_backend(STORAGE_BACKEND, SQLITE_PATH)
+    return InstrumentedBackend(store, METRICS) if METRICS_ENABLED else store
 
-def prepare_data_for_firebase(data):
-    new_data = {}
-    for subject, chapters in data.items():
-        new_chapters = []
-        for chapter in chapters:
-            new_chapter = chapter.copy()
-            if isinstance(new_chapter.get("entry_datetime"), datetime.datetime):
-                new_chapter["entry_datetime"] = new_chapter["entry_datetime"].isoformat()
-            new_reminders = []
-            for reminder in new_chapter.get("reminders", []):
-                new_reminder = reminder.copy()
-                if isinstance(new_reminder.get("time"), datetime.datetime):
-                    new_reminder["time"] = new_reminder["time"].isoformat()
-                new_reminders.append(new_reminder)
-            new_chapter["reminders"] = new_reminders
-            new_chapters.append(new_chapter)
-        new_data[subject] = new_chapters
-    return new_data
+# Each student's data lives under users/<id>/ and is chosen with ?user=<id>; without
+# one the app uses the original global nodes. A session only ever reads its own
+# user's subtree.
+def get_current_user():
+    user_id = st.experimental_get_query_params().get("user", [""])[0].strip()
+    return user_id if USER_ID_PATTERN.fullmatch(user_id) else ""
+
+def data_path(path=""):
+    root = node_path(DATA_NODE, st.session_state['user_id'])
+    return f"{root}/{path}" if path else root
+
+# A user's nodes are mirrored once per server process the first time any session
+# opens them, and updated with every write this process makes; sessions start
+# from a copy of the mirror rather than a fresh download. The mirrors load on
+# background threads, concurrently with each other and subject by subject, so
+# the page can render while the first download runs.
+@st.experimental_singleton
+def get_mirrors():
+    return MirrorRegistry(MIRRORED_USERS)
+
+MIRRORED_NODES = (DATA_NODE, CHAPTER_ARCHIVE_NODE, TODO_NODE, PROGRESS_NODE)
+EVICTED_FLUSH_TIMEOUT_SECONDS = 10
+
+def _user_mirror(user_id, kind, factory):
+    # A mirror is read from storage when its user is first seen, or seen again after
+    # being evicted; writes of theirs still in the queue from before then land first,
+    # so the new mirror does not miss (and chapter_is_stored does not drop) them.
+    mirrors = get_mirrors()
+    if not mirrors.has(user_id, kind):
+        queue = get_write_queue()
+        if queue.has_pending([node_path(node, user_id) for node in MIRRORED_NODES]):
+            queue.flush(timeout=EVICTED_FLUSH_TIMEOUT_SECONDS)
+    return mirrors.get(user_id, kind, factory)
+
+# Chapters moved to the archive go out through the write queue like any other write;
+# sessions still holding one drop it on their next write (see chapter_is_stored).
+def get_shared_subjects_loader(user_id):
+    archive_path = node_path(CHAPTER_ARCHIVE_NODE, user_id) if ARCHIVE_CHAPTERS_AFTER_DAYS > 0 else None
+    return _user_mirror(user_id, "subjects", lambda: SubjectLoads(
+        "subjects load", get_storage(), node_path(DATA_NODE, user_id), SHARED_CACHE_LISTEN,
+        archive_path, datetime.timedelta(days=ARCHIVE_CHAPTERS_AFTER_DAYS), get_write_queue().submit))
+
+ARCHIVE_FLUSH_TIMEOUT_SECONDS = 10
+
+def _read_archive(subjects, queue, store, path):
+    # The subjects load may have just queued a move into the archive; let it land first.
+    subjects.result()
+    queue.flush(timeout=ARCHIVE_FLUSH_TIMEOUT_SECONDS)
+    return SharedSubjects(store, path)
+
+# The archive is only read when a view covering all history needs it.
+def get_chapter_archive_loader(user_id):
+    return _user_mirror(user_id, "archive", lambda: load_in_background(
+        "archive load", _read_archive, get_shared_subjects_loader(user_id), get_write_queue(),
+        get_storage(), node_path(CHAPTER_ARCHIVE_NODE, user_id)))
+
+def get_shared_todos_loader(user_id):
+    return _user_mirror(user_id, "todos", lambda: load_in_background(
+        "todos load", SharedTodos, get_storage(), node_path(TODO_NODE, user_id), SHARED_CACHE_LISTEN))
+
+def get_shared_progress_loader(user_id):
+    return _user_mirror(user_id, "progress", lambda: load_in_background(
+        "progress load", SharedProgress, get_storage(), node_path(PROGRESS_NODE, user_id), SHARED_CACHE_LISTEN))
+
+def get_todo_compactor(user_id):
+    archive_path = node_path(TODO_ARCHIVE_NODE, user_id) if ARCHIVE_EXPIRED_TODOS else None
+    return get_mirrors().get(user_id, "todo compactor", lambda: TodoCompactor(
+        get_storage(), node_path(TODO_NODE, user_id), archive_path))
+
+def _wait_for(loader, user_id):
+    load = loader(user_id)
+    try:
+        return load.result()
+    except Exception:
+        # Don't keep a failed load cached; the next run retries it. Other users' mirrors stay.
+        get_mirrors().discard(user_id, load)
+        raise
+
+def get_shared_subjects(user_id):
+    return _wait_for(get_shared_subjects_loader, user_id)
+
+def get_shared_todos(user_id):
+    return _wait_for(get_shared_todos_loader, user_id)
+
+def get_shared_progress(user_id):
+    return _wait_for(get_shared_progress_loader, user_id)
+
+def get_chapter_archive(user_id):
+    return _wait_for(get_chapter_archive_loader, user_id)
+
+def _revalidated(shared):
+    # Pick up other writers' changes via an ETag check. Skipped while this process
+    # still has writes queued, since the stored node does not have them yet.
+    sync = get_write_queue().stats()
+    if not sync['queue_depth'] and not sync['in_flight']:
+        shared.refresh()
+    return shared
 
 def load_data_from_firebase():
-    ref = db.reference("subject_chapters_data")
-    data = ref.get()
-    if data is None:
-        return {subject: [] for subject in SUBJECT_CHOICES}
-    return process_subject_data(data)
+    data = _revalidated(get_shared_subjects(st.session_state['user_id'])).snapshot()
+    # Firebase drops empty nodes, so subjects without chapters come back missing.
+    for subject in SUBJECT_CHOICES:
+        data.setdefault(subject, SubjectChapters())
+    return data
+
+def load_archive():
+    # {subject: SubjectChapters} of archived chapters, read once per session and never written by it.
+    if 'chapter_archive' not in st.session_state:
+        with st.spinner("Loading archived chapters..."):
+            st.session_state['chapter_archive'] = _revalidated(get_chapter_archive(st.session_state['user_id'])).snapshot()
+    return st.session_state['chapter_archive']
+
+def record_change(path, value):
+    # Paths are relative to the user's subject node; values must already be Firebase-ready.
+    st.session_state['pending_changes'].record(path, value)
+    st.session_state['data_version'] += 1
+
+# Writes are journaled to local disk and handed to a background worker that merges
+# and batches them, so UI interactions never wait on Firebase. Pending writes are
+# flushed at shutdown, and anything left in the journal is replayed on restart.
+REPLAY_FLUSH_TIMEOUT_SECONDS = 30
+
+@st.experimental_singleton
+def get_write_queue():
+    journal = Journal(JOURNAL_PATH) if JOURNAL_PATH else None
+    queue = WriteBehindQueue(get_storage(), journal=journal)
+    # Replayed writes are in no mirror, so they land before the first mirror reads the
+    # nodes. If storage is unreachable, the mirrors pick them up on a later refresh.
+    if queue.stats()['queue_depth']:
+        queue.flush(timeout=REPLAY_FLUSH_TIMEOUT_SECONDS)
+    return queue
 
 def save_data_to_firebase():
-    data = st.session_state['subject_chapters_data']
-    data_prepared = prepare_data_for_firebase(data)
-    ref = db.reference("subject_chapters_data")
-    ref.set(data_prepared)
+    # Chapter writes and the progress increments they imply go out in one multi-path update.
+    changes, progress_changes = st.session_state['pending_changes'], st.session_state['pending_progress']
+    if not changes and not progress_changes:
+        return
+    user_id = st.session_state['user_id']
+    submit_changes(get_write_queue(), [(data_path(), get_shared_subjects(user_id), changes.pop_all()),
+                                       (node_path(PROGRESS_NODE, user_id), get_shared_progress(user_id), progress_changes.pop_all())])
+
+def load_progress_from_firebase():
+    # The node is created from a full recount the first time a user's data is
+    # opened without one; after that every write keeps it current.
+    shared = _revalidated(get_shared_progress(st.session_state['user_id']))
+    counts = shared.snapshot()
+    if counts is None:
+        # Archived chapters still count towards progress.
+        counts = shared.seed(count_progress(merge_subject_data(load_data_from_firebase(), load_archive())))
+    return counts
+
+def record_progress(subject, total, revised):
+    # Applies reminder count deltas to the session's counters and queues them as increments.
+    counts = st.session_state['progress']
+    subject_counts = counts.setdefault("subjects", {}).setdefault(subject, {})
+    for key, delta in (("total", total), ("revised", revised)):
+        subject_counts[key] = subject_counts.get(key, 0) + delta
+        counts[key] = counts.get(key, 0) + delta
+    for path, value in progress_deltas(subject, total, revised).items():
+        st.session_state['pending_progress'].record(path, value)
 
 def load_todo_from_firebase():
-    ref = db.reference("todo_data")
-    data = ref.get()
-    if data is None:
-        return []
-    current_time_dt = datetime.datetime.now()
-    filtered_tasks = [
-        task for task in data
-        if current_time_dt - datetime.datetime.fromisoformat(task["timestamp"]) < datetime.timedelta(days=1)
-    ]
-    return filtered_tasks
-
-def save_todo_to_firebase(todo_list):
-    ref = db.reference("todo_data")
-    ref.set(todo_list)
+    # {todo_id: task} for the retention window, oldest first.
+    return _revalidated(get_shared_todos(st.session_state['user_id'])).snapshot()
+
+def save_todo_changes(updates):
+    # Paths are relative to the user's todo node: a whole task, one of its fields, or None to delete it.
+    user_id = st.session_state['user_id']
+    submit_changes(get_write_queue(), [(node_path(TODO_NODE, user_id), get_shared_todos(user_id), updates)])
 
 # ---------------- Session State Initialization ----------------
 SUBJECT_CHOICES = ["Botany", "Zoology", "Physics", "Chemistry"]
 THEME_OPTIONS = ["Light Mode", "Dark Mode", "Colorful Mode"]
 
-if 'subject_chapters_data' not in st.session_state:
-    st.session_state['subject_chapters_data'] = load_data_from_firebase()
+current_user = get_current_user()
+if st.session_state.get('user_id') != current_user:
+    # A different student: drop everything loaded for the previous one.
+    for key in ('subject_chapters_data', 'reminder_index', 'daily_rollup', 'chapter_archive', 'archive_rollup', 'todo_list',
+                'progress', 'pending_changes', 'pending_progress', 'data_version', 'view_state', *(f"chapter_select_{subject}" for subject in SUBJECT_CHOICES)):
+        st.session_state.pop(key, None)
+    st.session_state['user_id'] = current_user
+if 'session_timer' not in st.session_state:
+    st.session_state['session_timer'] = PhaseTimer()
+    st.session_state['session_started'] = RUN_STARTED
+# Start (or join) this user's loads now; ensure_session_data() waits for them
+# once the sidebar and header are on screen. The write queue comes first, so any
+# journal replay is in storage before they read it.
+get_write_queue()
+get_shared_subjects_loader(current_user)
+get_shared_todos_loader(current_user)
+get_shared_progress_loader(current_user)
+get_todo_compactor(current_user).maybe_run()
 if 'app_theme' not in st.session_state:
     st.session_state['app_theme'] = "Light Mode"
-if 'todo_list' not in st.session_state:
-    st.session_state['todo_list'] = load_todo_from_firebase()
+if 'pending_changes' not in st.session_state:
+    st.session_state['pending_changes'] = ChangeSet()
+    st.session_state['pending_progress'] = ChangeSet()
+if 'data_version' not in st.session_state:
+    st.session_state['data_version'] = 0
+    st.session_state['export_cache'] = {}
+if 'view_state' not in st.session_state:
+    st.session_state['view_state'] = {}
+
+@profiled("data wait")
+def ensure_session_data():
+    # Everything: all subjects with their reminder index, the todos and the progress counters.
+    if all(key in st.session_state for key in ('reminder_index', 'todo_list', 'progress')):
+        return
+    with st.session_state['session_timer'].phase("wait for data"), st.spinner("Loading your data..."):
+        data = st.session_state.setdefault('subject_chapters_data', {})
+        # Subjects a subject view already loaded are kept, along with any edits made to them.
+        for subject, chapters in load_data_from_firebase().items():
+            data.setdefault(subject, chapters)
+        st.session_state['reminder_index'] = ReminderIndex.build(data)
+        if 'todo_list' not in st.session_state:
+            st.session_state['todo_list'] = load_todo_from_firebase()
+        if 'progress' not in st.session_state:
+            st.session_state['progress'] = load_progress_from_firebase()
+    # The productivity rollup is built the first time that view is shown instead.
+    st.session_state.pop('daily_rollup', None)
+
+@profiled("data wait")
+def ensure_subject_data(subject):
+    # A subject view only needs its own subject and the progress counters, so it
+    # renders as soon as that subject is in instead of waiting for the rest.
+    data = st.session_state.setdefault('subject_chapters_data', {})
+    if subject in data and 'progress' in st.session_state:
+        return
+    loads = get_shared_subjects_loader(st.session_state['user_id'])
+    if loads.done():
+        ensure_session_data()
+        return
+    with st.session_state['session_timer'].phase("wait for subject"), st.spinner(f"Loading {subject}..."):
+        if subject not in data:
+            data[subject] = loads.subject(subject) or SubjectChapters()
+        if 'progress' not in st.session_state:
+            st.session_state['progress'] = load_progress_from_firebase()
+
+def get_daily_rollup(include_archive=False):
+    if st.session_state.get('daily_rollup') is None:
+        st.session_state['daily_rollup'] = analytics.DailyRollup.build(st.session_state['subject_chapters_data'])
+    if not include_archive:
+        return st.session_state['daily_rollup']
+    if st.session_state.get('archive_rollup') is None:
+        st.session_state['archive_rollup'] = analytics.DailyRollup.build(load_archive())
+    return st.session_state['daily_rollup'].merged(st.session_state['archive_rollup'])
+
+def view_key(key, options=None):
+    # Restores a widget's value from the last time its view was shown.
+    saved = st.session_state['view_state'].setdefault(st.session_state.get('active_view'), {})
+    value = saved.setdefault(key, None)
+    if key not in st.session_state and value is not None and (options is None or value in options):
+        st.session_state[key] = value
+    return key
+
+def save_view_state(view):
+    saved = st.session_state['view_state'].get(view, {})
+    for key in saved:
+        if key in st.session_state:
+            saved[key] = st.session_state[key]
 
 # ---------------- Color Palette (for CSV export and charts) ----------------
 PRIMARY_COLOR = "#007BFF"
@@ -238,97 +493,184 @@ study_tips = [
 ]
 
 # ---------------- Helper Functions ----------------
-def _create_default_reminders(entry_datetime):
-    return [
-        {"reminder_id": 1, "type": "12 hour Reminder", "time": entry_datetime + datetime.timedelta(hours=12), "status": "Pending"},
-        {"reminder_id": 2, "type": "3 days Reminder", "time": entry_datetime + datetime.timedelta(days=3), "status": "Pending"},
-        {"reminder_id": 3, "type": "5 days Reminder", "time": entry_datetime + datetime.timedelta(days=5), "status": "Pending"},
-    ]
-
 def _prepare_csv_data(data):
-    all_data = []
-    for subject, chapters in data.items():
-        for chapter in chapters:
-            for reminder in chapter['reminders']:
-                all_data.append({
-                    "Subject": subject,
-                    "Chapter Name": chapter['chapter_name'],
-                    "Entry Date": chapter['entry_datetime'].strftime("%d/%m/%y %I:%M %p") if isinstance(chapter['entry_datetime'], datetime.datetime) else chapter['entry_datetime'],
-                    "Reminder Time": reminder['time'].strftime("%d/%m/%y %I:%M %p") if isinstance(reminder['time'], datetime.datetime) else reminder['time'],
-                    "Status": reminder['status'],
-                    "Exams Appeared": chapter['exams_appeared'],
-                    "Exam Status": chapter['exam_status'],
-                    "Time Spent (minutes)": chapter['time_spent']
-                })
-    return pd.DataFrame(all_data).to_csv(index=False).encode('utf-8')
+    return csv_bytes(data)
 
-def _aggregate_productivity_data(data, start_date=None):
-    aggregated = {}
-    for chapters in data.values():
-        for chapter in chapters:
-            for reminder in chapter["reminders"]:
-                r_date = reminder["time"].date() if isinstance(reminder["time"], datetime.datetime) else datetime.datetime.fromisoformat(reminder["time"]).date()
-                if start_date and r_date < start_date:
-                    continue
-                aggregated.setdefault(r_date, {"total": 0, "revised": 0})
-                aggregated[r_date]["total"] += 1
-                if reminder["status"] == "Revised":
-                    aggregated[r_date]["revised"] += 1
-    return aggregated
+def _aggregate_productivity_data(daily_rollup, start_date=None, subject=None):
+    return daily_rollup.frame(start_date, subject)
+
+QUERY_FLUSH_TIMEOUT_SECONDS = 2
+
+def _revision_day_counts(start_date, end_date):
+    # The SQLite backend counts reminders per day in SQL (idx_reminders_time) once this
+    # process's queued writes have landed. Firebase has no such query, so there, or if
+    # the flush times out, the session's reminder index answers.
+    if STORAGE_BACKEND == "sqlite" and get_write_queue().flush(timeout=QUERY_FLUSH_TIMEOUT_SECONDS):
+        return get_storage().daily_counts(start_date, end_date, user_id=st.session_state['user_id'] or None)
+    return st.session_state['reminder_index'].daily_counts(start_date, end_date)
 
 # ---------------- Core Functions ----------------
 def add_chapter_and_reminders(subject, chapter_name, entry_datetime, custom_reminders=None):
-    reminders = custom_reminders if custom_reminders else _create_default_reminders(entry_datetime)
-    st.session_state['subject_chapters_data'][subject].append({
-        "chapter_name": chapter_name,
-        "entry_datetime": entry_datetime,
-        "reminders": reminders,
-        "exams_appeared": 0,
-        "exam_status": "Not Appeared",
-        "time_spent": 0
-    })
+    ensure_session_data()
+    if st.session_state['subject_chapters_data'][subject].find_by_name(chapter_name) is not None:
+        # Same rule as the importer: a name is taken once per subject.
+        st.warning(f"Chapter '{chapter_name}' is already in {subject}.")
+        return
+    reminders = custom_reminders if custom_reminders else build_reminders(entry_datetime)
+    chapter = Chapter(new_chapter_id(), chapter_name, entry_datetime, reminders)
+    st.session_state['subject_chapters_data'][subject].add(chapter)
+    st.session_state['reminder_index'].add_chapter(subject, chapter)
+    if st.session_state.get('daily_rollup') is not None:
+        st.session_state['daily_rollup'].add_chapter(subject, chapter)
+    record_change(chapter_path(subject, chapter.chapter_id), chapter.to_firebase())
+    record_progress(subject, *chapter_counts(chapter))
     save_data_to_firebase()
     st.success(f"Chapter '{chapter_name}' added to {subject} with reminders starting {entry_datetime.strftime('%d/%m/%y %I:%M %p')}.")
 
-def delete_chapter(subject, chapter_index):
-    del st.session_state['subject_chapters_data'][subject][chapter_index]
+IMPORT_PROGRESS_STEP = 50
+IMPORT_FLUSH_TIMEOUT_SECONDS = 30
+IMPORT_ERRORS_SHOWN = 10
+
+def import_chapters(chapters, progress):
+    # [(subject, Chapter)] from parse_syllabus(), recorded into one change set and
+    # saved as a single multi-path update. Returns whether the write is confirmed.
+    ensure_session_data()
+    data = st.session_state['subject_chapters_data']
+    # Encoded up front so a chapter that cannot be stored fails before the session is touched.
+    encoded = [chapter.to_firebase() for _, chapter in chapters]
+    added = {}  # subject -> [total, revised]
+    for done, ((subject, chapter), value) in enumerate(zip(chapters, encoded), 1):
+        data[subject].add(chapter)
+        st.session_state['reminder_index'].add_chapter(subject, chapter)
+        record_change(chapter_path(subject, chapter.chapter_id), value)
+        counts = added.setdefault(subject, [0, 0])
+        for i, count in enumerate(chapter_counts(chapter)):
+            counts[i] += count
+        if done % IMPORT_PROGRESS_STEP == 0:
+            progress.progress(int(done / len(chapters) * 50))
+    for subject, (total, revised) in added.items():
+        record_progress(subject, total, revised)
+    # Rebuilt on next use rather than patched once per chapter.
+    st.session_state.pop('daily_rollup', None)
+    save_data_to_firebase()
+    progress.progress(50)
+    written = get_write_queue().flush(timeout=IMPORT_FLUSH_TIMEOUT_SECONDS)
+    progress.progress(100)
+    return written
+
+def delete_chapter(subject, chapter_id):
+    chapter = _forget_chapter(subject, chapter_id)
+    record_change(chapter_path(subject, chapter_id), None)
+    total, revised = chapter_counts(chapter)
+    record_progress(subject, -total, -revised)
     save_data_to_firebase()
+    # The chapter selector still points at the deleted ID.
+    st.session_state.pop(f"chapter_select_{subject}", None)
     st.success("Chapter deleted successfully!")
     st.experimental_rerun()
 
-def mark_reminder_revised(subject, chapter_index, reminder_index):
-    st.session_state['subject_chapters_data'][subject][chapter_index]['reminders'][reminder_index]['status'] = "Revised"
+def _forget_chapter(subject, chapter_id):
+    # Drops a chapter from this session only; returns it.
+    chapter = st.session_state['subject_chapters_data'][subject].remove(chapter_id)
+    if st.session_state.get('reminder_index') is not None:
+        st.session_state['reminder_index'].remove_chapter(chapter)
+    if st.session_state.get('daily_rollup') is not None:
+        st.session_state['daily_rollup'].remove_chapter(subject, chapter)
+    return chapter
+
+def chapter_is_stored(subject, chapter_id):
+    # A field write to a chapter that another session deleted or archived would
+    # recreate it as a nameless partial record, so it is dropped here instead.
+    if get_shared_subjects(st.session_state['user_id']).has_chapter(subject, chapter_id):
+        return True
+    if chapter_id in st.session_state['subject_chapters_data'][subject]:
+        _forget_chapter(subject, chapter_id)
+    st.warning("That chapter was deleted or archived in another session.")
+    return False
+
+def _set_reminder_status(subject, chapter_id, reminder_id, status):
+    if not chapter_is_stored(subject, chapter_id):
+        return
+    chapter = st.session_state['subject_chapters_data'][subject].get(chapter_id)
+    reminder = chapter.reminder(reminder_id)
+    previous = reminder.status
+    reminder.status = status
+    if st.session_state.get('reminder_index') is not None:
+        st.session_state['reminder_index'].status_changed(reminder, previous)
+    if st.session_state.get('daily_rollup') is not None:
+        st.session_state['daily_rollup'].status_changed(subject, reminder, previous)
+    record_change(reminder_status_path(subject, chapter, reminder_id), status_code(status))
+    revised = (status == "Revised") - (previous == "Revised")
+    if revised:
+        record_progress(subject, 0, revised)
+
+def mark_reminder_revised(subject, chapter_id, reminder_id):
+    _set_reminder_status(subject, chapter_id, reminder_id, "Revised")
+    save_data_to_firebase()
+    st.experimental_rerun()
+
+def mark_reminder_pending(subject, chapter_id, reminder_id):
+    _set_reminder_status(subject, chapter_id, reminder_id, "Pending")
     save_data_to_firebase()
     st.experimental_rerun()
 
-def mark_reminder_pending(subject, chapter_index, reminder_index):
-    st.session_state['subject_chapters_data'][subject][chapter_index]['reminders'][reminder_index]['status'] = "Pending"
+def apply_reminder_changes(changes):
+    # [(subject, chapter_id, reminder_id, revised)] saved as one multi-path update with one rerun.
+    for subject, chapter_id, reminder_id, revised in changes:
+        _set_reminder_status(subject, chapter_id, reminder_id, "Revised" if revised else "Pending")
     save_data_to_firebase()
     st.experimental_rerun()
 
+# ---------------- Checklists ----------------
+# In batch-edit mode checklists are drawn inside a form: ticking boxes does not
+# rerun the script, and "Save Changes" commits everything at once. Long lists
+# are split into pages so only one page of widgets exists at a time.
+CHECKLIST_PAGE_SIZE = 25
+
+def paginate(items, key):
+    pages = max(1, -(-len(items) // CHECKLIST_PAGE_SIZE))
+    if pages == 1:
+        return 0, items
+    options = list(range(1, pages + 1))
+    if st.session_state.get(key, 1) not in options:
+        st.session_state.pop(key, None)
+    page = st.selectbox(f"Page (of {pages}):", options, key=view_key(key, options))
+    start = (page - 1) * CHECKLIST_PAGE_SIZE
+    return start, items[start:start + CHECKLIST_PAGE_SIZE]
+
+def reminder_checklist(name, entries, key_prefix, show_details=True):
+    # entries: [(subject, chapter, reminder)]
+    batch = st.session_state['batch_edit']
+    _, page = paginate(entries, f"{name}_page")
+    changes = []
+    with (st.form(f"{name}_form") if batch else st.container()):
+        for subj, chapter, reminder in page:
+            if show_details:
+                st.markdown(
+                    f"<div class='container-box'>"
+                    f"<strong>{subj}</strong> | {chapter.chapter_name} | {reminder.type} at {reminder.time.strftime('%I:%M %p')} | Status: {reminder.status}"
+                    f"</div>", unsafe_allow_html=True)
+            key = f"{key_prefix}{subj}_{chapter.chapter_id}_{reminder.reminder_id}"
+            current = reminder.status == "Revised"
+            checked = st.checkbox("Mark Revised" if show_details else reminder.type, value=current, key=key)
+            if checked != current:
+                changes.append((subj, chapter.chapter_id, reminder.reminder_id, checked))
+        submitted = st.form_submit_button("Save Changes") if batch else True
+    if changes and submitted:
+        apply_reminder_changes(changes)
+
 def calculate_subject_progress(subject):
-    chapters = st.session_state['subject_chapters_data'][subject]
-    if not chapters:
-        return 0
-    total = sum(len(ch["reminders"]) for ch in chapters)
-    revised = sum(1 for ch in chapters for rem in ch["reminders"] if rem["status"] == "Revised")
-    return (revised / total) * 100 if total else 0
+    return progress_percent(st.session_state['progress'], subject)
 
-def display_reminders_section(subject, chapter, chapter_index):
+def display_reminders_section(subject, chapter):
+    reminder_checklist(f"chapter_{chapter.chapter_id}", [(subject, chapter, reminder) for reminder in chapter.reminders], "",
+                       show_details=False)
     rem_list = []
-    for i, reminder in enumerate(chapter["reminders"]):
-        key = f"{subject}_{chapter_index}_{i}"
-        current = reminder["status"] == "Revised"
-        new_status = st.checkbox(reminder["type"], value=current, key=key)
-        if new_status != current:
-            if new_status:
-                mark_reminder_revised(subject, chapter_index, i)
-            else:
-                mark_reminder_pending(subject, chapter_index, i)
+    for reminder in chapter.reminders:
         rem_list.append({
-            "Reminder Type": reminder["type"],
-            "Reminder Time": reminder["time"].strftime("%d/%m/%y %I:%M %p") if isinstance(reminder["time"], datetime.datetime) else reminder["time"],
-            "Status": "Revised" if reminder["status"] == "Revised" else "Pending"
+            "Reminder Type": reminder.type,
+            "Reminder Time": reminder.time.strftime("%d/%m/%y %I:%M %p") if isinstance(reminder.time, datetime.datetime) else reminder.time,
+            "Status": "Revised" if reminder.status == "Revised" else "Pending"
         })
     with st.container():
         st.markdown("<div class='dataframe-container'>", unsafe_allow_html=True)
@@ -336,31 +678,29 @@ def display_reminders_section(subject, chapter, chapter_index):
         st.markdown("</div>", unsafe_allow_html=True)
 
 def display_time_spent_section(subject, chapter):
-    key = f"time_spent_{subject}_{chapter['chapter_name']}"
-    time_spent = st.number_input("Time Spent Studying (minutes):", value=chapter.get("time_spent", 0), min_value=0, step=5, key=key)
-    if time_spent != chapter.get("time_spent", 0):
-        chapter["time_spent"] = time_spent
+    key = f"time_spent_{subject}_{chapter.chapter_id}"
+    time_spent = st.number_input("Time Spent Studying (minutes):", value=chapter.time_spent, min_value=0, step=5, key=key)
+    if time_spent != chapter.time_spent and chapter_is_stored(subject, chapter.chapter_id):
+        chapter.time_spent = time_spent
+        record_change(chapter_field_path(subject, chapter.chapter_id, "time_spent"), time_spent)
         save_data_to_firebase()
         st.success("Time updated!")
 
-def display_exam_tracking_section(subject, chapter, chapter_index):
-    st.subheader(f"{subject} Exam Tracking - {chapter['chapter_name']}")
-    exam_count_key = f"exam_count_{subject}_{chapter_index}"
-    exam_status_key = f"exam_status_{subject}_{chapter_index}"
-    exam_appeared = st.number_input("Exams Appeared:", min_value=0, value=chapter.get("exams_appeared", 0), key=exam_count_key)
-    exam_status_text = st.text_input("Exam Status:", value=chapter.get("exam_status", "Not Appeared"), key=exam_status_key, placeholder="e.g., Score, Performance")
-    if st.button("Update Exam Info", key=f"update_exam_{subject}_{chapter_index}"):
-        chapter["exams_appeared"] = exam_appeared
-        chapter["exam_status"] = exam_status_text
+def display_exam_tracking_section(subject, chapter):
+    st.subheader(f"{subject} Exam Tracking - {chapter.chapter_name}")
+    exam_count_key = f"exam_count_{subject}_{chapter.chapter_id}"
+    exam_status_key = f"exam_status_{subject}_{chapter.chapter_id}"
+    exam_appeared = st.number_input("Exams Appeared:", min_value=0, value=chapter.exams_appeared, key=exam_count_key)
+    exam_status_text = st.text_input("Exam Status:", value=chapter.exam_status, key=exam_status_key, placeholder="e.g., Score, Performance")
+    if st.button("Update Exam Info", key=f"update_exam_{subject}_{chapter.chapter_id}") and chapter_is_stored(subject, chapter.chapter_id):
+        chapter.exams_appeared = exam_appeared
+        chapter.exam_status = exam_status_text
+        record_change(chapter_field_path(subject, chapter.chapter_id, "exams_appeared"), exam_appeared)
+        record_change(chapter_field_path(subject, chapter.chapter_id, "exam_status"), exam_status_text)
         save_data_to_firebase()
         st.success("Exam info updated!")
 
-def _get_chapter_item(subject_data, chapter_name):
-    for idx, chapter in enumerate(subject_data):
-        if chapter["chapter_name"] == chapter_name:
-            return chapter, idx
-    return None, -1
-
+@profiled("subject tab")
 def display_subject_tab_content(subject):
     st.subheader(f"{subject} Revision Progress")
     progress = calculate_subject_progress(subject)
@@ -368,58 +708,97 @@ def display_subject_tab_content(subject):
     st.write(f"Overall Revision: {progress:.2f}%")
     
     chapters = st.session_state['subject_chapters_data'][subject]
-    chapter_names = [ch["chapter_name"] for ch in chapters]
-    if not chapter_names:
+    if not chapters:
         st.info(f"No chapters in {subject}. Please add one from the sidebar.")
         return
     
-    selected = st.selectbox(f"Select {subject} Chapter:", ["Select Chapter"] + chapter_names, index=0)
+    # Options are chapter IDs, so the selection survives deletions and duplicate names.
+    options = ["Select Chapter"] + chapters.ids()
+    selected = st.selectbox(f"Select {subject} Chapter:", options, index=0, key=view_key(f"chapter_select_{subject}", options),
+                            format_func=lambda cid: cid if cid == "Select Chapter" else chapters.get(cid).chapter_name)
     if selected != "Select Chapter":
-        chapter, idx = _get_chapter_item(chapters, selected)
+        chapter = chapters.get(selected)
         if chapter:
-            display_reminders_section(subject, chapter, idx)
+            display_reminders_section(subject, chapter)
             display_time_spent_section(subject, chapter)
-            display_exam_tracking_section(subject, chapter, idx)
+            display_exam_tracking_section(subject, chapter)
             st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
             st.markdown("### Delete Chapter", unsafe_allow_html=True)
             confirm_delete = st.checkbox("Confirm deletion of this chapter", key=f"confirm_delete_{selected}")
             if confirm_delete:
                 if st.button("Delete Chapter", key=f"delete_{selected}"):
-                    delete_chapter(subject, idx)
+                    delete_chapter(subject, selected)
+
+EXPORT_FORMATS = {
+    "CSV": (_prepare_csv_data, "neet_prep_data.csv", "text/csv"),
+    "Parquet": (parquet_bytes, "neet_prep_data_parquet.zip", "application/zip"),
+}
 
-def download_csv_data():
-    return _prepare_csv_data(st.session_state['subject_chapters_data'])
+def get_cached_export(export_format):
+    # Exports are keyed by the session's data version, so repeat downloads of unchanged data are free.
+    return st.session_state['export_cache'].get((export_format, st.session_state['data_version']))
+
+def prepare_export(export_format):
+    ensure_session_data()
+    builder = EXPORT_FORMATS[export_format][0]
+    payload = builder(merge_subject_data(st.session_state['subject_chapters_data'], load_archive()))
+    st.session_state['export_cache'] = {(export_format, st.session_state['data_version']): payload}
+    return payload
 
 # ---------------- Productivity Tracking ----------------
+@profiled("productivity")
 def display_productivity_tracking():
+    ensure_session_data()
     st.header("Productivity Tracking")
-    period = st.selectbox("Tracking Period:", ["Last 1 Week", "Last 1 Month", "All Time"])
+    period = st.selectbox("Tracking Period:", ["Last 1 Week", "Last 1 Month", "All Time"], key=view_key("productivity_period"))
+    subject_filter = st.selectbox("Subject Filter:", ["All Subjects"] + SUBJECT_CHOICES, key=view_key("productivity_subject"))
     today = datetime.date.today()
     start_date = None
     if period == "Last 1 Week":
         start_date = today - datetime.timedelta(days=7)
     elif period == "Last 1 Month":
         start_date = today - datetime.timedelta(days=30)
-    agg = _aggregate_productivity_data(st.session_state['subject_chapters_data'], start_date)
-    df = pd.DataFrame([
-        {"Date": d, "Total Reminders": stats["total"], "Revised": stats["revised"],
-         "Productivity (%)": (stats["revised"] / stats["total"] * 100) if stats["total"] else 0}
-        for d, stats in agg.items()
-    ])
-    if not df.empty:
-        df.sort_values("Date", inplace=True)
-        df["Date"] = df["Date"].apply(lambda d: d.strftime("%d/%m/%y"))
-        fig = px.line(df, x="Date", y="Productivity (%)", markers=True, title="Daily Productivity")
+    subject = None if subject_filter == "All Subjects" else subject_filter
+    # Archived chapters were entered over ARCHIVE_CHAPTERS_AFTER_DAYS ago, so their last
+    # reminders fall before the fixed periods unless the archive age is set shorter.
+    last_archived_reminder = (datetime.date.today() - datetime.timedelta(days=ARCHIVE_CHAPTERS_AFTER_DAYS)
+                              + REMINDER_SCHEDULE[-1][2])
+    include_archive = ARCHIVE_CHAPTERS_AFTER_DAYS > 0 and (start_date is None or start_date <= last_archived_reminder)
+    rollup_frame = _aggregate_productivity_data(get_daily_rollup(include_archive), start_date, subject)
+    if not rollup_frame.empty:
+        # Long ranges are charted by week or month; the table keeps every day.
+        freq = analytics.chart_frequency(rollup_frame)
+        series = analytics.bucketed_productivity(rollup_frame, freq)
+        fig = line_chart(series, "Date", "Productivity (%)", f"{analytics.BUCKET_LABELS[freq]} Productivity")
         st.plotly_chart(fig, use_container_width=True)
+        df = series if freq == "D" else analytics.daily_productivity(rollup_frame)
         st.dataframe(df, use_container_width=True)
+        if subject is None:
+            st.subheader("By Subject")
+            st.dataframe(analytics.subject_breakdown(rollup_frame), use_container_width=True)
     else:
         st.info("No productivity data available.")
 
 # ---------------- Sidebar ----------------
-with st.sidebar:
+with PROFILE.section("sidebar"), st.sidebar:
     st.title("📚 NEET Prep App")
+    with st.expander("Student Profile", expanded=not st.session_state['user_id']):
+        user_input = st.text_input("Student ID:", value=st.session_state['user_id'],
+                                   help="Letters, digits, '-' and '_'. Leave empty for the shared data.").strip()
+        if user_input != st.session_state['user_id']:
+            if user_input and not USER_ID_PATTERN.fullmatch(user_input):
+                st.warning("Student ID may only contain letters, digits, '-' and '_' (max 64).")
+            else:
+                save_data_to_firebase()
+                if user_input:
+                    st.experimental_set_query_params(user=user_input)
+                else:
+                    st.experimental_set_query_params()
+                st.experimental_rerun()
     with st.expander("App Theme", expanded=False):
         st.session_state['app_theme'] = st.selectbox("Choose Theme:", THEME_OPTIONS, index=THEME_OPTIONS.index(st.session_state['app_theme']))
+        st.checkbox("Batch edit checklists", value=False, key="batch_edit",
+                    help="Tick several revisions or tasks, then save them together with one update.")
     with st.expander("Add New Chapter", expanded=True):
         subject = st.selectbox("Subject:", SUBJECT_CHOICES)
         chapter_name = st.text_input("Chapter Name:", placeholder="e.g., Structure of Atom")
@@ -433,35 +812,58 @@ with st.sidebar:
         if st.button("Add Chapter"):
             if chapter_name and subject:
                 entry_datetime = datetime.datetime.combine(entry_date, entry_time)
-                custom_reminders_list = []
-                if custom_12hr:
-                    custom_reminders_list.append({
-                        "reminder_id": 1,
-                        "type": "12 hour Reminder",
-                        "time": entry_datetime + datetime.timedelta(hours=12),
-                        "status": "Pending"
-                    })
-                if custom_3day:
-                    custom_reminders_list.append({
-                        "reminder_id": 2,
-                        "type": "3 days Reminder",
-                        "time": entry_datetime + datetime.timedelta(days=3),
-                        "status": "Pending"
-                    })
-                if custom_5day:
-                    custom_reminders_list.append({
-                        "reminder_id": 3,
-                        "type": "5 days Reminder",
-                        "time": entry_datetime + datetime.timedelta(days=5),
-                        "status": "Pending"
-                    })
-                add_chapter_and_reminders(subject, chapter_name, entry_datetime, custom_reminders_list)
+                picked = [reminder_id for reminder_id, use in ((1, custom_12hr), (2, custom_3day), (3, custom_5day)) if use]
+                add_chapter_and_reminders(subject, chapter_name, entry_datetime, build_reminders(entry_datetime, picked))
             else:
                 st.warning("Please enter a chapter name and select a subject.")
+    with st.expander("Import Chapters", expanded=False):
+        if 'import_result' in st.session_state:
+            st.success(st.session_state.pop('import_result'))
+        # A new key after each import clears the uploader.
+        uploaded = st.file_uploader("Syllabus file (CSV or JSON):", type=["csv", "json"],
+                                    key=f"import_file_{st.session_state.get('import_round', 0)}",
+                                    help="Columns: subject, chapter_name, and optionally entry_datetime, "
+                                         "reminders (e.g. 12h;3d;5d), exams_appeared, exam_status, time_spent.")
+        if uploaded is not None:
+            ensure_session_data()
+            existing = {subj: {chapter.chapter_name for chapter in chapters}
+                        for subj, chapters in st.session_state['subject_chapters_data'].items()}
+            # Archived chapters still count as taken.
+            for subj, chapters in load_archive().items():
+                existing.setdefault(subj, set()).update(chapter.chapter_name for chapter in chapters)
+            chapters, errors = parse_syllabus(uploaded.getvalue(), uploaded.name, SUBJECT_CHOICES, datetime.datetime.now(), existing)
+            st.caption(f"{len(chapters)} chapters ready to import · {len(errors)} rows skipped")
+            for message in errors[:IMPORT_ERRORS_SHOWN]:
+                st.caption(message)
+            if len(errors) > IMPORT_ERRORS_SHOWN:
+                st.caption(f"...and {len(errors) - IMPORT_ERRORS_SHOWN} more")
+            if chapters and st.button(f"Import {len(chapters)} Chapters"):
+                written = import_chapters(chapters, st.progress(0))
+                st.session_state['import_round'] = st.session_state.get('import_round', 0) + 1
+                st.session_state['import_result'] = (f"Imported {len(chapters)} chapters." if written else
+                                                     f"Imported {len(chapters)} chapters; they are still syncing in the background.")
+                st.experimental_rerun()
     with st.expander("Data Options", expanded=False):
         st.header("Download Data")
-        csv_data = download_csv_data()
-        st.download_button(label="Download CSV", data=csv_data, file_name="neet_prep_data.csv", mime='text/csv')
+        export_format = st.radio("Export Format:", list(EXPORT_FORMATS), horizontal=True)
+        export_data = get_cached_export(export_format)
+        if export_data is None and st.button(f"Prepare {export_format} Export"):
+            try:
+                with st.spinner("Preparing export..."):
+                    export_data = prepare_export(export_format)
+            except ImportError:
+                st.warning("Parquet export needs pyarrow. Install it with `pip install pyarrow`.")
+        if export_data is not None:
+            _, file_name, mime = EXPORT_FORMATS[export_format]
+            st.download_button(label=f"Download {export_format}", data=export_data, file_name=file_name, mime=mime)
+        sync = get_write_queue().stats()
+        st.caption(f"Sync queue: {sync['queue_depth'] + sync['in_flight']} pending · "
+                   f"last flush {sync['last_flush_ms']:.0f} ms · avg {sync['avg_flush_ms']:.0f} ms · "
+                   f"journal {sync['journal_pending']}")
+    with st.expander("Startup Timing", expanded=False):
+        # Process phases are measured once per server process; the rest are this session's.
+        for name, elapsed_ms in {**STARTUP.report(), **st.session_state['session_timer'].report()}.items():
+            st.caption(f"{name}: {elapsed_ms:.0f} ms")
     st.header("Motivation")
     st.markdown(f"> *{random.choice(motivational_quotes)}*")
     st.header("Study Tips")
@@ -472,70 +874,56 @@ with st.sidebar:
 # ---------------- Apply Theme CSS ----------------
 apply_theme_css()
 
-# ---------------- Main Panel & Tabs ----------------
-st.markdown("<div class='main-header'><h1>NEET Prep Tracker Dashboard (Sathvik)</h1></div>", unsafe_allow_html=True)
-tabs = st.tabs(SUBJECT_CHOICES + ["Today's Revisions", "Productivity Tracking", "To Do List"])
-
-# ----- Subject Tabs -----
-for idx, subject in enumerate(SUBJECT_CHOICES):
-    with tabs[idx]:
-        st.header(subject)
-        st.markdown(f"<div class='dataframe-container' style='background-color:{TAB_HIGHLIGHT_COLOR}; padding: 10px; border-radius: 5px;'>", unsafe_allow_html=True)
-        display_subject_tab_content(subject)
-        st.markdown("</div>", unsafe_allow_html=True)
+# ---------------- Main Panel Views ----------------
+def display_subject_view(subject):
+    ensure_subject_data(subject)
+    st.header(subject)
+    st.markdown(f"<div class='dataframe-container' style='background-color:{TAB_HIGHLIGHT_COLOR}; padding: 10px; border-radius: 5px;'>", unsafe_allow_html=True)
+    display_subject_tab_content(subject)
+    st.markdown("</div>", unsafe_allow_html=True)
 
-# ----- Today's Revisions Tab -----
-with tabs[len(SUBJECT_CHOICES)]:
+@profiled("revisions")
+def display_todays_revisions():
+    ensure_session_data()
     st.header("Today's Revisions")
-    mode = st.radio("View Mode", ["Today", "Select Date"], index=0, horizontal=True)
+    mode = st.radio("View Mode", ["Today", "Select Date", "Date Range"], index=0, horizontal=True,
+                    key=view_key("revisions_mode"))
     if mode == "Today":
-        sel_date = datetime.date.today()
-        st.info(f"Revisions for today: {sel_date.strftime('%d/%m/%y')}")
+        start_date = end_date = datetime.date.today()
+        st.info(f"Revisions for today: {start_date.strftime('%d/%m/%y')}")
+    elif mode == "Select Date":
+        start_date = end_date = st.date_input("Select Date:", key=view_key("revisions_date"))
+        st.info(f"Revisions on: {start_date.strftime('%d/%m/%y')}")
     else:
-        sel_date = st.date_input("Select Date:", value=datetime.date.today())
-        st.info(f"Revisions on: {sel_date.strftime('%d/%m/%y')}")
+        start_date = st.date_input("From:", key=view_key("revisions_from"))
+        end_date = st.date_input("To:", key=view_key("revisions_to"))
+        st.info(f"Revisions from {start_date.strftime('%d/%m/%y')} to {end_date.strftime('%d/%m/%y')}")
     
-    revision_entries = []
-    for subj, chapters in st.session_state['subject_chapters_data'].items():
-        for c_idx, chapter in enumerate(chapters):
-            for r_idx, reminder in enumerate(chapter["reminders"]):
-                if reminder["time"].date() == sel_date:
-                    revision_entries.append((subj, c_idx, chapter, r_idx, reminder))
+    reminder_index = st.session_state['reminder_index']
+    with PROFILE.section("revisions scan"):
+        revision_entries = reminder_index.between(start_date, end_date)
+        day_counts = _revision_day_counts(start_date, end_date)
     st.markdown(f"**Total revisions found: {len(revision_entries)}**")
     if revision_entries:
-        status_counts = {"Revised": 0, "Pending": 0}
-        for entry in revision_entries:
-            status_counts[entry[4]["status"]] += 1
-        df_status = pd.DataFrame({"Status": list(status_counts.keys()), "Count": list(status_counts.values())})
-        fig = px.pie(df_status, names="Status", values="Count", title="Revision Status Breakdown",
-                     color_discrete_map={"Revised": COLOR_SUCCESS, "Pending": COLOR_WARNING})
+        total_count = sum(counts["total"] for counts in day_counts.values())
+        revised_count = sum(counts["revised"] for counts in day_counts.values())
+        status_counts = {"Revised": revised_count, "Pending": total_count - revised_count}
+        fig = pie_chart(status_counts, "Revision Status Breakdown",
+                        color_discrete_map={"Revised": COLOR_SUCCESS, "Pending": COLOR_WARNING})
         st.plotly_chart(fig, use_container_width=True)
-        for subj, c_idx, chapter, r_idx, reminder in revision_entries:
-            with st.container():
-                st.markdown(
-                    f"<div class='container-box'>"
-                    f"<strong>{subj}</strong> | {chapter['chapter_name']} | {reminder['type']} at {reminder['time'].strftime('%I:%M %p')} | Status: {reminder['status']}"
-                    f"</div>", unsafe_allow_html=True)
-                key = f"rev_{subj}_{c_idx}_{r_idx}"
-                current = reminder["status"] == "Revised"
-                new_stat = st.checkbox("Mark Revised", value=current, key=key)
-                if new_stat != current:
-                    if new_stat:
-                        mark_reminder_revised(subj, c_idx, r_idx)
-                    else:
-                        mark_reminder_pending(subj, c_idx, r_idx)
+        if start_date != end_date:
+            st.dataframe(pd.DataFrame([{"Date": day.strftime("%d/%m/%y"), "Revisions": counts["total"], "Revised": counts["revised"]}
+                                       for day, counts in day_counts.items()]), use_container_width=True)
+        reminder_checklist("revisions", revision_entries, "rev_")
     else:
-        st.info("No revisions scheduled for the selected date.")
-
-# ----- Productivity Tracking Tab -----
-with tabs[len(SUBJECT_CHOICES) + 1]:
-    display_productivity_tracking()
+        st.info("No revisions scheduled for the selected dates.")
 
-# ----- To Do List Tab -----
-with tabs[-1]:
+@profiled("todo")
+def display_todo_list():
+    ensure_session_data()
     st.header("To Do List")
     st.subheader("Add New Task")
-    new_task = st.text_input("Enter today's task:", key="new_todo_task")
+    new_task = st.text_input("Enter today's task:", key=view_key("new_todo_task"))
     if st.button("Add Task", key="add_task"):
         if new_task:
             new_task_entry = {
@@ -543,29 +931,55 @@ with tabs[-1]:
                 "status": "Pending",
                 "timestamp": datetime.datetime.now().isoformat()
             }
-            st.session_state['todo_list'].append(new_task_entry)
-            save_todo_to_firebase(st.session_state['todo_list'])
+            todo_id = new_todo_id()
+            st.session_state['todo_list'][todo_id] = new_task_entry
+            save_todo_changes({todo_path(todo_id): new_task_entry})
             st.success("Task added!")
         else:
             st.warning("Please enter a task.")
     st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
     
     st.subheader("Manual Tasks")
-    if st.session_state['todo_list']:
-        for i, task in enumerate(st.session_state['todo_list']):
+    todo_list = st.session_state['todo_list']
+    if todo_list and st.session_state['batch_edit']:
+        _, page = paginate(list(todo_list.items()), "todos_page")
+        with st.form("todos_form"):
+            completed, deleted = {}, set()
+            for todo_id, task in page:
+                col1, col2 = st.columns([0.8, 0.2])
+                with col1:
+                    completed[todo_id] = st.checkbox(task["task"], value=task["status"] == "Completed", key=f"todo_{todo_id}")
+                with col2:
+                    if st.checkbox("❌", key=f"delete_{todo_id}"):
+                        deleted.add(todo_id)
+            if st.form_submit_button("Save Changes"):
+                updates = {}
+                for todo_id, done in completed.items():
+                    status = "Completed" if done else "Pending"
+                    if todo_id in deleted:
+                        del todo_list[todo_id]
+                        updates[todo_path(todo_id)] = None
+                        st.session_state.pop(f"todo_{todo_id}", None)
+                        st.session_state.pop(f"delete_{todo_id}", None)
+                    elif status != todo_list[todo_id]["status"]:
+                        todo_list[todo_id]["status"] = status
+                        updates[todo_path(todo_id, "status")] = status
+                if updates:
+                    save_todo_changes(updates)
+                st.experimental_rerun()
+    elif todo_list:
+        for todo_id, task in list(todo_list.items()):
             col1, col2 = st.columns([0.8, 0.2])
             with col1:
-                key = f"todo_{i}"
                 current = task["status"] == "Completed"
-                new_val = st.checkbox(task["task"], value=current, key=key)
+                new_val = st.checkbox(task["task"], value=current, key=f"todo_{todo_id}")
                 if new_val != current:
-                    st.session_state['todo_list'][i]["status"] = "Completed" if new_val else "Pending"
-                    save_todo_to_firebase(st.session_state['todo_list'])
+                    task["status"] = "Completed" if new_val else "Pending"
+                    save_todo_changes({todo_path(todo_id, "status"): task["status"]})
             with col2:
-                delete_key = f"delete_{i}"
-                if st.button("❌", key=delete_key):
-                    del st.session_state['todo_list'][i]
-                    save_todo_to_firebase(st.session_state['todo_list'])
+                if st.button("❌", key=f"delete_{todo_id}"):
+                    del todo_list[todo_id]
+                    save_todo_changes({todo_path(todo_id): None})
                     st.experimental_rerun()
         st.markdown("</div>", unsafe_allow_html=True)
     else:
@@ -574,47 +988,95 @@ with tabs[-1]:
     st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
     st.subheader("Today's Revision Reminders")
     today_date = datetime.date.today()
-    rev_tasks = []
-    for subj, chapters in st.session_state['subject_chapters_data'].items():
-        for c_idx, chapter in enumerate(chapters):
-            for r_idx, reminder in enumerate(chapter["reminders"]):
-                if reminder["time"].date() == today_date:
-                    rev_tasks.append((subj, c_idx, chapter, r_idx, reminder))
+    reminder_index = st.session_state['reminder_index']
+    rev_tasks = reminder_index.on(today_date)
     if rev_tasks:
-        for subj, c_idx, chapter, r_idx, reminder in rev_tasks:
-            with st.container():
-                st.markdown(
-                    f"<div class='container-box'>"
-                    f"<strong>{subj}</strong> | {chapter['chapter_name']} | {reminder['type']} at {reminder['time'].strftime('%I:%M %p')} | Status: {reminder['status']}"
-                    f"</div>", unsafe_allow_html=True)
-                key = f"todo_rev_{subj}_{c_idx}_{r_idx}"
-                current = reminder["status"] == "Revised"
-                new_stat = st.checkbox("Mark Revised", value=current, key=key)
-                if new_stat != current:
-                    if new_stat:
-                        mark_reminder_revised(subj, c_idx, r_idx)
-                    else:
-                        mark_reminder_pending(subj, c_idx, r_idx)
+        reminder_checklist("todo_revisions", rev_tasks, "todo_rev_")
     else:
         st.info("No revision reminders scheduled for today.")
     
     st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
     st.subheader("Today's To-Do Overview")
     total_manual = len(st.session_state['todo_list'])
-    completed_manual = sum(1 for t in st.session_state['todo_list'] if t["status"] == "Completed")
+    completed_manual = sum(1 for t in st.session_state['todo_list'].values() if t["status"] == "Completed")
     total_rev = len(rev_tasks)
-    completed_rev = sum(1 for entry in rev_tasks if entry[4]["status"] == "Revised")
+    completed_rev = reminder_index.revised_on(today_date)
     total_tasks = total_manual + total_rev
     completed_tasks = completed_manual + completed_rev
     pending_tasks = total_tasks - completed_tasks
     if total_tasks > 0:
-        df_overview = pd.DataFrame({
-            "Status": ["Completed", "Pending"],
-            "Count": [completed_tasks, pending_tasks]
-        })
-        fig = px.pie(df_overview, names="Status", values="Count", title="Today's To-Do Status")
+        fig = pie_chart({"Completed": completed_tasks, "Pending": pending_tasks}, "Today's To-Do Status")
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No tasks for today.")
 
+@profiled("history")
+def display_history():
+    # Read-only: archived chapters have nothing left to revise.
+    st.header("History")
+    st.caption(f"Chapters with every reminder revised, entered more than {ARCHIVE_CHAPTERS_AFTER_DAYS} days ago.")
+    subject_filter = st.selectbox("Subject Filter:", ["All Subjects"] + SUBJECT_CHOICES, key=view_key("history_subject"))
+    rows = []
+    for subject, chapters in load_archive().items():
+        if subject_filter not in ("All Subjects", subject):
+            continue
+        for chapter in chapters:
+            rows.append({
+                "Subject": subject,
+                "Chapter Name": chapter.chapter_name,
+                "Entry Date": chapter.entry_datetime.strftime("%d/%m/%y %I:%M %p") if isinstance(chapter.entry_datetime, datetime.datetime) else chapter.entry_datetime,
+                "Reminders Revised": len(chapter.reminders),
+                "Exams Appeared": chapter.exams_appeared,
+                "Exam Status": chapter.exam_status,
+                "Time Spent (minutes)": chapter.time_spent,
+            })
+    if rows:
+        st.markdown(f"**Archived chapters: {len(rows)}**")
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    else:
+        st.info("No archived chapters yet.")
+
+# ---------------- View Router ----------------
+# Only the selected view runs on a rerun. Streamlit drops the state of widgets
+# that were not drawn, so widgets registered with view_key() are saved per view
+# and restored the next time their view is shown. Each view waits only for the
+# data it shows: a subject view for its subject, History for the archive, the
+# others for the whole working set.
+VIEWS = {subject: (lambda subject=subject: display_subject_view(subject)) for subject in SUBJECT_CHOICES}
+VIEWS.update({
+    "Today's Revisions": display_todays_revisions,
+    "Productivity Tracking": display_productivity_tracking,
+    "To Do List": display_todo_list,
+    "History": display_history,
+})
+
+st.markdown("<div class='main-header'><h1>NEET Prep Tracker Dashboard (Sathvik)</h1></div>", unsafe_allow_html=True)
+active_view = st.radio("View:", list(VIEWS), horizontal=True, key="active_view", label_visibility="collapsed")
+try:
+    VIEWS[active_view]()
+finally:
+    save_view_state(active_view)
+    PROFILE.finish(active_view)
+
+if "first render" not in st.session_state['session_timer'].report():
+    st.session_state['session_timer'].record("first render", (time.perf_counter() - st.session_state['session_started']) * 1000)
+
 st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
+
+# ---------------- Debug Panel ----------------
+# Hidden unless metrics are on and the URL has ?debug=1. Section and storage
+# timings are process-wide; the caption shows this rerun's own sections.
+if METRICS_ENABLED and st.experimental_get_query_params().get("debug", [""])[0] == "1":
+    with st.expander("Debug Metrics", expanded=True):
+        st.caption("This rerun: " + " · ".join(f"{name} {elapsed_ms:.0f} ms" for name, elapsed_ms in PROFILE.sections.items()))
+        snapshot = METRICS.snapshot()
+        st.subheader("Rerun Sections")
+        st.dataframe(pd.DataFrame(snapshot["sections"]), use_container_width=True)
+        st.subheader("Storage Calls")
+        st.dataframe(pd.DataFrame(snapshot["storage"]), use_container_width=True)
+        figures = FIGURES.stats()
+        sync = get_write_queue().stats()
+        st.caption(f"Figure cache: {figures['entries']} figures · {figures['hits']} hits · {figures['misses']} misses · "
+                   f"write queue: {sync['flushes']} flushes · {sync['failures']} failures")
+        st.download_button("Download JSON", METRICS.to_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Download Prometheus", METRICS.to_prometheus(), file_name="metrics.prom", mime="text/plain")
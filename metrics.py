@@ -0,0 +1,148 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+
+# ---------------- Rerun & Storage Metrics ----------------
+# Opt-in instrumentation (METRICS=1). A RerunProfiler times the named sections
+# of one rerun and records them under the active view; an InstrumentedBackend
+# (storage.py) records every storage call's latency and payload size. Both
+# feed one process-wide registry that keeps a count, a sum and a window of
+# recent samples per series, so percentiles follow current behaviour. The
+# registry exports as JSON or in the Prometheus text format.
+
+SAMPLE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_PREFIX = "neet_tracker"
+
+
+class Series:
+    __slots__ = ("count", "total_ms", "samples", "bytes", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.samples = collections.deque(maxlen=SAMPLE_WINDOW)
+        self.bytes = 0
+        self.errors = 0
+
+    def observe(self, elapsed_ms=None, nbytes=0, ok=True):
+        # elapsed_ms=None counts the event (and its bytes) without a timing, e.g. a streamed listen() event.
+        self.count += 1
+        self.bytes += nbytes
+        self.errors += not ok
+        if elapsed_ms is not None:
+            self.total_ms += elapsed_ms
+            self.samples.append(elapsed_ms)
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        summary = {"count": self.count, "sum_ms": round(self.total_ms, 3), "bytes": self.bytes, "errors": self.errors}
+        summary.update({f"p{int(q * 100)}_ms": round(self.quantile(q), 3) for q in QUANTILES})
+        return summary
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sections = {}  # (view, section) -> Series
+        self._storage = {}  # op -> Series
+        self.started = time.time()
+
+    def observe_section(self, view, section, elapsed_ms):
+        with self._lock:
+            self._sections.setdefault((view or "", section), Series()).observe(elapsed_ms)
+
+    def observe_storage(self, op, elapsed_ms=None, nbytes=0, ok=True):
+        with self._lock:
+            self._storage.setdefault(op, Series()).observe(elapsed_ms, nbytes, ok)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "sections": [{"view": view, "section": section, **series.summary()}
+                             for (view, section), series in sorted(self._sections.items())],
+                "storage": [{"op": op, **series.summary()} for op, series in sorted(self._storage.items())],
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            sections = sorted(self._sections.items())
+            storage = sorted(self._storage.items())
+
+            def summary(name, help_text, series_by_labels):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, series in series_by_labels:
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_labels(**labels, quantile=q)} {series.quantile(q) / 1000:.6f}")
+                    lines.append(f"{name}_sum{_labels(**labels)} {series.total_ms / 1000:.6f}")
+                    lines.append(f"{name}_count{_labels(**labels)} {series.count}")
+
+            def counter(name, help_text, values):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in values:
+                    lines.append(f"{name}{_labels(**labels)} {value}")
+
+            summary(f"{PROMETHEUS_PREFIX}_rerun_section_seconds", "Time spent in each section of a rerun.",
+                    [({"view": view, "section": section}, series) for (view, section), series in sections])
+            timed = [(op, series) for op, series in storage if series.samples]
+            summary(f"{PROMETHEUS_PREFIX}_storage_request_seconds", "Latency of storage backend calls.",
+                    [({"op": op}, series) for op, series in timed])
+            counter(f"{PROMETHEUS_PREFIX}_storage_calls_total", "Storage backend calls and streamed events.",
+                    [({"op": op}, series.count) for op, series in storage])
+            counter(f"{PROMETHEUS_PREFIX}_storage_payload_bytes_total", "JSON payload bytes sent or received.",
+                    [({"op": op}, series.bytes) for op, series in storage])
+            counter(f"{PROMETHEUS_PREFIX}_storage_errors_total", "Storage backend calls that raised.",
+                    [({"op": op}, series.errors) for op, series in storage])
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class RerunProfiler:
+    # Times the sections of one rerun. Sections may nest or repeat; repeats add up.
+    def __init__(self, enabled=True, metrics=METRICS):
+        self.enabled = enabled
+        self._metrics = metrics
+        self._start = time.perf_counter()
+        self.sections = {}
+
+    @contextlib.contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def finish(self, view):
+        if not self.enabled:
+            return
+        self.sections["rerun"] = (time.perf_counter() - self._start) * 1000
+        for name, elapsed_ms in self.sections.items():
+            self._metrics.observe_section(view, name, elapsed_ms)
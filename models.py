@@ -0,0 +1,322 @@
+import datetime
+import os
+import threading
+import time
+
+from schema import CHAPTER_KEYS, R_STATUS, REMINDERS_KEY, decode_chapter, encode_chapter, increment, is_current
+
+# ---------------- Chapter & Reminder Records ----------------
+# Chapters and reminders are held as __slots__ records instead of dicts. Every
+# chapter gets a stable chapter_id (also its key in Firebase), so widget keys
+# and database paths no longer depend on list positions.
+
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_id_sequence = 0
+
+
+def new_chapter_id():
+    # Millisecond timestamp first, like Firebase push IDs, so keys sort in creation
+    # order; the sequence keeps IDs generated within the same millisecond ordered.
+    global _last_id_ms, _id_sequence
+    with _id_lock:
+        now_ms = int(time.time() * 1000)
+        if now_ms <= _last_id_ms:
+            _id_sequence += 1
+        else:
+            _last_id_ms, _id_sequence = now_ms, 0
+        return f"{_last_id_ms:012x}{_id_sequence:04x}{os.urandom(3).hex()}"
+
+
+class Reminder:
+    __slots__ = ("reminder_id", "type", "time", "status")
+
+    def __init__(self, reminder_id, type, time, status="Pending"):
+        self.reminder_id = reminder_id
+        self.type = type
+        self.time = time
+        self.status = status
+
+    def copy(self):
+        return Reminder(self.reminder_id, self.type, self.time, self.status)
+
+
+class Chapter:
+    __slots__ = ("chapter_id", "chapter_name", "entry_datetime", "reminders", "exams_appeared", "exam_status", "time_spent")
+
+    def __init__(self, chapter_id, chapter_name, entry_datetime, reminders, exams_appeared=0, exam_status="Not Appeared", time_spent=0):
+        self.chapter_id = chapter_id
+        self.chapter_name = chapter_name
+        self.entry_datetime = entry_datetime
+        self.reminders = reminders
+        self.exams_appeared = exams_appeared
+        self.exam_status = exam_status
+        self.time_spent = time_spent
+
+    @classmethod
+    def from_firebase(cls, chapter_id, raw):
+        name, entry, reminders, exams_appeared, exam_status, time_spent = decode_chapter(raw)
+        return cls(chapter_id, name, entry, [Reminder(*reminder) for reminder in reminders], exams_appeared, exam_status, time_spent)
+
+    def copy(self):
+        return Chapter(self.chapter_id, self.chapter_name, self.entry_datetime, [r.copy() for r in self.reminders],
+                       self.exams_appeared, self.exam_status, self.time_spent)
+
+    def to_firebase(self):
+        return encode_chapter(self.chapter_name, self.entry_datetime,
+                              [(r.reminder_id, r.type, r.time, r.status) for r in self.reminders],
+                              self.exams_appeared, self.exam_status, self.time_spent)
+
+    def reminder_position(self, reminder_id):
+        for pos, reminder in enumerate(self.reminders):
+            if reminder.reminder_id == reminder_id:
+                return pos
+        raise KeyError(reminder_id)
+
+    def reminder(self, reminder_id):
+        return self.reminders[self.reminder_position(reminder_id)]
+
+
+class SubjectChapters:
+    # Insertion-ordered chapters with hash lookups by ID and by name.
+    __slots__ = ("_by_id", "_by_name")
+
+    def __init__(self, chapters=()):
+        self._by_id = {}
+        self._by_name = {}
+        for chapter in chapters:
+            self.add(chapter)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, chapter_id):
+        return chapter_id in self._by_id
+
+    def ids(self):
+        return list(self._by_id)
+
+    def copy(self):
+        return SubjectChapters(ch.copy() for ch in self)
+
+    def get(self, chapter_id):
+        return self._by_id.get(chapter_id)
+
+    def find_by_name(self, chapter_name):
+        matches = self._by_name.get(chapter_name)
+        return matches[0] if matches else None
+
+    def add(self, chapter):
+        self._by_id[chapter.chapter_id] = chapter
+        self._by_name.setdefault(chapter.chapter_name, []).append(chapter)
+
+    def put(self, chapter):
+        # Replaces a chapter with the same ID in place, keeping its position.
+        previous = self._by_id.get(chapter.chapter_id)
+        if previous is None:
+            self.add(chapter)
+            return
+        self._by_id[chapter.chapter_id] = chapter
+        self._unname(previous)
+        self._by_name.setdefault(chapter.chapter_name, []).append(chapter)
+
+    def remove(self, chapter_id):
+        chapter = self._by_id.pop(chapter_id)
+        self._unname(chapter)
+        return chapter
+
+    def _unname(self, chapter):
+        same_name = self._by_name[chapter.chapter_name]
+        same_name.remove(chapter)
+        if not same_name:
+            del self._by_name[chapter.chapter_name]
+
+
+# The revision schedule: (reminder_id, type, delay after the entry time).
+REMINDER_SCHEDULE = (
+    (1, "12 hour Reminder", datetime.timedelta(hours=12)),
+    (2, "3 days Reminder", datetime.timedelta(days=3)),
+    (3, "5 days Reminder", datetime.timedelta(days=5)),
+)
+
+
+def build_reminders(entry_datetime, reminder_ids=None):
+    # All of the schedule by default, or just the reminders picked by ID.
+    return [Reminder(reminder_id, reminder_type, entry_datetime + delay)
+            for reminder_id, reminder_type, delay in REMINDER_SCHEDULE
+            if reminder_ids is None or reminder_id in reminder_ids]
+
+
+# ---------------- Progress Counters ----------------
+# Reminder counts are kept in a small node next to the chapters:
+#   {"total": n, "revised": m, "subjects": {subject: {"total": n, "revised": m}}}
+# Every chapter write records matching increments, sent in the same multi-path
+# update, so progress bars read two numbers instead of walking the chapters.
+
+def chapter_counts(chapter):
+    return len(chapter.reminders), sum(1 for rem in chapter.reminders if rem.status == "Revised")
+
+
+def count_progress(data):
+    # Full recount; only used to create the node for data that predates it.
+    counts = {"total": 0, "revised": 0, "subjects": {}}
+    for subject, chapters in data.items():
+        subject_counts = counts["subjects"].setdefault(subject, {"total": 0, "revised": 0})
+        for chapter in chapters:
+            total, revised = chapter_counts(chapter)
+            subject_counts["total"] += total
+            subject_counts["revised"] += revised
+        counts["total"] += subject_counts["total"]
+        counts["revised"] += subject_counts["revised"]
+    return counts
+
+
+def progress_deltas(subject, total, revised):
+    # {path relative to the progress node: increment}
+    deltas = {}
+    for key, delta in (("total", total), ("revised", revised)):
+        if delta:
+            deltas[f"subjects/{subject}/{key}"] = increment(delta)
+            deltas[key] = increment(delta)
+    return deltas
+
+
+def progress_percent(counts, subject=None):
+    if subject is not None:
+        counts = ((counts or {}).get("subjects") or {}).get(subject)
+    total = (counts or {}).get("total", 0)
+    return (counts.get("revised", 0) / total) * 100 if total else 0
+
+
+# ---------------- Firebase Conversion ----------------
+# Chapters are stored keyed by chapter_id in the compact schema (see schema.py).
+# Older trees stored each subject as an array and each chapter as a verbose
+# dict; those are still read, and such subjects are rewritten once on load.
+
+def is_legacy_subject(raw_chapters):
+    return isinstance(raw_chapters, list)
+
+
+def is_orphaned(raw_chapter):
+    # A field write that lands after its chapter was deleted or archived leaves a
+    # record with neither name nor entry. It is skipped, and migration drops it.
+    return isinstance(raw_chapter, dict) and not any(
+        key in raw_chapter for key in (CHAPTER_KEYS["chapter_name"], CHAPTER_KEYS["entry_datetime"], "chapter_name", "entry_datetime"))
+
+
+def needs_migration(raw_chapters):
+    if is_legacy_subject(raw_chapters):
+        return True
+    return any(raw and not is_current(raw) for raw in (raw_chapters or {}).values())
+
+
+def process_subject_data(data):
+    processed = {}
+    for subject, raw_chapters in data.items():
+        if is_legacy_subject(raw_chapters):
+            items = [(new_chapter_id(), raw) for raw in raw_chapters if raw]
+        else:
+            items = (raw_chapters or {}).items()
+        processed[subject] = SubjectChapters(Chapter.from_firebase(cid, raw) for cid, raw in items if not is_orphaned(raw))
+    return processed
+
+
+def prepare_data_for_firebase(data):
+    return {subject: {ch.chapter_id: ch.to_firebase() for ch in chapters} for subject, chapters in data.items()}
+
+
+# ---------------- Chapter Archive ----------------
+# Chapters whose reminders are all revised and that were entered before the
+# archive age move to a cold node with the same {subject: {chapter_id: chapter}}
+# layout. They leave the working set that every load, scan and save walks;
+# views covering all history read the archive on demand.
+
+def is_archivable(chapter, cutoff):
+    return (bool(chapter.reminders) and all(rem.status == "Revised" for rem in chapter.reminders)
+            and isinstance(chapter.entry_datetime, datetime.datetime) and chapter.entry_datetime < cutoff)
+
+
+def merge_subject_data(*datasets):
+    # One {subject: SubjectChapters} over several, e.g. the working set and the archive. Chapters are shared, not copied.
+    merged = {}
+    for data in datasets:
+        for subject, chapters in data.items():
+            target = merged.setdefault(subject, SubjectChapters())
+            for chapter in chapters:
+                target.add(chapter)
+    return merged
+
+
+def chapter_path(subject, chapter_id):
+    return f"{subject}/{chapter_id}"
+
+
+def chapter_field_path(subject, chapter_id, field):
+    return f"{subject}/{chapter_id}/{CHAPTER_KEYS[field]}"
+
+
+def reminder_status_path(subject, chapter, reminder_id):
+    # The stored value is schema.status_code(status).
+    return f"{subject}/{chapter.chapter_id}/{REMINDERS_KEY}/{chapter.reminder_position(reminder_id)}/{R_STATUS}"
+
+
+# ---------------- Todos ----------------
+# Todos live under todo_data/<todo_id> as {"task", "status", "timestamp"}. The
+# ISO timestamp is indexed, so loads ask for just the retention window, and
+# every add, toggle or delete writes only its own task.
+
+TODO_RETENTION = datetime.timedelta(days=1)
+TODO_TIMESTAMP = "timestamp"
+def new_todo_id():
+    # A chapter-style ID, so keys sort in creation order; the letter prefix keeps it
+    # from ever being all digits and mistaken for a legacy list index.
+    return f"t{new_chapter_id()}"
+
+
+def todo_cutoff(now):
+    return (now - TODO_RETENTION).isoformat()
+
+
+def is_recent_todo(todo, now):
+    # A status write that raced the task's compaction leaves a record with no task or timestamp.
+    if not isinstance(todo, dict) or not todo.get("task") or not todo.get(TODO_TIMESTAMP):
+        return False
+    return todo[TODO_TIMESTAMP] > todo_cutoff(now)
+
+
+def recent_todos(raw_todos, now):
+    # {todo_id: todo} for the todos still shown, oldest first.
+    items = raw_todos.items() if isinstance(raw_todos, dict) else enumerate(raw_todos or [])
+    recent = [(str(todo_id), todo) for todo_id, todo in items if is_recent_todo(todo, now)]
+    return dict(sorted(recent, key=lambda item: (item[1][TODO_TIMESTAMP], item[0])))
+
+
+def is_legacy_todos(raw_todos):
+    # The original layout was one array, which Firebase hands back keyed by index.
+    if isinstance(raw_todos, list):
+        return True
+    return bool(raw_todos) and any(str(key).isdigit() for key in raw_todos)
+
+
+def rekey_todos(raw_todos):
+    # Index-keyed todos get IDs, in timestamp order; todos that already have one keep it.
+    items = raw_todos.items() if isinstance(raw_todos, dict) else enumerate(raw_todos or [])
+    keyed, legacy = {}, []
+    for key, todo in items:
+        if not isinstance(todo, dict):
+            continue
+        if str(key).isdigit():
+            legacy.append(todo)
+        else:
+            keyed[key] = todo
+    for todo in sorted(legacy, key=lambda todo: todo.get(TODO_TIMESTAMP) or ""):
+        keyed[new_todo_id()] = todo
+    return keyed
+
+
+def todo_path(todo_id, field=None):
+    return f"{todo_id}/{field}" if field else todo_id
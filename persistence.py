@@ -0,0 +1,319 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+
+from schema import apply_increment, is_increment
+from storage import WRITE_MARKERS_NODE
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Change Tracking ----------------
+# Mutations record the database paths they touched instead of re-uploading
+# the whole tree. Pending paths are merged and sent as one multi-path update;
+# increments (schema.increment) to the same path add up rather than replace.
+
+
+def _ancestors(path):
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        yield "/".join(parts[:i])
+
+
+def _assign(container, keys, value):
+    for key in keys[:-1]:
+        if isinstance(container, list):
+            container = container[int(key)]
+        else:
+            container = container.setdefault(key, {})
+    last = keys[-1]
+    if isinstance(container, list):
+        container[int(last)] = value
+    elif value is None:
+        container.pop(last, None)
+    elif is_increment(value):
+        container[last] = apply_increment(container.get(last), value)
+    else:
+        container[last] = value
+
+
+class ChangeSet:
+    def __init__(self):
+        self._updates = {}
+
+    def record(self, path, value):
+        path = path.strip("/")
+        # A pending write to an ancestor already carries the whole subtree,
+        # so patch the new value into it rather than sending overlapping paths.
+        for ancestor in _ancestors(path):
+            if ancestor in self._updates:
+                base = self._updates[ancestor]
+                if base is None:
+                    base = self._updates[ancestor] = {}
+                _assign(base, path[len(ancestor) + 1:].split("/"), value)
+                return
+        if is_increment(value) and path in self._updates:
+            self._updates[path] = apply_increment(self._updates[path], value)
+            return
+        prefix = path + "/"
+        for pending in [p for p in self._updates if p.startswith(prefix)]:
+            del self._updates[pending]
+        self._updates[path] = value
+
+    def pop_all(self):
+        updates, self._updates = self._updates, {}
+        return updates
+
+    def paths(self):
+        return list(self._updates)
+
+    def __len__(self):
+        return len(self._updates)
+
+
+def submit_changes(queue, writes):
+    # writes: [(node root, mirror, {path under the root: value})]. Each mirror takes
+    # its own updates and the queue gets them all, with the mirrors' version
+    # counter bumps, as one multi-path update.
+    batch = {}
+    for root, mirror, updates in writes:
+        if not updates:
+            continue
+        mirror.apply_updates(updates)
+        batch.update({f"{root}/{path}": value for path, value in updates.items()})
+        batch.update(mirror.version_bump())
+    if batch:
+        queue.submit(batch)
+
+
+# ---------------- Write-Behind Queue ----------------
+# Sessions hand their change sets to one background worker per process. Writes
+# to the same path inside the debounce window are merged, and everything
+# pending is sent to the storage backend as a single multi-path update(). With
+# a journal, every submit is on disk before it returns, and whatever was not
+# flushed before a crash is queued again on the next start.
+#
+# Sets are safe to send twice; increments are not, and both a retried flush
+# (the failed update may have landed) and a journal replay can repeat one. So
+# each submit's increments keep an ID, and the update that applies them also
+# sets markers_path/<id>. Increments whose fate is unknown are only sent again
+# if their marker is missing. Markers are deleted with the next batch once the
+# journal no longer holds their increments.
+
+
+def _split_increments(updates):
+    sets, increments = {}, {}
+    for path, value in updates.items():
+        (increments if is_increment(value) else sets)[path] = value
+    return sets, increments
+
+
+class WriteBehindQueue:
+    def __init__(self, store, debounce_seconds=0.5, max_delay_seconds=2.0, retry_seconds=5.0, journal=None,
+                 markers_path=WRITE_MARKERS_NODE):
+        self._store = store
+        self._markers_path = markers_path
+        self._journal = journal
+        self._journal_seq = 0
+        self._debounce = debounce_seconds
+        self._max_delay = max_delay_seconds
+        self._retry = retry_seconds
+        self._changes = ChangeSet()
+        self._increments = []  # [(id, {path: increment})] not sent yet
+        self._unconfirmed = []  # the same, for sends that may have landed
+        self._applied_markers = []  # markers no longer needed, deleted with the next batch
+        self._cond = threading.Condition()
+        self._first_submit = None
+        self._last_submit = None
+        self._in_flight = 0
+        self._in_flight_paths = []
+        self._closed = False
+        self._flushes = 0
+        self._failures = 0
+        self._last_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        if journal is not None:
+            self._restore(journal.pending())
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _restore(self, entries):
+        for entry in entries:
+            for path, value in entry["updates"].items():
+                self._changes.record(path, value)
+            if entry.get("increments"):
+                self._unconfirmed.append((entry["id"], entry["increments"]))
+            self._journal_seq = entry["seq"]
+        if entries:
+            logger.info("Replaying %d journaled writes", len(entries))
+            self._first_submit = self._last_submit = time.monotonic()
+
+    def _log(self, entry):
+        if self._journal is None:
+            return
+        try:
+            self._journal_seq = self._journal.append(entry)
+        except OSError:
+            logger.exception("Could not journal a write; it is only held in memory")
+
+    def submit(self, updates):
+        sets, increments = _split_increments(updates)
+        with self._cond:
+            now = time.monotonic()
+            entry = {"updates": sets}
+            if increments:
+                entry.update(increments=increments, id=uuid.uuid4().hex)
+                self._increments.append((entry["id"], increments))
+            self._log(entry)
+            for path, value in sets.items():
+                self._changes.record(path, value)
+            if self._first_submit is None:
+                self._first_submit = now
+            self._last_submit = now
+            self._cond.notify_all()
+
+    def _pending(self):
+        return len(self._changes) + len(self._increments) + len(self._unconfirmed)
+
+    def _marker(self, increment_id):
+        return f"{self._markers_path}/{increment_id}"
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending() and not self._closed:
+                self._cond.wait()
+            # Wait for a quiet debounce window, but never hold writes past max_delay.
+            while not self._closed:
+                now = time.monotonic()
+                deadline = min(self._last_submit + self._debounce, self._first_submit + self._max_delay)
+                if now >= deadline:
+                    break
+                self._cond.wait(deadline - now)
+            batch = self._changes.pop_all()
+            increments, self._increments = self._increments, []
+            unconfirmed, self._unconfirmed = self._unconfirmed, []
+            self._first_submit = self._last_submit = None
+            self._in_flight = len(batch) + len(increments) + len(unconfirmed)
+            self._in_flight_paths = [*batch, *(path for _, group in increments + unconfirmed for path in group)]
+            return batch, increments, unconfirmed, self._journal_seq
+
+    def _requeue(self, batch, unconfirmed):
+        # Anything submitted while the failed batch was in flight is newer and wins.
+        with self._cond:
+            newer = self._changes.pop_all()
+            for path, value in batch.items():
+                self._changes.record(path, value)
+            for path, value in newer.items():
+                self._changes.record(path, value)
+            self._unconfirmed[:0] = unconfirmed
+            now = time.monotonic()
+            self._first_submit = self._last_submit = now
+
+    def _run(self):
+        shutdown_attempts = 0
+        while True:
+            batch, increments, unconfirmed, journal_seq = self._take_batch()
+            if not batch and not increments and not unconfirmed:
+                if self._closed:
+                    return
+                continue
+            start = time.perf_counter()
+            applied = []
+            try:
+                while unconfirmed:
+                    increment_id, _ = unconfirmed[0]
+                    if self._store.get(self._marker(increment_id)) is None:
+                        increments.append(unconfirmed[0])
+                    else:
+                        applied.append(increment_id)
+                    unconfirmed.pop(0)
+                update = dict(batch)
+                for increment_id, group in increments:
+                    for path, value in group.items():
+                        update[path] = apply_increment(update[path], value) if path in update else value
+                    update[self._marker(increment_id)] = int(time.time())
+                update.update({self._marker(increment_id): None for increment_id in self._applied_markers})
+                if update:
+                    self._store.update(update)
+                    applied += [increment_id for increment_id, _ in increments]
+                    self._applied_markers = []
+                    batch, increments = {}, []
+            except Exception:
+                logger.exception("Write-behind flush of %d paths failed; retrying", len(batch))
+                # Without a reply the update may still have landed, so its increments need their marker checked.
+                self._requeue(batch, increments + unconfirmed)
+                with self._cond:
+                    self._failures += 1
+                    self._in_flight = 0
+                    self._in_flight_paths = []
+                    self._cond.notify_all()
+                    if not self._closed:
+                        self._cond.wait(self._retry)
+                        continue
+                    shutdown_attempts += 1
+                    if shutdown_attempts >= 3:
+                        logger.error("Dropping %d unsaved writes at shutdown", self._pending())
+                        return
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            acknowledged = True
+            if self._journal is not None and journal_seq:
+                try:
+                    self._journal.ack(journal_seq)
+                except OSError:
+                    acknowledged = False
+                    logger.exception("Could not acknowledge journal entries; they will be replayed")
+            if acknowledged:
+                # A replay would need these markers; otherwise they stay, which only costs a few bytes.
+                self._applied_markers += applied
+            with self._cond:
+                self._flushes += 1
+                self._last_flush_ms = elapsed_ms
+                self._total_flush_ms += elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._in_flight = 0
+                self._in_flight_paths = []
+                self._cond.notify_all()
+
+    def has_pending(self, prefixes):
+        # Whether a queued or in-flight write touches one of the given nodes or anything below them.
+        prefixes = [prefix.strip("/") + "/" for prefix in prefixes]
+        with self._cond:
+            paths = [*self._changes.paths(), *self._in_flight_paths,
+                     *(path for _, group in self._increments + self._unconfirmed for path in group)]
+        return any(f"{path}/".startswith(prefix) or prefix.startswith(f"{path}/") for path in paths for prefix in prefixes)
+
+    def flush(self, timeout=None):
+        # Blocks until everything submitted so far has been written.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._last_submit = self._first_submit = float("-inf") if self._pending() else None
+            self._cond.notify_all()
+            while self._pending() or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": self._pending(),
+                "journal_pending": len(self._journal) if self._journal is not None else 0,
+                "in_flight": self._in_flight,
+                "flushes": self._flushes,
+                "failures": self._failures,
+                "last_flush_ms": self._last_flush_ms,
+                "avg_flush_ms": self._total_flush_ms / self._flushes if self._flushes else 0.0,
+                "max_flush_ms": self._max_flush_ms,
+            }
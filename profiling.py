@@ -0,0 +1,59 @@
+import contextlib
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Startup Timing ----------------
+# Cold-start phases (imports, storage init, first data load) happen once per
+# server process, so STARTUP keeps the first measurement of each phase.
+# Sessions keep their own PhaseTimer for per-session phases such as the first
+# render.
+
+
+class PhaseTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            if name not in self._phases:
+                self._phases[name] = elapsed_ms
+                logger.info("startup phase %s: %.1f ms", name, elapsed_ms)
+
+    def report(self):
+        with self._lock:
+            return dict(self._phases)
+
+
+STARTUP = PhaseTimer()
+
+
+class LazyModule:
+    # Stands in for a heavy module and imports it on first attribute access,
+    # timing the import as a startup phase.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                with STARTUP.phase(f"import {self._name}"):
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
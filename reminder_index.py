@@ -0,0 +1,86 @@
+import bisect
+import datetime
+
+# ---------------- Reminder Index ----------------
+# Reminders bucketed by calendar day so the revision views only touch the
+# days they show. Entries are (subject, chapter, reminder) handles pointing at
+# the session's own records; a sorted list of the days that have reminders
+# answers date ranges with two bisections.
+
+
+def reminder_date(reminder):
+    value = reminder.time
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    try:
+        return datetime.datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        return None
+
+
+class ReminderIndex:
+    def __init__(self):
+        self._by_date = {}
+        self._dates = []
+        self._revised = {}
+
+    @classmethod
+    def build(cls, data):
+        index = cls()
+        for subject, chapters in data.items():
+            for chapter in chapters:
+                index.add_chapter(subject, chapter)
+        return index
+
+    def add_chapter(self, subject, chapter):
+        for reminder in chapter.reminders:
+            r_date = reminder_date(reminder)
+            if r_date is None:
+                continue
+            if r_date not in self._by_date:
+                self._by_date[r_date] = []
+                self._revised[r_date] = 0
+                bisect.insort(self._dates, r_date)
+            self._by_date[r_date].append((subject, chapter, reminder))
+            if reminder.status == "Revised":
+                self._revised[r_date] += 1
+
+    def remove_chapter(self, chapter):
+        for reminder in chapter.reminders:
+            r_date = reminder_date(reminder)
+            handles = self._by_date.get(r_date)
+            if not handles:
+                continue
+            handles[:] = [h for h in handles if h[2] is not reminder]
+            if reminder.status == "Revised":
+                self._revised[r_date] -= 1
+            if not handles:
+                del self._by_date[r_date]
+                del self._revised[r_date]
+                self._dates.pop(bisect.bisect_left(self._dates, r_date))
+
+    def status_changed(self, reminder, previous_status):
+        r_date = reminder_date(reminder)
+        if r_date not in self._revised or previous_status == reminder.status:
+            return
+        self._revised[r_date] += 1 if reminder.status == "Revised" else -1
+
+    def on(self, day):
+        return list(self._by_date.get(day, ()))
+
+    def revised_on(self, day):
+        return self._revised.get(day, 0)
+
+    def dates_between(self, start_date=None, end_date=None):
+        lo = bisect.bisect_left(self._dates, start_date) if start_date else 0
+        hi = bisect.bisect_right(self._dates, end_date) if end_date else len(self._dates)
+        return self._dates[lo:hi]
+
+    def between(self, start_date=None, end_date=None):
+        return [handle for day in self.dates_between(start_date, end_date) for handle in self._by_date[day]]
+
+    def daily_counts(self, start_date=None, end_date=None):
+        return {
+            day: {"total": len(self._by_date[day]), "revised": self._revised[day]}
+            for day in self.dates_between(start_date, end_date)
+        }
@@ -0,0 +1,136 @@
+import datetime
+
+# ---------------- Wire Schema ----------------
+# Chapters are stored in a compact, versioned form:
+#   {"v": 2, "n": name, "e": entry, "x": exams_appeared, "s": exam_status,
+#    "t": time_spent, "r": [[reminder_id, type, offset, status], ...]}
+# Times are integer seconds since 1970-01-01 in the app's wall-clock time (no
+# time zone conversion), reminder times are offsets from the entry time, and
+# reminder type and status are small integer codes. Chapters without "v" are
+# the original verbose dicts and are still decoded, so old trees keep loading
+# until they are migrated.
+
+SCHEMA_VERSION = 2
+EPOCH = datetime.datetime(1970, 1, 1)
+REMINDER_TYPES = ("12 hour Reminder", "3 days Reminder", "5 days Reminder")
+STATUSES = ("Pending", "Revised")
+CHAPTER_KEYS = {"chapter_name": "n", "entry_datetime": "e", "exams_appeared": "x", "exam_status": "s", "time_spent": "t"}
+REMINDERS_KEY = "r"
+R_ID, R_TYPE, R_OFFSET, R_STATUS = range(4)
+# Reminder offsets come from a handful of schedules, so their timedeltas are reused.
+_OFFSETS = {}
+
+
+def to_epoch(value):
+    # Non-datetime values (None, unparseable legacy strings) are stored as they are.
+    if isinstance(value, datetime.datetime):
+        return int((value - EPOCH).total_seconds())
+    return value
+
+
+def from_epoch(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return EPOCH + datetime.timedelta(seconds=value)
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+
+def encode_code(value, table):
+    # Values outside the table (e.g. a custom reminder type) are stored verbatim.
+    try:
+        return table.index(value)
+    except ValueError:
+        return value
+
+
+def decode_code(value, table):
+    if type(value) is int and 0 <= value < len(table):
+        return table[value]
+    return value
+
+
+def status_code(status):
+    return encode_code(status, STATUSES)
+
+
+def _as_list(value):
+    # Firebase may hand back a sparse array as an object keyed by index.
+    if isinstance(value, dict):
+        return [value[key] for key in sorted(value, key=int)]
+    return value or []
+
+
+def is_current(raw_chapter):
+    return isinstance(raw_chapter, dict) and raw_chapter.get("v") == SCHEMA_VERSION
+
+
+def encode_chapter(chapter_name, entry_datetime, reminders, exams_appeared, exam_status, time_spent):
+    # reminders: [(reminder_id, type, time, status)]
+    entry = to_epoch(entry_datetime)
+    relative = isinstance(entry, int)
+    encoded = []
+    for reminder_id, reminder_type, r_time, status in reminders:
+        offset = to_epoch(r_time)
+        if relative and isinstance(offset, int):
+            offset -= entry
+        encoded.append([reminder_id, encode_code(reminder_type, REMINDER_TYPES), offset, encode_code(status, STATUSES)])
+    return {"v": SCHEMA_VERSION, "n": chapter_name, "e": entry, "x": exams_appeared, "s": exam_status, "t": time_spent,
+            REMINDERS_KEY: encoded}
+
+
+def decode_chapter(raw):
+    # -> (chapter_name, entry_datetime, [(reminder_id, type, time, status)], exams_appeared, exam_status, time_spent)
+    if not is_current(raw):
+        reminders = [(r.get("reminder_id"), r.get("type"), from_epoch(r.get("time")), r.get("status", "Pending"))
+                     for r in _as_list(raw.get("reminders")) if r]
+        return (raw.get("chapter_name"), from_epoch(raw.get("entry_datetime")), reminders,
+                raw.get("exams_appeared", 0), raw.get("exam_status", "Not Appeared"), raw.get("time_spent", 0))
+    entry = raw.get("e")
+    entry_datetime = from_epoch(entry)
+    relative = isinstance(entry_datetime, datetime.datetime) and isinstance(entry, int)
+    reminders = []
+    for item in _as_list(raw.get(REMINDERS_KEY)):
+        if not item:
+            continue
+        if not isinstance(item, list) or len(item) != 4:
+            item = (_as_list(item) + [None] * 4)[:4]
+        reminder_id, reminder_type, offset, status = item
+        if relative and type(offset) is int:
+            delta = _OFFSETS.get(offset)
+            if delta is None:
+                delta = datetime.timedelta(seconds=offset)
+                if len(_OFFSETS) < 1024:
+                    _OFFSETS[offset] = delta
+            r_time = entry_datetime + delta
+        else:
+            r_time = from_epoch(offset)
+        reminders.append((reminder_id, decode_code(reminder_type, REMINDER_TYPES), r_time,
+                          decode_code(status, STATUSES) or "Pending"))
+    return (raw.get("n"), entry_datetime, reminders, raw.get("x", 0), raw.get("s", "Not Appeared"), raw.get("t", 0))
+
+
+# ---------------- Server Values ----------------
+# {".sv": {"increment": n}} asks the database to add n to the stored number (a
+# missing value counts as 0), so increments from concurrent writers all land.
+# Only leaf values may be increments.
+
+def increment(delta):
+    return {".sv": {"increment": delta}}
+
+
+def is_increment(value):
+    return isinstance(value, dict) and isinstance(value.get(".sv"), dict) and "increment" in value[".sv"]
+
+
+def apply_increment(current, value):
+    # Resolves an increment against a stored value, or folds two pending increments into one.
+    delta = value[".sv"]["increment"]
+    if is_increment(current):
+        return increment(current[".sv"]["increment"] + delta)
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        return current + delta
+    return delta
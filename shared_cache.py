@@ -0,0 +1,472 @@
+import collections
+import concurrent.futures
+import copy
+import datetime
+import logging
+import threading
+import time
+
+from models import (TODO_TIMESTAMP, Chapter, is_archivable, is_legacy_subject, is_legacy_todos, is_orphaned, needs_migration,
+                    process_subject_data, prepare_data_for_firebase, recent_todos, rekey_todos, todo_cutoff)
+from profiling import STARTUP
+from schema import apply_increment, increment, is_increment
+from storage import PAGE_SIZE, version_path
+
+logger = logging.getLogger(__name__)
+
+# ---------------- Shared Data Cache ----------------
+# One mirror of a database node per server process, so new sessions copy from
+# memory instead of downloading and re-parsing the node. The mirror is filled
+# once with a plain (or paged) read and kept current by applying this
+# process's own writes; with listen=True a listen() stream also applies
+# put/patch events from other writers. Without a stream, refresh() revalidates
+# the mirror against the node's ETag and only downloads it again when another
+# writer changed it.
+#
+# Versioned mirrors skip even that download after this process's own writes:
+# every write to the node also increments a small counter next to it
+# (storage.version_path), and refresh() first reads that counter. If it moved
+# by exactly the writes this process made, nobody else wrote and the mirror
+# already has everything; only otherwise is the node itself revalidated.
+
+LISTEN_TIMEOUT_SECONDS = 30
+REFRESH_SECONDS = 15
+_LOADER = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="shared-cache-load")
+# Subjects are fetched from their own pool: a mirror load waits on these, so
+# sharing _LOADER could leave every worker waiting on queued subject reads.
+_SUBJECT_LOADER = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="shared-cache-subject")
+
+
+def _split(path):
+    return [part for part in path.strip("/").split("/") if part]
+
+
+def _set_path(tree, parts, value):
+    if not parts:
+        return value
+    if tree is None:
+        tree = {}
+    key = parts[0]
+    if isinstance(tree, list):
+        idx = int(key)
+        if idx >= len(tree):
+            tree.extend([None] * (idx + 1 - len(tree)))
+        tree[idx] = _set_path(tree[idx], parts[1:], value)
+    else:
+        child = _set_path(tree.get(key), parts[1:], value)
+        if child is None:
+            tree.pop(key, None)
+        else:
+            tree[key] = child
+    return tree
+
+
+def _get_path(tree, parts):
+    for key in parts:
+        if isinstance(tree, dict):
+            tree = tree.get(key)
+        elif isinstance(tree, list) and key.isdigit() and int(key) < len(tree):
+            tree = tree[int(key)]
+        else:
+            return None
+    return tree
+
+
+class SharedNode:
+    VERSIONED = False
+
+    def __init__(self, store, path, listen=False):
+        self._store = store
+        self._path = path
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._raw = None
+        self._registration = None
+        self._etag = None
+        self._validated = float("-inf")
+        self._version_path = version_path(path) if self.VERSIONED else None
+        self._stored_version = 0  # the counter as last read
+        self._own_writes = 0  # this process's writes since then
+        self.version = 0
+        if listen:
+            self._registration = store.listen(path, self._on_event)
+            if self._ready.wait(LISTEN_TIMEOUT_SECONDS):
+                return
+            # The stream has not delivered its initial snapshot; fall back to a plain read.
+        # Read before the node, so the node is at least as new as the counter.
+        self._stored_version = self._read_version()
+        self._apply("put", [], self._initial_read())
+
+    def _read_version(self):
+        return (self._store.get(self._version_path) or 0) if self._version_path else 0
+
+    def version_bump(self):
+        # -> the update that counts one more write by this process, to go out with the write itself.
+        if self._version_path is None:
+            return {}
+        with self._lock:
+            self._own_writes += 1
+        return {self._version_path: increment(1)}
+
+    def _write_version_bump(self):
+        # For writes made directly rather than through the write queue.
+        bump = self.version_bump()
+        if bump:
+            self._store.update(bump)
+
+    def _initial_read(self):
+        value, self._etag = self._store.get_with_etag(self._path)
+        self._validated = time.monotonic()
+        return value
+
+    def refresh(self, max_age=REFRESH_SECONDS):
+        # A listening mirror is always current; otherwise ask the backend whether
+        # the node changed since the stored ETag, at most once per max_age.
+        if self._registration is not None or time.monotonic() - self._validated < max_age:
+            return False
+        if self._version_path is not None:
+            stored = self._read_version()
+            with self._lock:
+                own = self._own_writes
+                unchanged = stored == self._stored_version + own
+                self._stored_version, self._own_writes = stored, self._own_writes - own
+            if unchanged:
+                self._validated = time.monotonic()
+                return False
+        changed, value, etag = self._store.get_if_changed(self._path, self._etag)
+        self._validated = time.monotonic()
+        if changed:
+            self._apply("put", [], value)
+        self._etag = etag
+        return changed
+
+    def apply_updates(self, updates):
+        # Mirrors a write this process is about to send; paths are relative to the node.
+        self._apply("patch", [], {path: copy.deepcopy(value) for path, value in updates.items()})
+
+    def _on_event(self, event):
+        self._apply(event.event_type, _split(event.path), event.data)
+
+    def _apply(self, event_type, parts, data):
+        with self._lock:
+            if event_type == "put":
+                self._raw = _set_path(self._raw, parts, data)
+                self._changed(parts)
+            elif event_type == "patch":
+                for key, value in (data or {}).items():
+                    child = parts + _split(key)
+                    self._raw = _set_path(self._raw, child, value)
+                    self._changed(child)
+            self.version += 1
+        self._ready.set()
+
+    def _changed(self, parts):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._raw)
+
+    def close(self):
+        if self._registration is not None:
+            self._registration.close()
+
+
+class SharedSubjects(SharedNode):
+    # Keeps parsed chapter records next to the raw mirror and re-parses only the
+    # chapters an event touched. With an archive_path, a plain initial read also
+    # leaves out chapters that models.is_archivable() places in the archive and
+    # hands the move to write(), e.g. a write queue's submit, before the mirror
+    # is handed out.
+    VERSIONED = True
+    def __init__(self, store, path, listen=False, on_subject=None, archive_path=None, archive_after=None, write=None):
+        self._parsed = {}
+        self._preparsed = None
+        self._on_subject = on_subject
+        self._write = write if write is not None else store.update
+        self._archive_path = archive_path
+        self._archive_cutoff = datetime.datetime.now() - archive_after if archive_path and archive_after else None
+        self._cold = {}
+        super().__init__(store, path, listen)
+        self._migrate_subjects()
+        self._archive_cold()
+
+    def _initial_read(self):
+        # Every subject is fetched on its own thread, in key-ordered pages so a
+        # large subject never arrives as one response, and parsed there as soon
+        # as it is in, overlapping the other subjects' downloads. This leaves no
+        # ETag for the whole node, but the version counter read just before
+        # stands in for it: refresh() only reads the node again once another
+        # writer moved the counter.
+        loads = {_SUBJECT_LOADER.submit(self._load_subject, subject): subject for subject in self._store.get_keys(self._path)}
+        raw, parsed = {}, {}
+        for future in concurrent.futures.as_completed(loads):
+            subject = loads[future]
+            raw[subject], parsed[subject] = future.result()
+        self._preparsed = parsed
+        return raw or None
+
+    def _load_subject(self, subject):
+        raw = self._read_subject(subject)
+        chapters = process_subject_data({subject: raw})[subject]
+        # Subjects still to be migrated get new chapter IDs then, so they are only
+        # archived on a later load and only published with the whole mirror.
+        if not needs_migration(raw):
+            if self._archive_cutoff is not None:
+                cold = [chapter.chapter_id for chapter in chapters if is_archivable(chapter, self._archive_cutoff)]
+                if cold:
+                    self._cold[subject] = {chapter_id: raw.pop(chapter_id) for chapter_id in cold}
+                    for chapter_id in cold:
+                        chapters.remove(chapter_id)
+            if self._on_subject is not None:
+                self._on_subject(subject, chapters.copy())
+        return raw, chapters
+
+    def _read_subject(self, subject):
+        path = f"{self._path}/{subject}"
+        chapters, start_after = {}, None
+        while True:
+            page = self._store.get_page(path, start_after, PAGE_SIZE)
+            if start_after is None and page and all(key.isdigit() for key, _ in page):
+                # Legacy array subject: key order is not index order, so read it whole.
+                return self._store.get(path)
+            chapters.update(page)
+            if len(page) < PAGE_SIZE:
+                return chapters
+            start_after = page[-1][0]
+
+    def _changed(self, parts):
+        raw = self._raw or {}
+        if not parts:
+            preparsed, self._preparsed = self._preparsed, None
+            self._parsed = preparsed if preparsed is not None else process_subject_data(raw)
+            return
+        subject = parts[0]
+        raw_chapters = raw.get(subject)
+        chapters = self._parsed.get(subject)
+        if len(parts) == 1 or chapters is None or is_legacy_subject(raw_chapters):
+            self._parsed[subject] = process_subject_data({subject: raw_chapters})[subject]
+            return
+        chapter_id = parts[1]
+        raw_chapter = raw_chapters.get(chapter_id) if raw_chapters else None
+        if raw_chapter and not is_orphaned(raw_chapter):
+            chapters.put(Chapter.from_firebase(chapter_id, raw_chapter))
+        elif chapter_id in chapters:
+            chapters.remove(chapter_id)
+
+    def _migrate_subjects(self):
+        # Array-stored subjects and verbose chapters are rewritten once, keyed by ID and
+        # in the compact schema, so every session sees the same keys and loads the small
+        # form. The write is conditional on the subject still being the version we
+        # converted; if another process got there first, its result wins.
+        with self._lock:
+            outdated = [subject for subject, chapters in (self._raw or {}).items() if needs_migration(chapters)]
+        for subject in outdated:
+            path = f"{self._path}/{subject}"
+            raw, etag = self._store.get_with_etag(path)
+            if needs_migration(raw):
+                chapters = prepare_data_for_firebase(process_subject_data({subject: raw}))[subject]
+                success, current, _ = self._store.set_if_unchanged(path, etag, chapters)
+                raw = chapters if success else current
+                if success:
+                    self._write_version_bump()
+            self.apply_updates({subject: raw})
+
+    def _archive_cold(self):
+        # Copies and deletes go out as one multi-path update, so a chapter is never in both places or neither.
+        cold, self._cold = self._cold, {}
+        updates = {}
+        for subject, chapters in cold.items():
+            for chapter_id, raw_chapter in chapters.items():
+                updates[f"{self._archive_path}/{subject}/{chapter_id}"] = raw_chapter
+                updates[f"{self._path}/{subject}/{chapter_id}"] = None
+        if updates:
+            updates.update(self.version_bump())
+            updates[version_path(self._archive_path)] = increment(1)
+            self._write(updates)
+            logger.info("Archived %d fully revised chapters from %s", len(updates) // 2, self._path)
+
+    def snapshot(self):
+        with self._lock:
+            return {subject: chapters.copy() for subject, chapters in self._parsed.items()}
+
+    def has_chapter(self, subject, chapter_id):
+        with self._lock:
+            chapters = self._parsed.get(subject)
+            return chapters is not None and chapter_id in chapters
+
+    def subject_snapshot(self, subject):
+        with self._lock:
+            chapters = self._parsed.get(subject)
+            return chapters.copy() if chapters is not None else None
+
+
+class SubjectLoads:
+    # A SharedSubjects mirror while it loads in the background. result() waits
+    # for the whole mirror, like a Future; subject() returns one subject as
+    # soon as that subject is parsed, so a view showing a single subject can
+    # render before the others arrive.
+    def __init__(self, phase, store, path, listen=False, archive_path=None, archive_after=None, write=None):
+        self._arrived = threading.Condition()
+        self._subjects = {}
+        self._future = load_in_background(phase, SharedSubjects, store, path, listen, self._subject_loaded,
+                                          archive_path, archive_after, write)
+        self._future.add_done_callback(self._finished)
+
+    def _subject_loaded(self, subject, chapters):
+        with self._arrived:
+            self._subjects[subject] = chapters
+            self._arrived.notify_all()
+
+    def _finished(self, future):
+        with self._arrived:
+            # From here on the mirror itself, with any writes applied since, is the source.
+            self._subjects.clear()
+            self._arrived.notify_all()
+
+    def done(self):
+        return self._future.done()
+
+    def add_done_callback(self, fn):
+        self._future.add_done_callback(fn)
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    def subject(self, subject):
+        # -> a copy of the subject's chapters, or None if the node has no such subject.
+        with self._arrived:
+            self._arrived.wait_for(lambda: subject in self._subjects or self._future.done())
+            if subject in self._subjects:
+                return self._subjects[subject].copy()
+        return self.result().subject_snapshot(subject)
+
+
+class SharedTodos(SharedNode):
+    # Mirrors only the todos inside the retention window, read with an indexed
+    # range query on their timestamp, so the cost stays the same however many
+    # expired todos the node still holds. refresh() repeats that query rather
+    # than revalidating an ETag for the whole node.
+    def __init__(self, store, path, listen=False):
+        super().__init__(store, path, listen)
+        self._migrate_layout()
+
+    def _initial_read(self):
+        self._validated = time.monotonic()
+        return self._store.query_by_child(self._path, TODO_TIMESTAMP, start_at=todo_cutoff(datetime.datetime.now())) or None
+
+    def refresh(self, max_age=REFRESH_SECONDS):
+        if self._registration is not None or time.monotonic() - self._validated < max_age:
+            return False
+        value = self._initial_read()
+        with self._lock:
+            changed = value != self._raw
+        if changed:
+            self._apply("put", [], value)
+        return changed
+
+    def _migrate_layout(self):
+        # The original list is rewritten once as todos keyed by ID, conditional on
+        # nobody having changed it in between; if someone did, their result wins.
+        with self._lock:
+            legacy = is_legacy_todos(self._raw)
+        if not legacy:
+            return
+        raw, etag = self._store.get_with_etag(self._path)
+        if is_legacy_todos(raw):
+            todos = rekey_todos(raw)
+            success, current, _ = self._store.set_if_unchanged(self._path, etag, todos)
+            raw = todos if success else current
+        self._apply("put", [], raw)
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(recent_todos(self._raw, datetime.datetime.now()))
+
+
+class SharedProgress(SharedNode):
+    # The progress counters (models.count_progress). This process's own writes
+    # arrive as increments and are resolved against the mirror, as the server
+    # resolves them against the node.
+    VERSIONED = True
+
+    def apply_updates(self, updates):
+        with self._lock:
+            for path, value in updates.items():
+                parts = _split(path)
+                if is_increment(value):
+                    value = apply_increment(_get_path(self._raw, parts), value)
+                self._raw = _set_path(self._raw, parts, copy.deepcopy(value))
+            self.version += 1
+        self._ready.set()
+
+    def seed(self, counts):
+        # Creates the node from a full recount unless it exists by now, in one
+        # transaction, so it needs no ETag (a listening mirror never has one) and
+        # never overwrites counts another writer stored first. -> the counts now stored.
+        value = self._store.transaction(self._path, lambda current: current if current is not None else counts)
+        if value is None:
+            value = counts
+        self._write_version_bump()
+        self._apply("put", [], copy.deepcopy(value))
+        return value
+
+
+def load_in_background(phase, factory, *args):
+    # Builds a mirror on a loader thread and returns its Future; the first build
+    # of each kind is timed as a startup phase.
+    def load():
+        with STARTUP.phase(phase):
+            return factory(*args)
+    return _LOADER.submit(load)
+
+
+def _release(entry):
+    # Closes a mirror's listen stream, once its load has finished if it is still loading.
+    if hasattr(entry, "add_done_callback"):
+        entry.add_done_callback(lambda future: _release(future.result()) if future.exception() is None else None)
+    elif hasattr(entry, "close"):
+        entry.close()
+
+
+class MirrorRegistry:
+    # The mirrors (or their loads) of each user, by kind. Users are kept in
+    # least recently used order and past max_users the oldest user's mirrors
+    # are dropped and closed, so a long-running process does not hold every
+    # student it has ever served. A failed load is dropped on its own.
+    def __init__(self, max_users):
+        # Reentrant: a factory may look up another mirror of the same user.
+        self._lock = threading.RLock()
+        self._max_users = max_users
+        self._users = collections.OrderedDict()  # user_id -> {kind: mirror or load}
+
+    def get(self, user_id, kind, factory):
+        evicted = []
+        with self._lock:
+            entries = self._users.setdefault(user_id, {})
+            self._users.move_to_end(user_id)
+            if kind not in entries:
+                entries[kind] = factory()
+            entry = entries[kind]
+            while len(self._users) > self._max_users:
+                evicted.extend(self._users.popitem(last=False)[1].values())
+        for old in evicted:
+            _release(old)
+        if evicted:
+            logger.info("Dropped %d mirrors of the least recently used user", len(evicted))
+        return entry
+
+    def has(self, user_id, kind):
+        with self._lock:
+            return kind in self._users.get(user_id, ())
+
+    def discard(self, user_id, entry):
+        with self._lock:
+            entries = self._users.get(user_id, {})
+            for kind, current in list(entries.items()):
+                if current is entry:
+                    del entries[kind]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._users)
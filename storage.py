@@ -0,0 +1,776 @@
+import collections
+import datetime
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from schema import (CHAPTER_KEYS, R_STATUS, REMINDERS_KEY, STATUSES, apply_increment, decode_chapter, decode_code,
+                    encode_chapter, from_epoch, is_increment)
+
+# ---------------- Storage Backends ----------------
+# Persistence goes through a small interface so the app can run against
+# Firebase or a local SQLite file. Paths and values use the Firebase layout in
+# both cases: get(path), multi-path update({path: value}) and listen(path, cb)
+# delivering put events shaped like firebase_admin's.
+
+DATA_NODE = "subject_chapters_data"
+TODO_NODE = "todo_data"
+TODO_ARCHIVE_NODE = "todo_archive"
+CHAPTER_ARCHIVE_NODE = "chapter_archive"
+WRITE_MARKERS_NODE = "write_markers"
+PROGRESS_NODE = "progress"
+VERSIONS_NODE = "versions"
+USERS_NODE = "users"
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+PAGE_SIZE = 200
+
+StorageEvent = collections.namedtuple("StorageEvent", "event_type path data")
+
+
+def _split(path):
+    return [part for part in path.strip("/").split("/") if part]
+
+
+def _navigate(value, parts):
+    for part in parts:
+        if isinstance(value, list):
+            idx = int(part)
+            value = value[idx] if idx < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _set_path(tree, parts, value):
+    if not parts:
+        return value
+    if isinstance(tree, list):
+        tree = {str(i): item for i, item in enumerate(tree) if item is not None}
+    elif not isinstance(tree, dict):
+        tree = {}
+    child = _set_path(tree.get(parts[0]), parts[1:], value)
+    if child is None:
+        tree.pop(parts[0], None)
+    else:
+        tree[parts[0]] = child
+    return tree or None
+
+
+def _firebase_shape(items):
+    # Firebase returns objects whose keys are all small integers as arrays.
+    if items and all(key.isdigit() for key in items):
+        size = max(int(key) for key in items) + 1
+        if len(items) * 2 > size:
+            return [items.get(str(i)) for i in range(size)]
+    return items or None
+
+
+def node_path(node, user_id=None):
+    # Each student's subjects and todos live under users/<user_id>/; without a
+    # user the app keeps using the original global nodes.
+    if not user_id:
+        return node
+    if not USER_ID_PATTERN.fullmatch(user_id):
+        raise ValueError(f"Invalid user id: {user_id!r}")
+    return f"{USERS_NODE}/{user_id}/{node}"
+
+
+def version_path(path):
+    # A node's write counter, a sibling under versions/: users/<id>/versions/<node> or versions/<node>.
+    parent, _, node = path.rpartition("/")
+    return f"{parent}/{VERSIONS_NODE}/{node}" if parent else f"{VERSIONS_NODE}/{node}"
+
+
+def _children(value):
+    if isinstance(value, list):
+        return {str(idx): item for idx, item in enumerate(value) if item is not None}
+    return value if isinstance(value, dict) else {}
+
+
+def _etag(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def _order_key(value):
+    # Firebase's order_by_child ordering: null, booleans, numbers, strings, objects.
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+def _day_bounds(start_date, end_date):
+    start = start_date.isoformat() if start_date else None
+    end = (end_date + datetime.timedelta(days=1)).isoformat() if end_date else None
+    return start, end
+
+
+class StorageBackend:
+    def get(self, path):
+        raise NotImplementedError
+
+    def update(self, updates):
+        raise NotImplementedError
+
+    def listen(self, path, callback):
+        raise NotImplementedError
+
+    # Conditional reads and writes. An ETag identifies one version of a node:
+    # get_if_changed() only returns a payload when the node moved on, and
+    # set_if_unchanged()/transaction() refuse to overwrite someone else's write.
+    def get_with_etag(self, path):
+        value = self.get(path)
+        return value, _etag(value)
+
+    def get_if_changed(self, path, etag):
+        # -> (changed, value or None, etag)
+        value, current = self.get_with_etag(path)
+        return (True, value, current) if current != etag else (False, None, etag)
+
+    def set_if_unchanged(self, path, expected_etag, value):
+        # -> (success, current value, current etag)
+        raise NotImplementedError
+
+    def transaction(self, path, fn):
+        # Applies fn(current value) -> new value atomically and returns the new value.
+        raise NotImplementedError
+
+    # Scoped reads for large nodes. The defaults fetch the whole node; Firebase
+    # uses ordered queries and SQLite pushes the limit into SQL.
+    def get_keys(self, path):
+        return sorted(_children(self.get(path)))
+
+    def get_page(self, path, start_after=None, limit=PAGE_SIZE):
+        # Up to `limit` (key, value) children ordered by key, starting after `start_after`.
+        items = sorted(_children(self.get(path)).items())
+        if start_after is not None:
+            items = [item for item in items if item[0] > start_after]
+        return items[:limit]
+
+    def query_by_child(self, path, child, start_at=None, end_at=None, limit=None):
+        # Children whose `child` value lies in [start_at, end_at], ordered by it, as
+        # {key: value}. Firebase runs this as an indexed query (see .indexOn in
+        # database.rules.json, which also closes the database to clients: the app only
+        # connects with the service account, which the rules do not apply to); the
+        # default filters the whole node.
+        low = _order_key(start_at) if start_at is not None else None
+        high = _order_key(end_at) if end_at is not None else None
+        items = []
+        for key, value in _children(self.get(path)).items():
+            order = _order_key(value.get(child) if isinstance(value, dict) else None)
+            if (low is None or order >= low) and (high is None or order <= high):
+                items.append((order, key, value))
+        items.sort(key=lambda item: item[:2])
+        return {key: value for _, key, value in items[:limit]}
+
+    # Query helpers. The defaults walk the chapter tree; SQLite answers them with indexed SQL.
+    def _iter_reminders(self, subject=None, user_id=None):
+        data = self.get(node_path(DATA_NODE, user_id)) or {}
+        for subj, chapters in data.items():
+            if subject and subj != subject:
+                continue
+            for chapter_id, chapter in _children(chapters).items():
+                if not chapter:
+                    continue
+                for reminder_id, _, r_time, status in decode_chapter(chapter)[2]:
+                    yield subj, chapter_id, {"reminder_id": reminder_id, "time": _iso(r_time), "status": status}
+
+    def reminders_between(self, start_date=None, end_date=None, subject=None, user_id=None):
+        start, end = _day_bounds(start_date, end_date)
+        rows = []
+        for subj, chapter_id, reminder in self._iter_reminders(subject, user_id):
+            r_time = reminder.get("time") or ""
+            if (start and r_time < start) or (end and r_time >= end):
+                continue
+            rows.append((subj, chapter_id, reminder.get("reminder_id"), r_time, reminder.get("status")))
+        return sorted(rows, key=lambda row: row[3])
+
+    def daily_counts(self, start_date=None, end_date=None, subject=None, user_id=None):
+        counts = {}
+        for _, _, _, r_time, status in self.reminders_between(start_date, end_date, subject, user_id):
+            day = counts.setdefault(datetime.date.fromisoformat(r_time[:10]), {"total": 0, "revised": 0})
+            day["total"] += 1
+            day["revised"] += status == "Revised"
+        return counts
+
+
+class FirebaseBackend(StorageBackend):
+    def __init__(self, db=None):
+        # db: anything shaped like firebase_admin.db, e.g. the load test's in-process stand-in.
+        if db is None:
+            from firebase_admin import db
+        self._db = db
+
+    def get(self, path):
+        return self._db.reference(path).get()
+
+    def get_keys(self, path):
+        return sorted(self._db.reference(path).get(shallow=True) or {})
+
+    def get_page(self, path, start_after=None, limit=PAGE_SIZE):
+        query = self._db.reference(path).order_by_key()
+        if start_after is None:
+            return list(_children(query.limit_to_first(limit).get()).items())
+        # start_at is inclusive, so fetch one extra and drop the cursor key.
+        items = _children(query.start_at(start_after).limit_to_first(limit + 1).get()).items()
+        return [(key, value) for key, value in items if key != start_after][:limit]
+
+    def query_by_child(self, path, child, start_at=None, end_at=None, limit=None):
+        query = self._db.reference(path).order_by_child(child)
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        if limit is not None:
+            query = query.limit_to_first(limit)
+        return dict(_children(query.get()))
+
+    def get_with_etag(self, path):
+        return self._db.reference(path).get(etag=True)
+
+    def get_if_changed(self, path, etag):
+        if etag is None:
+            return (True, *self.get_with_etag(path))
+        # Answered with 304 Not Modified, and no payload, when the ETag still matches.
+        return self._db.reference(path).get_if_changed(etag)
+
+    def set_if_unchanged(self, path, expected_etag, value):
+        return self._db.reference(path).set_if_unchanged(expected_etag, value)
+
+    def transaction(self, path, fn):
+        return self._db.reference(path).transaction(fn)
+
+    def update(self, updates):
+        self._db.reference("/").update(updates)
+
+    def listen(self, path, callback):
+        return self._db.reference(path).listen(callback)
+
+
+# ---------------- SQLite Backend ----------------
+# Chapters, reminders and todos live in indexed tables so date and subject
+# queries run in SQL. Rows carry an owner column ('' for the global nodes,
+# otherwise the user id) so every read is scoped to one user's rows. Chapter
+# IDs are only unique within a subject (legacy list subjects all count from 0),
+# so the subject is part of every chapter and reminder key. Any other path
+# falls back to a flattened key/value table.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    owner TEXT NOT NULL DEFAULT '',
+    chapter_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    chapter_name TEXT,
+    entry_datetime TEXT,
+    exams_appeared INTEGER,
+    exam_status TEXT,
+    time_spent INTEGER,
+    PRIMARY KEY (owner, subject, chapter_id)
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    owner TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL,
+    chapter_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    reminder_id INTEGER,
+    type TEXT,
+    time TEXT,
+    status TEXT,
+    PRIMARY KEY (owner, subject, chapter_id, position),
+    FOREIGN KEY (owner, subject, chapter_id) REFERENCES chapters (owner, subject, chapter_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_time ON reminders (owner, time);
+CREATE INDEX IF NOT EXISTS idx_reminders_status_time ON reminders (owner, status, time);
+CREATE TABLE IF NOT EXISTS todos (
+    owner TEXT NOT NULL DEFAULT '',
+    todo_key TEXT NOT NULL,
+    task TEXT,
+    status TEXT,
+    timestamp TEXT,
+    PRIMARY KEY (owner, todo_key)
+);
+CREATE INDEX IF NOT EXISTS idx_todos_timestamp ON todos (owner, timestamp);
+CREATE TABLE IF NOT EXISTS nodes (
+    path TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+CHAPTER_FIELDS = ("chapter_name", "entry_datetime", "exams_appeared", "exam_status", "time_spent")
+REMINDER_FIELDS = ("reminder_id", "type", "time", "status")
+TODO_FIELDS = ("task", "status", "timestamp")
+# Wire-schema keys that map straight onto a chapters column.
+COLUMN_FOR_KEY = {key: field for field, key in CHAPTER_KEYS.items() if field != "entry_datetime"}
+STRUCTURED_NODES = (DATA_NODE, TODO_NODE)
+
+
+def _route(parts):
+    # (owner, node, rest) for paths inside a table-backed node, else None.
+    if parts and parts[0] in STRUCTURED_NODES:
+        return "", parts[0], parts[1:]
+    if len(parts) >= 3 and parts[0] == USERS_NODE and parts[2] in STRUCTURED_NODES:
+        return parts[1], parts[2], parts[3:]
+    return None
+
+
+def _root_parts(owner, node):
+    return [USERS_NODE, owner, node] if owner else [node]
+
+
+class _Registration:
+    def __init__(self, listeners, entry):
+        self._listeners = listeners
+        self._entry = entry
+
+    def close(self):
+        if self._entry in self._listeners:
+            self._listeners.remove(self._entry)
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate_tables()
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def _migrate_tables(self):
+        # Databases created before per-user roots have no owner column; their
+        # rows become the global ('') owner's. Ones created before subjects were
+        # part of the chapter key have no subject on reminders, so it is taken
+        # from the chapter row (chapters that already collided stay collapsed).
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chapters)")]
+        reminder_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(reminders)")]
+        if not columns or "subject" in reminder_columns:
+            return
+        owned = "owner" in columns
+        owner, r_owner = ("owner", "r.owner") if owned else ("''", "''")
+        join = "c.owner = r.owner AND c.chapter_id = r.chapter_id" if owned else "c.chapter_id = r.chapter_id"
+        copies = [
+            f"INSERT INTO chapters (owner, chapter_id, subject, {', '.join(CHAPTER_FIELDS)}) "
+            f"SELECT {owner}, chapter_id, subject, {', '.join(CHAPTER_FIELDS)} FROM chapters_v1;",
+            f"INSERT INTO reminders (owner, subject, chapter_id, position, {', '.join(REMINDER_FIELDS)}) "
+            f"SELECT {r_owner}, c.subject, r.chapter_id, r.position, "
+            f"{', '.join(f'r.{field}' for field in REMINDER_FIELDS)} FROM reminders_v1 r JOIN chapters_v1 c ON {join};",
+            f"INSERT INTO todos (owner, todo_key, {', '.join(TODO_FIELDS)}) "
+            f"SELECT {owner}, todo_key, {', '.join(TODO_FIELDS)} FROM todos_v1;",
+        ]
+        self._conn.executescript("\n".join([
+            "BEGIN;",
+            *(f"ALTER TABLE {table} RENAME TO {table}_v1;" for table in ("chapters", "reminders", "todos")),
+            *(f"DROP INDEX IF EXISTS {index};"
+              for index in ("idx_chapters_subject", "idx_reminders_time", "idx_reminders_status_time", "idx_todos_timestamp")),
+            SCHEMA,
+            *copies,
+            "DROP TABLE reminders_v1;",
+            "DROP TABLE chapters_v1;",
+            "DROP TABLE todos_v1;",
+            "COMMIT;",
+        ]))
+
+    def _owners(self):
+        return [""] + [row[0] for row in self._conn.execute(
+            "SELECT owner FROM chapters WHERE owner != '' UNION SELECT owner FROM todos WHERE owner != ''")]
+
+    def _roots_below(self, parts):
+        # Table-backed nodes nested under a plain path such as "/" or "users".
+        return [(owner, node) for owner in self._owners() for node in STRUCTURED_NODES
+                if _root_parts(owner, node)[:len(parts)] == parts and len(_root_parts(owner, node)) > len(parts)]
+
+    # ----- reads -----
+    def _chapter_rows(self, where, params, limit=None):
+        chapters = {}
+        columns = ", ".join(f"c.{field}" for field in CHAPTER_FIELDS)
+        query = f"SELECT c.subject, c.chapter_id, {columns} FROM chapters c {where} ORDER BY c.subject, c.chapter_id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        for row in self._conn.execute(query, params):
+            chapters[row[:2]] = (dict(zip(CHAPTER_FIELDS, row[2:])), [])
+        if chapters:
+            if limit is not None:
+                # Only the reminders of the chapters on this page.
+                where, params = f"{where} AND c.chapter_id <= ?", (*params, list(chapters)[-1][1])
+            columns = ", ".join(f"r.{field}" for field in REMINDER_FIELDS)
+            reminders = self._conn.execute(
+                f"SELECT r.subject, r.chapter_id, {columns} FROM reminders r "
+                f"JOIN chapters c ON c.owner = r.owner AND c.subject = r.subject AND c.chapter_id = r.chapter_id {where} "
+                f"ORDER BY r.subject, r.chapter_id, r.position", params)
+            for row in reminders:
+                reminder_id, reminder_type, r_time, status = row[2:]
+                chapters[row[:2]][1].append((reminder_id, reminder_type, from_epoch(r_time), status))
+        # Rows hold decoded values so SQL can filter on them; callers get the wire schema.
+        return {key: encode_chapter(fields["chapter_name"], from_epoch(fields["entry_datetime"]), reminders,
+                                    fields["exams_appeared"], fields["exam_status"], fields["time_spent"])
+                for key, (fields, reminders) in chapters.items()}
+
+    def _get_data(self, owner, parts):
+        if not parts:
+            where, params = "WHERE c.owner = ?", (owner,)
+        elif len(parts) == 1:
+            where, params = "WHERE c.owner = ? AND c.subject = ?", (owner, parts[0])
+        else:
+            where, params = "WHERE c.owner = ? AND c.subject = ? AND c.chapter_id = ?", (owner, parts[0], parts[1])
+        tree = {}
+        for (subject, chapter_id), chapter in self._chapter_rows(where, params).items():
+            tree.setdefault(subject, {})[chapter_id] = chapter
+        return _navigate(tree, parts) if parts else tree or None
+
+    def _get_todos(self, owner, parts):
+        if parts:
+            row = self._conn.execute(f"SELECT {', '.join(TODO_FIELDS)} FROM todos WHERE owner = ? AND todo_key = ?",
+                                     (owner, parts[0])).fetchone()
+            if row is None:
+                # Legacy list keys come back as an array; only a full read can answer for them.
+                return _navigate(self._get_todos(owner, []), parts) if parts[0].isdigit() else None
+            return _navigate(dict(zip(TODO_FIELDS, row)), parts[1:])
+        items = {row[0]: dict(zip(TODO_FIELDS, row[1:]))
+                 for row in self._conn.execute(f"SELECT todo_key, {', '.join(TODO_FIELDS)} FROM todos WHERE owner = ? "
+                                               f"ORDER BY CAST(todo_key AS INTEGER), todo_key", (owner,))}
+        return _firebase_shape(items)
+
+    def _get_structured(self, owner, node, parts):
+        return self._get_data(owner, parts) if node == DATA_NODE else self._get_todos(owner, parts)
+
+    def _get_node(self, parts):
+        path = "/".join(parts)
+        if parts:
+            rows = self._conn.execute("SELECT path, value FROM nodes WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                                      (path, _like_prefix(path)))
+        else:
+            rows = self._conn.execute("SELECT path, value FROM nodes")
+        tree = None
+        for row_path, value in rows:
+            tree = _set_path(tree, _split(row_path)[len(parts):], json.loads(value))
+        return tree
+
+    def get(self, path):
+        parts = _split(path)
+        with self._lock:
+            route = _route(parts)
+            if route:
+                return self._get_structured(*route)
+            tree = self._get_node(parts)
+            for owner, node in self._roots_below(parts):
+                value = self._get_structured(owner, node, [])
+                if value is not None:
+                    tree = _set_path(tree, _root_parts(owner, node)[len(parts):], value)
+            return tree
+
+    def get_keys(self, path):
+        route = _route(_split(path))
+        if not route or route[1] != DATA_NODE or route[2]:
+            return super().get_keys(path)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT subject FROM chapters WHERE owner = ? ORDER BY subject", (route[0],))]
+
+    def query_by_child(self, path, child, start_at=None, end_at=None, limit=None):
+        route = _route(_split(path))
+        if not route or route[1] != TODO_NODE or route[2] or child not in TODO_FIELDS:
+            return super().query_by_child(path, child, start_at, end_at, limit)
+        # Answered from idx_todos_timestamp for the timestamp range loads and compaction ask for.
+        clauses, params = ["owner = ?"], [route[0]]
+        if start_at is not None:
+            clauses.append(f"{child} >= ?")
+            params.append(start_at)
+        if end_at is not None:
+            clauses.append(f"({child} IS NULL OR {child} <= ?)")
+            params.append(end_at)
+        query = (f"SELECT todo_key, {', '.join(TODO_FIELDS)} FROM todos WHERE {' AND '.join(clauses)} "
+                 f"ORDER BY {child} IS NOT NULL, {child}, todo_key")
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            return {row[0]: dict(zip(TODO_FIELDS, row[1:])) for row in self._conn.execute(query, params)}
+
+    def get_page(self, path, start_after=None, limit=PAGE_SIZE):
+        route = _route(_split(path))
+        if not route or route[1] != DATA_NODE or len(route[2]) != 1:
+            return super().get_page(path, start_after, limit)
+        owner, _, (subject,) = route
+        where, params = "WHERE c.owner = ? AND c.subject = ?", (owner, subject)
+        if start_after is not None:
+            where, params = f"{where} AND c.chapter_id > ?", (*params, start_after)
+        with self._lock:
+            return [(chapter_id, chapter) for (_, chapter_id), chapter in self._chapter_rows(where, params, limit).items()]
+
+    # ----- writes -----
+    def _write_chapter(self, owner, subject, chapter_id, chapter):
+        self._conn.execute("DELETE FROM chapters WHERE owner = ? AND subject = ? AND chapter_id = ?", (owner, subject, chapter_id))
+        if not chapter:
+            return
+        name, entry, reminders, exams_appeared, exam_status, time_spent = decode_chapter(chapter)
+        self._conn.execute(
+            f"INSERT INTO chapters (owner, chapter_id, subject, {', '.join(CHAPTER_FIELDS)}) VALUES (?, ?, ?{', ?' * len(CHAPTER_FIELDS)})",
+            (owner, chapter_id, subject, name, _iso(entry), exams_appeared, exam_status, time_spent))
+        self._conn.executemany(
+            f"INSERT INTO reminders (owner, subject, chapter_id, position, {', '.join(REMINDER_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?{', ?' * len(REMINDER_FIELDS)})",
+            [(owner, subject, chapter_id, pos, reminder_id, reminder_type, _iso(r_time), status)
+             for pos, (reminder_id, reminder_type, r_time, status) in enumerate(reminders)])
+
+    def _write_subject(self, owner, subject, chapters):
+        self._conn.execute("DELETE FROM chapters WHERE owner = ? AND subject = ?", (owner, subject))
+        for chapter_id, chapter in _children(chapters).items():
+            self._write_chapter(owner, subject, chapter_id, chapter)
+
+    def _update_data(self, owner, parts, value):
+        if not parts:
+            self._conn.execute("DELETE FROM chapters WHERE owner = ?", (owner,))
+            for subject, chapters in (value or {}).items():
+                self._write_subject(owner, subject, chapters)
+        elif len(parts) == 1:
+            self._write_subject(owner, parts[0], value)
+        elif len(parts) == 2:
+            self._write_chapter(owner, parts[0], parts[1], value)
+        elif len(parts) == 3 and parts[2] in COLUMN_FOR_KEY:
+            self._conn.execute(f"UPDATE chapters SET {COLUMN_FOR_KEY[parts[2]]} = ? WHERE owner = ? AND subject = ? AND chapter_id = ?",
+                               (value, owner, parts[0], parts[1]))
+        elif len(parts) == 5 and parts[2] == REMINDERS_KEY and parts[4] == str(R_STATUS):
+            self._conn.execute("UPDATE reminders SET status = ? WHERE owner = ? AND subject = ? AND chapter_id = ? AND position = ?",
+                               (decode_code(value, STATUSES), owner, parts[0], parts[1], int(parts[3])))
+        else:
+            # Anything deeper or unusual (including the entry time, which reminder
+            # offsets are relative to): rewrite the one chapter it belongs to.
+            chapter = self._get_data(owner, parts[:2])
+            self._write_chapter(owner, parts[0], parts[1], _set_path(chapter, parts[2:], value))
+
+    def _write_todo(self, owner, key, todo):
+        self._conn.execute("DELETE FROM todos WHERE owner = ? AND todo_key = ?", (owner, key))
+        if todo:
+            self._conn.execute(f"INSERT INTO todos (owner, todo_key, {', '.join(TODO_FIELDS)}) VALUES (?, ?{', ?' * len(TODO_FIELDS)})",
+                               (owner, key, *(todo.get(field) for field in TODO_FIELDS)))
+
+    def _update_todos(self, owner, parts, value):
+        if not parts:
+            self._conn.execute("DELETE FROM todos WHERE owner = ?", (owner,))
+            for key, todo in _children(value).items():
+                self._write_todo(owner, key, todo)
+        elif len(parts) == 1:
+            self._write_todo(owner, parts[0], value)
+        elif len(parts) == 2 and parts[1] in TODO_FIELDS and value is not None:
+            self._conn.execute(f"UPDATE todos SET {parts[1]} = ? WHERE owner = ? AND todo_key = ?", (value, owner, parts[0]))
+        else:
+            self._write_todo(owner, parts[0], _set_path(self._get_todos(owner, parts[:1]), parts[1:], value))
+
+    def _update_structured(self, owner, node, parts, value):
+        if node == DATA_NODE:
+            self._update_data(owner, parts, value)
+        else:
+            self._update_todos(owner, parts, value)
+
+    def _drop_ancestor_leaves(self, parts):
+        # A scalar stored at an ancestor is replaced by the new subtree.
+        for i in range(1, len(parts)):
+            self._conn.execute("DELETE FROM nodes WHERE path = ?", ("/".join(parts[:i]),))
+
+    def _clear_node(self, parts):
+        path = "/".join(parts)
+        if parts:
+            self._conn.execute("DELETE FROM nodes WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, _like_prefix(path)))
+        else:
+            self._conn.execute("DELETE FROM nodes")
+        self._drop_ancestor_leaves(parts)
+
+    def _write_tree(self, parts, value):
+        route = _route(parts)
+        if route:
+            self._update_structured(*route, value)
+        elif isinstance(value, (dict, list)):
+            for key, child in _children(value).items():
+                self._write_tree(parts + [key], child)
+        elif value is not None:
+            self._conn.execute("INSERT OR REPLACE INTO nodes (path, value) VALUES (?, ?)", ("/".join(parts), json.dumps(value)))
+
+    def update(self, updates):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            applied = {}
+            try:
+                for path, value in updates.items():
+                    parts = _split(path)
+                    route = _route(parts)
+                    if route:
+                        self._drop_ancestor_leaves(parts)
+                        self._update_structured(*route, value)
+                        applied[path] = value
+                        continue
+                    if is_increment(value):
+                        # Resolved here, inside the write transaction, like the server does.
+                        value = apply_increment(self._get_node(parts), value)
+                    applied[path] = value
+                    self._clear_node(parts)
+                    for owner, node in self._roots_below(parts):
+                        self._update_structured(owner, node, [], None)
+                    self._write_tree(parts, value)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            listeners = list(self._listeners)
+        self._notify(listeners, applied)
+
+    def set_if_unchanged(self, path, expected_etag, value):
+        with self._lock:
+            current, etag = self.get_with_etag(path)
+            if etag != expected_etag:
+                return False, current, etag
+            self.update({path: value})
+            return (True, *self.get_with_etag(path))
+
+    def transaction(self, path, fn):
+        with self._lock:
+            value = fn(self.get(path))
+            self.update({path: value})
+            return value
+
+    # ----- change notifications -----
+    def listen(self, path, callback):
+        entry = (_split(path), callback)
+        with self._lock:
+            self._listeners.append(entry)
+            initial = self.get(path)
+        callback(StorageEvent("put", "/", initial))
+        return _Registration(self._listeners, entry)
+
+    def _notify(self, listeners, updates):
+        for listen_parts, callback in listeners:
+            depth = len(listen_parts)
+            for path, value in updates.items():
+                parts = _split(path)
+                if parts[:depth] == listen_parts:
+                    callback(StorageEvent("put", "/" + "/".join(parts[depth:]), value))
+                elif listen_parts[:len(parts)] == parts:
+                    callback(StorageEvent("put", "/", self.get("/".join(listen_parts))))
+
+    # ----- indexed queries -----
+    # Times are stored as ISO strings, so a day range is a string range on
+    # idx_reminders_time (or idx_reminders_status_time).
+    def _reminder_clauses(self, start_date, end_date, subject, user_id):
+        start, end = _day_bounds(start_date, end_date)
+        clauses, params = ["owner = ?", "time IS NOT NULL"], [user_id or ""]
+        if start:
+            clauses.append("time >= ?")
+            params.append(start)
+        if end:
+            clauses.append("time < ?")
+            params.append(end)
+        if subject:
+            clauses.append("subject = ?")
+            params.append(subject)
+        return " AND ".join(clauses), params
+
+    def reminders_between(self, start_date=None, end_date=None, subject=None, user_id=None):
+        where, params = self._reminder_clauses(start_date, end_date, subject, user_id)
+        with self._lock:
+            return self._conn.execute(f"SELECT subject, chapter_id, reminder_id, time, status FROM reminders "
+                                      f"WHERE {where} ORDER BY time", params).fetchall()
+
+    def daily_counts(self, start_date=None, end_date=None, subject=None, user_id=None):
+        where, params = self._reminder_clauses(start_date, end_date, subject, user_id)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT substr(time, 1, 10) AS day, COUNT(*), SUM(status = 'Revised') FROM reminders "
+                                      f"WHERE {where} GROUP BY day ORDER BY day", params).fetchall()
+        return {datetime.date.fromisoformat(day): {"total": total, "revised": revised} for day, total, revised in rows}
+
+
+def _like_prefix(path):
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}/%"
+
+
+# ---------------- Instrumentation ----------------
+# Wraps a backend and records every call's latency and JSON payload size (what
+# was sent for writes, what came back for reads) in a metrics registry.
+# Serialising payloads to measure them costs time too, so this is opt-in.
+
+
+def _payload_bytes(value):
+    if value is None:
+        return 0
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class InstrumentedBackend(StorageBackend):
+    def __init__(self, inner, metrics):
+        self._inner = inner
+        self._metrics = metrics
+
+    def _timed(self, op, fn, *args, sent=None, received=lambda result: result):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            self._metrics.observe_storage(op, (time.perf_counter() - start) * 1000, _payload_bytes(sent), ok=False)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._metrics.observe_storage(op, elapsed_ms, _payload_bytes(sent) + _payload_bytes(received(result)))
+        return result
+
+    def get(self, path):
+        return self._timed("get", self._inner.get, path)
+
+    def get_keys(self, path):
+        return self._timed("get_keys", self._inner.get_keys, path)
+
+    def get_page(self, path, start_after=None, limit=PAGE_SIZE):
+        return self._timed("get_page", self._inner.get_page, path, start_after, limit)
+
+    def query_by_child(self, path, child, start_at=None, end_at=None, limit=None):
+        return self._timed("query_by_child", self._inner.query_by_child, path, child, start_at, end_at, limit)
+
+    def get_with_etag(self, path):
+        return self._timed("get_with_etag", self._inner.get_with_etag, path, received=lambda result: result[0])
+
+    def get_if_changed(self, path, etag):
+        return self._timed("get_if_changed", self._inner.get_if_changed, path, etag, received=lambda result: result[1])
+
+    def set_if_unchanged(self, path, expected_etag, value):
+        return self._timed("set_if_unchanged", self._inner.set_if_unchanged, path, expected_etag, value,
+                           sent=value, received=lambda result: None)
+
+    def transaction(self, path, fn):
+        return self._timed("transaction", self._inner.transaction, path, fn)
+
+    def update(self, updates):
+        return self._timed("update", self._inner.update, updates, sent=updates)
+
+    def listen(self, path, callback):
+        def counted(event):
+            self._metrics.observe_storage("listen_event", nbytes=_payload_bytes(event.data))
+            callback(event)
+        return self._timed("listen", self._inner.listen, path, counted, received=lambda result: None)
+
+    def reminders_between(self, start_date=None, end_date=None, subject=None, user_id=None):
+        return self._timed("reminders_between", self._inner.reminders_between, start_date, end_date, subject, user_id)
+
+    def daily_counts(self, start_date=None, end_date=None, subject=None, user_id=None):
+        return self._timed("daily_counts", self._inner.daily_counts, start_date, end_date, subject, user_id,
+                           received=lambda result: None)
+
+
+def create_backend(name, sqlite_path="neet_prep.db"):
+    if name == "firebase":
+        return FirebaseBackend()
+    if name == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {name!r} (expected 'firebase' or 'sqlite')")
@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import analytics  # noqa: E402
+from models import Chapter, SubjectChapters, build_reminders  # noqa: E402
+
+ENTRY = datetime.datetime(2024, 3, 1, 8)
+
+
+def _chapter(chapter_id, days=0):
+    entry = ENTRY + datetime.timedelta(days=days)
+    return Chapter(chapter_id, f"Chapter {chapter_id}", entry, build_reminders(entry))
+
+
+def _rows(rollup):
+    frame = rollup.frame().sort_values(["date", "subject"])
+    return [(row.date.date(), row.subject, row.total, row.revised) for row in frame.itertuples()]
+
+
+def test_incremental_updates_match_a_rebuild():
+    data = {"Physics": SubjectChapters([_chapter("a"), _chapter("b", 1)]), "Botany": SubjectChapters([_chapter("c", 3)])}
+    rollup = analytics.DailyRollup.build(data)
+
+    added = _chapter("d", 2)
+    data["Botany"].add(added)
+    rollup.add_chapter("Botany", added)
+    removed = data["Physics"].remove("b")
+    rollup.remove_chapter("Physics", removed)
+    reminder = data["Physics"].get("a").reminders[1]
+    reminder.status = "Revised"
+    rollup.status_changed("Physics", reminder, "Pending")
+
+    assert _rows(rollup) == _rows(analytics.DailyRollup.build(data))
+
+
+def test_merged_rollup_counts_both_sides():
+    working = analytics.DailyRollup.build({"Physics": SubjectChapters([_chapter("a")])})
+    archive = analytics.DailyRollup.build({"Physics": SubjectChapters([_chapter("b")])})
+    merged = working.merged(archive)
+    assert [row[2] for row in _rows(merged)] == [2, 2, 2]
+    # Neither input is changed.
+    assert [row[2] for row in _rows(working)] == [1, 1, 1]
+
+
+def test_frame_filters_by_start_date_and_subject():
+    rollup = analytics.DailyRollup.build({"Physics": SubjectChapters([_chapter("a")]),
+                                          "Botany": SubjectChapters([_chapter("b", 10)])})
+    frame = rollup.frame(start_date=datetime.date(2024, 3, 5))
+    assert sorted(frame["subject"].unique()) == ["Botany", "Physics"]
+    assert set(rollup.frame(subject="Botany")["subject"]) == {"Botany"}
+
+
+def test_long_ranges_are_bucketed_with_summed_counts():
+    chapters = [_chapter(str(day), day) for day in range(0, 400, 10)]
+    frame = analytics.DailyRollup.build({"Physics": SubjectChapters(chapters)}).frame()
+    freq = analytics.chart_frequency(frame)
+    assert freq == "W"
+    series = analytics.bucketed_productivity(frame, freq)
+    assert series["Total Reminders"].sum() == frame["total"].sum()
+    assert len(series) <= analytics.MAX_WEEKLY_POINTS
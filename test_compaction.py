@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+from benchmarks.fake_firebase import FakeDatabase
+from compaction import TodoCompactor
+from shared_cache import SharedTodos
+from storage import TODO_ARCHIVE_NODE, TODO_NODE, FirebaseBackend, SQLiteBackend
+
+NOW = datetime.datetime(2024, 3, 10, 12)
+
+
+def _todo(task, hours_ago):
+    return {"task": task, "status": "Pending", "timestamp": (NOW - datetime.timedelta(hours=hours_ago)).isoformat()}
+
+
+TODOS = {
+    "t1": _todo("fresh", 1),
+    "t2": _todo("old", 30),
+    "t3": _todo("older", 60),
+    "t4": {"status": "Completed"},  # a status write that outlived its task
+    "t5": _todo("edge", 23),
+}
+
+
+@pytest.fixture(params=["sqlite", "firebase"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "db.sqlite"))
+        backend.update({TODO_NODE: TODOS})
+        return backend
+    return FirebaseBackend(db=FakeDatabase({TODO_NODE: TODOS}, latency_ms=0, bandwidth_mbps=0))
+
+
+def test_timestamp_range_query(store):
+    cutoff = (NOW - datetime.timedelta(days=1)).isoformat()
+    assert list(store.query_by_child(TODO_NODE, "timestamp", start_at=cutoff)) == ["t5", "t1"]
+    # end_at also returns children without the field, which sort first.
+    assert list(store.query_by_child(TODO_NODE, "timestamp", end_at=cutoff)) == ["t4", "t3", "t2"]
+    assert list(store.query_by_child(TODO_NODE, "timestamp", end_at=cutoff, limit=2)) == ["t4", "t3"]
+
+
+def test_compaction_moves_expired_todos_in_batches(store):
+    compactor = TodoCompactor(store, TODO_NODE, TODO_ARCHIVE_NODE, batch=2)
+    assert compactor.run(NOW) == 3
+    assert sorted(store.get(TODO_NODE)) == ["t1", "t5"]
+    # Records without a task are dropped rather than archived.
+    assert sorted(store.get(TODO_ARCHIVE_NODE)) == ["t2", "t3"]
+    assert compactor.run(NOW) == 0
+
+
+def test_compaction_without_archive_deletes(store):
+    assert TodoCompactor(store, TODO_NODE).run(NOW) == 3
+    assert store.get(TODO_ARCHIVE_NODE) is None
+
+
+def test_legacy_todos_get_ids_in_the_archive(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    store.update({TODO_NODE: [_todo("old", 30), _todo("fresh", 1)]})
+    assert TodoCompactor(store, TODO_NODE, TODO_ARCHIVE_NODE).run(NOW) == 1
+    archived = store.get(TODO_ARCHIVE_NODE)
+    assert [todo["task"] for todo in archived.values()] == ["old"]
+    assert not any(key.isdigit() for key in archived)
+
+
+def test_todo_mirror_reads_only_the_retention_window(store):
+    store.update({f"{TODO_NODE}/t1/timestamp": datetime.datetime.now().isoformat()})
+    mirror = SharedTodos(store, TODO_NODE)
+    assert list(mirror.snapshot()) == ["t1"]
+    store.update({f"{TODO_NODE}/t6": dict(_todo("new", 0), timestamp=datetime.datetime.now().isoformat())})
+    assert mirror.refresh(max_age=0) is True
+    assert list(mirror.snapshot()) == ["t1", "t6"]
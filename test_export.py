@@ -0,0 +1,44 @@
+import csv
+import datetime
+import io
+import zipfile
+
+import pytest
+
+from export import CSV_COLUMNS, csv_bytes, iter_csv_chunks, parquet_bytes
+from models import Chapter, SubjectChapters, build_reminders
+
+ENTRY = datetime.datetime(2024, 3, 1, 8)
+
+
+def _data(n_chapters):
+    return {"Physics": SubjectChapters(Chapter(f"c{i}", f"Chapter {i}", ENTRY, build_reminders(ENTRY), time_spent=i)
+                                       for i in range(n_chapters))}
+
+
+def test_csv_is_written_in_chunks_of_whole_rows():
+    chunks = list(iter_csv_chunks(_data(5), chunk_rows=4))
+    # 15 reminder rows: three full chunks and the remainder.
+    assert len(chunks) == 4
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows[0] == CSV_COLUMNS
+    assert len(rows) == 16
+    assert rows[1] == ["Physics", "Chapter 0", "01/03/24 08:00 AM", "01/03/24 08:00 PM", "Pending", "0", "Not Appeared", "0"]
+
+
+def test_csv_bytes_joins_the_chunks():
+    data = _data(3)
+    assert csv_bytes(data) == b"".join(iter_csv_chunks(data))
+    assert csv_bytes({}) == (",".join(CSV_COLUMNS) + "\n").encode("utf-8")
+
+
+def test_parquet_holds_chapter_and_reminder_tables():
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    with zipfile.ZipFile(io.BytesIO(parquet_bytes(_data(2)))) as archive:
+        assert sorted(archive.namelist()) == ["chapters.parquet", "reminders.parquet"]
+        chapters = pd.read_parquet(io.BytesIO(archive.read("chapters.parquet")))
+        reminders = pd.read_parquet(io.BytesIO(archive.read("reminders.parquet")))
+    assert list(chapters["chapter_id"]) == ["c0", "c1"]
+    assert len(reminders) == 6
+    assert str(reminders["time"].dtype).startswith("datetime64")
@@ -0,0 +1,64 @@
+import datetime
+import json
+
+from importer import MAX_IMPORT_ROWS, parse_syllabus
+
+SUBJECTS = ["Physics", "Chemistry", "Botany", "Zoology"]
+NOW = datetime.datetime(2024, 3, 1, 9)
+
+
+def _parse(content, file_name="syllabus.csv", existing=None):
+    return parse_syllabus(content, file_name, SUBJECTS, NOW, existing)
+
+
+def test_csv_rows_become_chapters_with_the_picked_reminders():
+    content = ("\ufeffSubject,Chapter Name,Entry Date,Reminders,Time Spent\n"
+               "Physics,Kinematics,01/03/2024 10:00,12h;5d,30\n"
+               "Botany,Cell,,,\n").encode("utf-8")
+    chapters, errors = _parse(content)
+    assert errors == []
+    (physics, kinematics), (botany, cell) = chapters
+    assert (physics, kinematics.chapter_name, kinematics.time_spent) == ("Physics", "Kinematics", 30)
+    assert kinematics.entry_datetime == datetime.datetime(2024, 3, 1, 10)
+    assert [reminder.reminder_id for reminder in kinematics.reminders] == [1, 3]
+    # Missing optional columns fall back to now and the whole schedule.
+    assert (botany, cell.entry_datetime, len(cell.reminders)) == ("Botany", NOW, 3)
+
+
+def test_bad_rows_are_reported_by_line_and_left_out():
+    content = ("subject,chapter_name,entry_datetime,reminders,exams_appeared\n"
+               "Maths,Algebra,,,\n"
+               "Physics,,,,\n"
+               "Physics,Optics,yesterday,,\n"
+               "Physics,Waves,,7d,\n"
+               "Physics,Heat,,,-1\n"
+               "Physics,Units,,,\n")
+    chapters, errors = _parse(content)
+    assert [chapter.chapter_name for _, chapter in chapters] == ["Units"]
+    assert [error.split(":")[0] for error in errors] == ["Line 2", "Line 3", "Line 4", "Line 5", "Line 6"]
+
+
+def test_names_already_stored_or_repeated_in_the_file_are_skipped():
+    content = "subject,chapter_name\nPhysics,Units\nPhysics,Optics\nPhysics,Optics\nChemistry,Units\n"
+    chapters, errors = _parse(content, existing={"Physics": {"Units"}})
+    assert [(subject, chapter.chapter_name) for subject, chapter in chapters] == [("Physics", "Optics"), ("Chemistry", "Units")]
+    assert errors == ["Line 2: 'Units' is already in Physics", "Line 4: 'Optics' is already in Physics"]
+
+
+def test_json_by_subject_accepts_names_and_objects():
+    content = json.dumps({"Zoology": ["Frog", {"chapter_name": "Cockroach", "entry_datetime": "2024-02-01T08:00:00+00:00"}]})
+    chapters, errors = _parse(content, "syllabus.json")
+    assert errors == []
+    assert [chapter.chapter_name for _, chapter in chapters] == ["Frog", "Cockroach"]
+    # Offsets are converted to the naive local times the app stores.
+    entry = chapters[1][1].entry_datetime
+    assert entry.tzinfo is None
+    assert entry == datetime.datetime(2024, 2, 1, 8, tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def test_unreadable_files_fail_as_a_whole():
+    assert _parse(json.dumps({"Zoology": "Frog"}), "syllabus.json") == (
+        [], ["Could not read syllabus.json: chapters for 'Zoology' must be a list"])
+    assert _parse(b"\xff\xfe", "syllabus.csv")[1][0].startswith("Could not read syllabus.csv")
+    too_many = "subject,chapter_name\n" + "Physics,Units\n" * (MAX_IMPORT_ROWS + 1)
+    assert _parse(too_many) == ([], [f"syllabus.csv has {MAX_IMPORT_ROWS + 1} rows; the limit is {MAX_IMPORT_ROWS}."])
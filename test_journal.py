@@ -0,0 +1,60 @@
+import json
+
+from journal import Journal
+
+
+def _reopen(path, **kwargs):
+    journal = Journal(str(path), fsync=False, **kwargs)
+    return journal, journal.pending()
+
+
+def test_unacknowledged_entries_survive_reopen(tmp_path):
+    path = tmp_path / "writes.journal"
+    journal = Journal(str(path), fsync=False)
+    first = journal.append({"updates": {"a": 1}})
+    journal.append({"updates": {"b": 2}})
+    journal.ack(first)
+    journal.close()
+
+    journal, pending = _reopen(path)
+    assert [entry["updates"] for entry in pending] == [{"b": 2}]
+    # Sequence numbers carry on from the file.
+    assert journal.append({"updates": {"c": 3}}) == 3
+    journal.close()
+
+
+def test_ack_of_everything_empties_the_file(tmp_path):
+    path = tmp_path / "writes.journal"
+    journal = Journal(str(path), fsync=False)
+    journal.append({"updates": {"a": 1}})
+    seq = journal.append({"updates": {"a": 2}})
+    journal.ack(seq)
+    assert len(journal) == 0
+    journal.close()
+    assert path.read_text() == ""
+
+
+def test_compaction_keeps_only_unacknowledged_entries(tmp_path):
+    path = tmp_path / "writes.journal"
+    journal = Journal(str(path), fsync=False, compact_after=4)
+    seqs = [journal.append({"updates": {"n": n}}) for n in range(5)]
+    journal.ack(seqs[2])
+    journal.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["seq"] for line in lines] == seqs[3:]
+    _, pending = _reopen(path)
+    assert [entry["updates"]["n"] for entry in pending] == [3, 4]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "writes.journal"
+    journal = Journal(str(path), fsync=False)
+    journal.append({"updates": {"a": 1}})
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "upda')
+
+    journal, pending = _reopen(path)
+    assert [entry["seq"] for entry in pending] == [1]
+    journal.close()
@@ -0,0 +1,37 @@
+import datetime
+
+from models import Chapter, SubjectChapters
+
+ENTRY = datetime.datetime(2024, 3, 1, 8)
+
+
+def _chapter(chapter_id, name):
+    return Chapter(chapter_id, name, ENTRY, [])
+
+
+def test_chapters_are_found_by_id_and_name():
+    chapters = SubjectChapters([_chapter("a", "Cell"), _chapter("b", "Tissue")])
+    assert chapters.ids() == ["a", "b"]
+    assert chapters.get("b").chapter_name == "Tissue"
+    assert chapters.find_by_name("Cell").chapter_id == "a"
+    assert chapters.find_by_name("Atoms") is None
+
+
+def test_put_keeps_position_and_reindexes_the_name():
+    chapters = SubjectChapters([_chapter("a", "Cell"), _chapter("b", "Tissue")])
+    chapters.put(_chapter("a", "Cell Biology"))
+    assert chapters.ids() == ["a", "b"]
+    assert chapters.find_by_name("Cell") is None
+    assert chapters.find_by_name("Cell Biology").chapter_id == "a"
+    chapters.put(_chapter("c", "Atoms"))
+    assert chapters.ids() == ["a", "b", "c"]
+    assert chapters.find_by_name("Atoms").chapter_id == "c"
+
+
+def test_remove_unindexes_only_that_chapter():
+    chapters = SubjectChapters([_chapter("a", "Cell"), _chapter("b", "Cell")])
+    assert chapters.remove("a").chapter_id == "a"
+    assert chapters.find_by_name("Cell").chapter_id == "b"
+    chapters.remove("b")
+    assert chapters.find_by_name("Cell") is None
+    assert len(chapters) == 0
@@ -0,0 +1,131 @@
+from journal import Journal
+from persistence import ChangeSet, WriteBehindQueue
+from schema import increment
+from storage import WRITE_MARKERS_NODE, SQLiteBackend
+
+
+def _queue(store, **kwargs):
+    return WriteBehindQueue(store, debounce_seconds=0.01, max_delay_seconds=0.05, retry_seconds=0.05, **kwargs)
+
+
+class LostReplyBackend(SQLiteBackend):
+    # Applies the first `failures` updates and then raises, like a reply lost on the way back.
+    failures = 0
+
+    def update(self, updates):
+        super().update(updates)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("reply lost")
+
+
+def test_later_write_to_same_path_wins():
+    changes = ChangeSet()
+    changes.record("Botany/c1/t", 5)
+    changes.record("Botany/c1/t", 10)
+    assert changes.pop_all() == {"Botany/c1/t": 10}
+    assert len(changes) == 0
+
+
+def test_write_under_pending_ancestor_is_patched_into_it():
+    changes = ChangeSet()
+    changes.record("Botany/c1", {"n": "Cell", "t": 0})
+    changes.record("Botany/c1/t", 15)
+    assert changes.pop_all() == {"Botany/c1": {"n": "Cell", "t": 15}}
+
+
+def test_ancestor_write_replaces_pending_descendants():
+    changes = ChangeSet()
+    changes.record("Botany/c1/t", 15)
+    changes.record("Botany/c2/t", 20)
+    changes.record("Botany/c1", None)
+    assert changes.pop_all() == {"Botany/c2/t": 20, "Botany/c1": None}
+
+
+def test_increments_to_same_path_add_up():
+    changes = ChangeSet()
+    changes.record("subjects/Botany/revised", increment(1))
+    changes.record("subjects/Botany/revised", increment(2))
+    changes.record("subjects/Botany/total", 7)
+    changes.record("subjects/Botany/total", increment(-1))
+    assert changes.pop_all() == {"subjects/Botany/revised": increment(3), "subjects/Botany/total": 6}
+
+
+def test_write_under_pending_array_is_patched_by_index():
+    changes = ChangeSet()
+    changes.record("Botany", [{"n": "Cell", "t": 0}, {"n": "Tissue", "t": 0}])
+    changes.record("Botany/1/t", 15)
+    assert changes.pop_all() == {"Botany": [{"n": "Cell", "t": 0}, {"n": "Tissue", "t": 15}]}
+
+
+def test_delete_under_pending_ancestor_removes_the_key():
+    changes = ChangeSet()
+    changes.record("Botany", {"c1": {"t": 0}, "c2": {"t": 0}})
+    changes.record("Botany/c1", None)
+    assert changes.pop_all() == {"Botany": {"c2": {"t": 0}}}
+
+
+def test_increment_under_pending_ancestor_adds_to_it():
+    changes = ChangeSet()
+    changes.record("progress", {"total": 4})
+    changes.record("progress/total", increment(2))
+    changes.record("progress/revised", increment(1))
+    assert changes.pop_all() == {"progress": {"total": 6, "revised": 1}}
+
+
+def test_flush_sends_merged_batch(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    queue = _queue(store)
+    queue.submit({"data/a": 1, "progress/total": increment(2)})
+    queue.submit({"data/a": 2, "progress/total": increment(3)})
+    assert queue.flush(timeout=5)
+    queue.close()
+    assert store.get("data") == {"a": 2}
+    assert store.get("progress") == {"total": 5}
+
+
+def test_retry_after_lost_reply_does_not_repeat_increments(tmp_path):
+    store = LostReplyBackend(str(tmp_path / "db.sqlite"))
+    store.failures = 1
+    queue = _queue(store)
+    queue.submit({"progress/total": increment(1), "data/a": 1})
+    assert queue.flush(timeout=5)
+    queue.submit({"data/b": 2})
+    assert queue.flush(timeout=5)
+    queue.close()
+    assert store.get("progress/total") == 1
+    assert store.get("data") == {"a": 1, "b": 2}
+    # Markers go out with the batch after the one that confirmed them.
+    assert store.get(WRITE_MARKERS_NODE) is None
+
+
+def test_replay_applies_journaled_writes_once(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    path = str(tmp_path / "writes.journal")
+    journal = Journal(path, fsync=False)
+    journal.append({"updates": {"data/a": 1}})
+    journal.append({"updates": {}, "increments": {"progress/total": increment(5)}, "id": "landed"})
+    journal.append({"updates": {}, "increments": {"progress/total": increment(7)}, "id": "lost"})
+    journal.close()
+    # The first increment reached storage before the crash; the second did not.
+    store.update({"progress/total": 5, f"{WRITE_MARKERS_NODE}/landed": 1})
+
+    queue = _queue(store, journal=Journal(path, fsync=False))
+    assert queue.flush(timeout=5)
+    assert queue.stats()["journal_pending"] == 0
+    queue.close()
+    assert store.get("data/a") == 1
+    assert store.get("progress/total") == 12
+
+
+def test_has_pending_matches_nodes_above_and_below_queued_writes(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    queue = WriteBehindQueue(store, debounce_seconds=60, max_delay_seconds=60)
+    queue.submit({"users/a/data/Physics/c1": {"n": "Units"}, "users/a/progress/total": increment(1)})
+    assert queue.has_pending(["users/a/data"])
+    assert queue.has_pending(["users/a/data/Physics/c1/r"])
+    assert queue.has_pending(["users/b/data", "users/a/progress"])
+    # A shared prefix that is not a whole path segment does not count.
+    assert not queue.has_pending(["users/a/dat", "users/ab"])
+    queue.close()
+    assert not queue.has_pending(["users/a"])
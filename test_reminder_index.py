@@ -0,0 +1,62 @@
+import datetime
+
+from models import Chapter, SubjectChapters, build_reminders
+from reminder_index import ReminderIndex
+
+DAY = datetime.date(2024, 3, 1)
+
+
+def _chapter(chapter_id, day=DAY):
+    # Reminders 12 hours, 3 days and 5 days after 08:00 on `day`.
+    return Chapter(chapter_id, f"Chapter {chapter_id}", datetime.datetime.combine(day, datetime.time(8)),
+                   build_reminders(datetime.datetime.combine(day, datetime.time(8))))
+
+
+def _index(*chapters):
+    return ReminderIndex.build({"Physics": SubjectChapters(chapters)})
+
+
+def test_build_buckets_reminders_by_day():
+    index = _index(_chapter("a"), _chapter("b", DAY + datetime.timedelta(days=1)))
+    assert [handle[1].chapter_id for handle in index.on(DAY)] == ["a"]
+    assert len(index.on(DAY + datetime.timedelta(days=3))) == 1
+    assert index.dates_between() == sorted(index.dates_between())
+    assert len(index.dates_between()) == 6
+
+
+def test_range_lookups_are_inclusive_and_counted():
+    index = _index(_chapter("a"), _chapter("b", DAY + datetime.timedelta(days=2)))
+    start, end = DAY + datetime.timedelta(days=1), DAY + datetime.timedelta(days=3)
+    assert index.dates_between(start, end) == [DAY + datetime.timedelta(days=2), end]
+    assert [handle[2].reminder_id for handle in index.between(start, end)] == [1, 2]
+    assert index.daily_counts(start, end) == {DAY + datetime.timedelta(days=2): {"total": 1, "revised": 0},
+                                              end: {"total": 1, "revised": 0}}
+    assert index.between(end, start) == []
+
+
+def test_status_changes_move_revised_counts():
+    chapter = _chapter("a")
+    index = _index(chapter)
+    reminder = chapter.reminders[0]
+    reminder.status = "Revised"
+    index.status_changed(reminder, "Pending")
+    assert index.revised_on(DAY) == 1
+    # Reporting the same status again is not a change.
+    index.status_changed(reminder, "Revised")
+    assert index.revised_on(DAY) == 1
+    reminder.status = "Pending"
+    index.status_changed(reminder, "Revised")
+    assert index.revised_on(DAY) == 0
+
+
+def test_remove_chapter_drops_its_handles_and_empty_days():
+    kept, removed = _chapter("a"), _chapter("b", DAY + datetime.timedelta(days=1))
+    removed.reminders[0].status = "Revised"
+    index = _index(kept, removed)
+    index.remove_chapter(removed)
+    assert index.on(DAY + datetime.timedelta(days=1)) == []
+    assert index.revised_on(DAY + datetime.timedelta(days=1)) == 0
+    assert len(index.dates_between()) == 3
+    assert [handle[1] for handle in index.between()] == [kept] * 3
+    index.add_chapter("Physics", removed)
+    assert len(index.dates_between()) == 6
@@ -0,0 +1,54 @@
+import datetime
+
+from models import needs_migration, prepare_data_for_firebase, process_subject_data
+from schema import SCHEMA_VERSION, decode_chapter, encode_chapter
+
+ENTRY = datetime.datetime(2024, 3, 1, 8, 30)
+REMINDERS = [(1, "12 hour Reminder", ENTRY + datetime.timedelta(hours=12), "Revised"),
+             (2, "3 days Reminder", ENTRY + datetime.timedelta(days=3), "Pending")]
+
+
+def _verbose(name="Cell", reminders=REMINDERS):
+    return {"chapter_name": name, "entry_datetime": ENTRY.isoformat(), "exams_appeared": 2, "exam_status": "85%",
+            "time_spent": 40, "reminders": [{"reminder_id": rid, "type": rtype, "time": rtime.isoformat(), "status": status}
+                                            for rid, rtype, rtime, status in reminders]}
+
+
+def test_compact_chapter_round_trips():
+    raw = encode_chapter("Cell", ENTRY, REMINDERS, 2, "85%", 40)
+    assert raw == {"v": SCHEMA_VERSION, "n": "Cell", "e": 1709281800, "x": 2, "s": "85%", "t": 40,
+                   "r": [[1, 0, 43200, 1], [2, 1, 259200, 0]]}
+    assert decode_chapter(raw) == ("Cell", ENTRY, REMINDERS, 2, "85%", 40)
+
+
+def test_values_outside_the_code_tables_are_kept_verbatim():
+    reminders = [(9, "Weekly Reminder", ENTRY + datetime.timedelta(days=7), "Skipped")]
+    raw = encode_chapter("Cell", ENTRY, reminders, 0, "Not Appeared", 0)
+    assert raw["r"] == [[9, "Weekly Reminder", 604800, "Skipped"]]
+    assert decode_chapter(raw)[2] == reminders
+
+
+def test_unparseable_entry_keeps_absolute_reminder_times():
+    raw = encode_chapter("Cell", "sometime", REMINDERS, 0, "Not Appeared", 0)
+    assert raw["e"] == "sometime"
+    assert decode_chapter(raw)[1:3] == ("sometime", REMINDERS)
+
+
+def test_verbose_chapters_decode_like_compact_ones():
+    assert decode_chapter(_verbose()) == decode_chapter(encode_chapter("Cell", ENTRY, REMINDERS, 2, "85%", 40))
+    # Firebase hands sparse arrays back keyed by index.
+    sparse = dict(_verbose(), reminders={"1": _verbose()["reminders"][1], "0": _verbose()["reminders"][0]})
+    assert decode_chapter(sparse)[2] == REMINDERS
+
+
+def test_legacy_subjects_migrate_to_compact_chapters_keyed_by_id():
+    data = {"Botany": [_verbose("Cell"), None, {"t": 5}, _verbose("Tissue")], "Physics": {}}
+    assert needs_migration(data["Botany"]) and not needs_migration(data["Physics"])
+    migrated = prepare_data_for_firebase(process_subject_data(data))
+    # The empty slot and the nameless partial record are dropped.
+    assert [chapter["n"] for chapter in migrated["Botany"].values()] == ["Cell", "Tissue"]
+    assert not needs_migration(migrated["Botany"])
+    assert migrated["Physics"] == {}
+    reloaded = process_subject_data(migrated)["Botany"]
+    assert reloaded.ids() == list(migrated["Botany"])
+    assert decode_chapter(migrated["Botany"][reloaded.ids()[0]]) == decode_chapter(_verbose("Cell"))
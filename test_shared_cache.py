@@ -0,0 +1,90 @@
+from benchmarks.fake_firebase import FakeDatabase
+from benchmarks.synthetic import generate_legacy_subject_chapters_data, generate_subject_chapters_data
+from metrics import Metrics
+from models import needs_migration
+from persistence import WriteBehindQueue, submit_changes
+from schema import R_STATUS, REMINDERS_KEY, increment
+from shared_cache import MirrorRegistry, SharedSubjects
+from storage import DATA_NODE, FirebaseBackend, version_path
+
+
+def _firebase(chapters, metrics):
+    database = FakeDatabase({DATA_NODE: generate_subject_chapters_data(chapters)}, latency_ms=0, bandwidth_mbps=0,
+                            metrics=metrics)
+    return FirebaseBackend(db=database)
+
+
+def _bytes(metrics):
+    return sum(row["bytes"] for row in metrics.snapshot()["storage"])
+
+
+def _some_chapter(mirror):
+    subject, chapters = next(iter(mirror.snapshot().items()))
+    return subject, chapters.ids()[0]
+
+
+def test_refresh_after_own_write_reads_only_the_version():
+    metrics = Metrics()
+    store = _firebase(2000, metrics)
+    mirror = SharedSubjects(store, DATA_NODE)
+    queue = WriteBehindQueue(store, debounce_seconds=0.01, max_delay_seconds=0.05)
+    subject, chapter_id = _some_chapter(mirror)
+    submit_changes(queue, [(DATA_NODE, mirror, {f"{subject}/{chapter_id}/{REMINDERS_KEY}/0/{R_STATUS}": 1})])
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    before = _bytes(metrics)
+    assert mirror.refresh(max_age=0) is False
+    assert _bytes(metrics) - before < 100
+
+
+def test_first_refresh_after_paged_load_reads_only_the_version():
+    metrics = Metrics()
+    mirror = SharedSubjects(_firebase(2000, metrics), DATA_NODE)
+    before = _bytes(metrics)
+    assert mirror.refresh(max_age=0) is False
+    assert _bytes(metrics) - before < 100
+
+
+def test_refresh_picks_up_another_writers_change():
+    metrics = Metrics()
+    store = _firebase(100, metrics)
+    mirror = SharedSubjects(store, DATA_NODE)
+    subject, chapter_id = _some_chapter(mirror)
+    store.update({f"{DATA_NODE}/{subject}/{chapter_id}/t": 99, version_path(DATA_NODE): increment(1)})
+
+    assert mirror.refresh(max_age=0) is True
+    assert mirror.snapshot()[subject].get(chapter_id).time_spent == 99
+
+
+def test_legacy_subjects_are_migrated_once_on_load():
+    database = FakeDatabase({DATA_NODE: generate_legacy_subject_chapters_data(40)}, latency_ms=0, bandwidth_mbps=0)
+    mirror = SharedSubjects(FirebaseBackend(db=database), DATA_NODE)
+    stored = database.peek(DATA_NODE)
+    assert not any(needs_migration(chapters) for chapters in stored.values())
+    assert {subject: sorted(chapters) for subject, chapters in stored.items()} == {
+        subject: sorted(chapters.ids()) for subject, chapters in mirror.snapshot().items()}
+    # Each rewritten subject counts as a write, so other processes' mirrors reload.
+    assert database.peek(version_path(DATA_NODE)) == len(stored)
+    SharedSubjects(FirebaseBackend(db=database), DATA_NODE)
+    assert database.peek(version_path(DATA_NODE)) == len(stored)
+
+
+class ClosingMirror:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_registry_drops_the_least_recently_used_user():
+    registry = MirrorRegistry(max_users=2)
+    mirrors = {user: registry.get(user, "subjects", ClosingMirror) for user in ("a", "b")}
+    assert registry.get("a", "subjects", ClosingMirror) is mirrors["a"]
+    mirrors["c"] = registry.get("c", "subjects", ClosingMirror)
+    assert len(registry) == 2
+    assert mirrors["b"].closed and not mirrors["a"].closed
+    # A returning user gets a new mirror.
+    assert registry.get("b", "subjects", ClosingMirror) is not mirrors["b"]
+    assert mirrors["a"].closed
@@ -0,0 +1,103 @@
+import datetime
+import sqlite3
+
+from schema import R_STATUS, REMINDERS_KEY, decode_chapter, encode_chapter
+from storage import DATA_NODE, SQLiteBackend, StorageBackend, node_path
+
+ENTRY = datetime.datetime(2024, 3, 1, 8)
+SUBJECTS = ("Physics", "Chemistry", "Botany", "Zoology")
+
+
+def _legacy_chapter(name, days=0):
+    entry = ENTRY + datetime.timedelta(days=days)
+    return {"chapter_name": name, "entry_datetime": entry.isoformat(), "reminders": [
+        {"reminder_id": 1, "type": "12 hour Reminder", "time": (entry + datetime.timedelta(hours=12)).isoformat(),
+         "status": "Revised"},
+        {"reminder_id": 2, "type": "3 days Reminder", "time": (entry + datetime.timedelta(days=3)).isoformat(),
+         "status": "Pending"}]}
+
+
+def _names(tree):
+    return {subject: sorted(decode_chapter(chapter)[0] for chapter in chapters.values()) for subject, chapters in tree.items()}
+
+
+class TreeBackend(StorageBackend):
+    # Answers the query helpers by walking a plain tree, like the Firebase backend does.
+    def __init__(self, tree):
+        self._tree = tree
+
+    def get(self, path):
+        return self._tree if path == DATA_NODE else None
+
+
+def test_legacy_list_subjects_keep_their_own_chapters(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    store.update({DATA_NODE: {subject: [_legacy_chapter(f"{subject} {i}", i) for i in range(2)] for subject in SUBJECTS}})
+    assert _names(store.get(DATA_NODE)) == {subject: [f"{subject} 0", f"{subject} 1"] for subject in SUBJECTS}
+
+    # Field and status writes only touch the subject they name.
+    store.update({f"{DATA_NODE}/Botany/0/t": 30, f"{DATA_NODE}/Botany/0/{REMINDERS_KEY}/1/{R_STATUS}": 1})
+    assert decode_chapter(store.get(f"{DATA_NODE}/Botany/0"))[5] == 30
+    assert decode_chapter(store.get(f"{DATA_NODE}/Physics/0"))[5] == 0
+    assert [r[3] for r in decode_chapter(store.get(f"{DATA_NODE}/Physics/0"))[2]] == ["Revised", "Pending"]
+    assert [r[3] for r in decode_chapter(store.get(f"{DATA_NODE}/Botany/0"))[2]] == ["Revised", "Revised"]
+
+    store.update({f"{DATA_NODE}/Chemistry/1": None})
+    assert _names(store.get(DATA_NODE))["Chemistry"] == ["Chemistry 0"]
+    assert _names(store.get(DATA_NODE))["Zoology"] == ["Zoology 0", "Zoology 1"]
+
+
+def test_date_queries_match_a_tree_walk(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    tree = {subject: {f"c{i}": encode_chapter(f"{subject} {i}", ENTRY + datetime.timedelta(days=i),
+                                              [(1, "12 hour Reminder", ENTRY + datetime.timedelta(days=i, hours=12), "Revised"),
+                                               (2, "3 days Reminder", ENTRY + datetime.timedelta(days=i + 3), "Pending")],
+                                              0, "Not Appeared", 0)
+                      for i in range(3)} for subject in SUBJECTS[:2]}
+    store.update({DATA_NODE: tree})
+    walk = TreeBackend(store.get(DATA_NODE))
+    start, end = datetime.date(2024, 3, 2), datetime.date(2024, 3, 4)
+
+    for args in ((), (start, end), (start, None, "Physics")):
+        assert store.daily_counts(*args) == walk.daily_counts(*args)
+        assert sorted(store.reminders_between(*args)) == sorted(walk.reminders_between(*args))
+    assert store.daily_counts(start, end) == {datetime.date(2024, 3, 2): {"total": 2, "revised": 2},
+                                             datetime.date(2024, 3, 3): {"total": 2, "revised": 2},
+                                             datetime.date(2024, 3, 4): {"total": 2, "revised": 0}}
+
+
+def test_queries_are_scoped_to_one_owner(tmp_path):
+    store = SQLiteBackend(str(tmp_path / "db.sqlite"))
+    store.update({DATA_NODE: {"Physics": [_legacy_chapter("shared")]},
+                  node_path(DATA_NODE, "alice"): {"Physics": [_legacy_chapter("alice")]}})
+    assert len(store.reminders_between()) == 2
+    assert [row[1] for row in store.reminders_between(user_id="alice")] == ["0", "0"]
+    store.update({node_path(DATA_NODE, "alice"): None})
+    assert store.reminders_between(user_id="alice") == []
+    assert len(store.reminders_between()) == 2
+
+
+def test_databases_keyed_without_subject_are_migrated(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE chapters (owner TEXT NOT NULL DEFAULT '', chapter_id TEXT NOT NULL, subject TEXT NOT NULL,
+            chapter_name TEXT, entry_datetime TEXT, exams_appeared INTEGER, exam_status TEXT, time_spent INTEGER,
+            PRIMARY KEY (owner, chapter_id));
+        CREATE TABLE reminders (owner TEXT NOT NULL DEFAULT '', chapter_id TEXT NOT NULL, position INTEGER NOT NULL,
+            reminder_id INTEGER, type TEXT, time TEXT, status TEXT, PRIMARY KEY (owner, chapter_id, position));
+        CREATE TABLE todos (owner TEXT NOT NULL DEFAULT '', todo_key TEXT NOT NULL, task TEXT, status TEXT,
+            timestamp TEXT, PRIMARY KEY (owner, todo_key));
+        INSERT INTO chapters VALUES ('alice', 'c1', 'Botany', 'Cell', '2024-03-01T08:00:00', 0, 'Not Appeared', 5);
+        INSERT INTO reminders VALUES ('alice', 'c1', 0, 1, '12 hour Reminder', '2024-03-01T20:00:00', 'Revised');
+        INSERT INTO todos VALUES ('alice', 't1', 'Read', 'Pending', '2024-03-01T08:00:00');
+    """)
+    conn.close()
+
+    store = SQLiteBackend(path)
+    assert store.reminders_between(user_id="alice") == [("Botany", "c1", 1, "2024-03-01T20:00:00", "Revised")]
+    assert decode_chapter(store.get(node_path(DATA_NODE, "alice") + "/Botany/c1"))[0] == "Cell"
+    assert store.get("users/alice/todo_data/t1/task") == "Read"
+    # The same chapter ID can now exist under another subject.
+    store.update({node_path(DATA_NODE, "alice") + "/Zoology/c1": encode_chapter("Frog", ENTRY, [], 0, "Not Appeared", 0)})
+    assert _names(store.get(node_path(DATA_NODE, "alice"))) == {"Botany": ["Cell"], "Zoology": ["Frog"]}